@@ -4,27 +4,63 @@ Serves lessons generation via Weaviate RAG pipeline
 """
 
 import os
+import logging
 import json
-from typing import List
-from openai.types.chat.chat_completion_message_param import ChatCompletionMessageParam
-from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
-from fastapi import FastAPI, Query, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, Query, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from openai import OpenAI
 
 # Import your custom modules (make sure these imports work)
-from api.utils.prompt import ClientMessage, convert_to_openai_messages
-from api.utils.tools import get_current_weather
-from api.utils.lesson_service import LessonRequest, LessonResponse, create_adaptive_lesson, UserContext
+from api.utils.prompt import ClientMessage
+from api.utils.tools import get_current_weather, weather_cache_key, TOOL_DEFINITIONS
+from api.utils.tool_runtime import ToolRuntime, ToolSpec
+from api.utils.chat_engine import ChatEngine, create_chat_provider
+from api.utils.history import HistoryCompactor
+from api.utils.chat_sessions import create_session_store
+from api.utils.attachment_pipeline import dedupe_attachments
+from api.models.lesson_models import LessonRequest, LessonResponse, UserContext, AnswerBatch, LessonJob
+from api.utils.lesson_jobs import LessonJobQueue, TERMINAL_STATUSES, create_job_store
+from api.utils.knowledge_tracing import get_knowledge_service
+from api.utils.telemetry import ServerTimingMiddleware, metrics
+from api.utils.structured_logging import RequestContextMiddleware, configure_logging
+from api.utils.usage_tracking import DIMENSIONS, tag_usage, usage_tracker
+from api.utils.lesson_pack import get_lesson_pack
+
+logger = logging.getLogger(__name__)
 
 load_dotenv(".env.local")
+configure_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Services are built on first use so cold starts stay cheap; long-running
+    servers can build them before the first request with PREWARM_SERVICES=1
+    """
+    if os.environ.get("PREWARM_SERVICES", "0") == "1":
+        await run_in_threadpool(prewarm_services)
+    if os.environ.get("LESSON_JOB_STORE", "memory").lower() == "sqlite":
+        # Persistent jobs may be waiting from a previous process: start claiming them now
+        get_lesson_job_queue().start()
+    yield
+    if _lesson_job_queue is not None:
+        await _lesson_job_queue.stop()
+    if _chat_engine is not None:
+        await _chat_engine.provider.close()
+    await run_in_threadpool(usage_tracker.flush)
+
 
 app = FastAPI(
     title="Medical AI Education API",
     description="AI-powered adaptive learning for medical education using Weaviate RAG",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -34,111 +70,155 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "x-session-id", "x-request-id"],
 )
 
+# Per-stage timings in a Server-Timing header, aggregated on /api/metrics
+app.add_middleware(ServerTimingMiddleware)
+
+# Request ID (x-request-id) on every log record and response, one access log line per request
+app.add_middleware(RequestContextMiddleware)
+
 
-# Chat request model
+# Chat request model: either the full history (messages) or a session_id plus the new message
 class ChatRequest(BaseModel):
-    messages: List[ClientMessage]
-
-# Available tools for chat
-available_tools = {
-    "get_current_weather": get_current_weather,
-}
-
-def stream_text(messages: List[ChatCompletionMessageParam], protocol: str = 'data'):
-    """Stream chat completions"""
-    draft_tool_calls = []
-    draft_tool_calls_index = -1
-
-    stream = client.chat.completions.create(
-        messages=messages,
-        model="gpt-4o",
-        stream=True,
-        tools=[{
-            "type": "function",
-            "function": {
-                "name": "get_current_weather",
-                "description": "Get the current weather at a location",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "latitude": {
-                            "type": "number",
-                            "description": "The latitude of the location",
-                        },
-                        "longitude": {
-                            "type": "number",
-                            "description": "The longitude of the location",
-                        },
-                    },
-                    "required": ["latitude", "longitude"],
-                },
-            },
-        }]
-    )
+    messages: Optional[List[ClientMessage]] = None
+    session_id: Optional[str] = Field(None, pattern=r"^[A-Za-z0-9_-]{8,64}$")
+    message: Optional[ClientMessage] = None
 
-    for chunk in stream:
-        for choice in chunk.choices:
-            if choice.finish_reason == "stop":
-                continue
-
-            elif choice.finish_reason == "tool_calls":
-                for tool_call in draft_tool_calls:
-                    yield '9:{{"toolCallId":"{id}","toolName":"{name}","args":{args}}}\n'.format(
-                        id=tool_call["id"],
-                        name=tool_call["name"],
-                        args=tool_call["arguments"])
-
-                for tool_call in draft_tool_calls:
-                    tool_result = available_tools[tool_call["name"]](
-                        **json.loads(tool_call["arguments"]))
-
-                    yield 'a:{{"toolCallId":"{id}","toolName":"{name}","args":{args},"result":{result}}}\n'.format(
-                        id=tool_call["id"],
-                        name=tool_call["name"],
-                        args=tool_call["arguments"],
-                        result=json.dumps(tool_result))
-
-            elif choice.delta.tool_calls:
-                for tool_call in choice.delta.tool_calls:
-                    id = tool_call.id
-                    name = tool_call.function.name
-                    arguments = tool_call.function.arguments
-
-                    if (id is not None):
-                        draft_tool_calls_index += 1
-                        draft_tool_calls.append(
-                            {"id": id, "name": name, "arguments": ""})
-
-                    else:
-                        draft_tool_calls[draft_tool_calls_index]["arguments"] += arguments
-
-            else:
-                yield '0:{text}\n'.format(text=json.dumps(choice.delta.content))
-
-        if chunk.choices == []:
-            usage = chunk.usage
-            prompt_tokens = usage.prompt_tokens
-            completion_tokens = usage.completion_tokens
-
-            yield 'e:{{"finishReason":"{reason}","usage":{{"promptTokens":{prompt},"completionTokens":{completion}}},"isContinued":false}}\n'.format(
-                reason="tool-calls" if len(
-                    draft_tool_calls) > 0 else "stop",
-                prompt=prompt_tokens,
-                completion=completion_tokens
-            )
+# Available tools for chat, executed concurrently with per-tool timeouts
+tool_runtime = ToolRuntime([
+    ToolSpec(
+        "get_current_weather",
+        get_current_weather,
+        timeout=8.0,
+        cache_ttl=600.0,
+        cache_key=weather_cache_key
+    ),
+])
+
+_chat_engine = None
+
+def get_chat_engine() -> ChatEngine:
+    """Async chat engine for the provider selected by CHAT_PROVIDER, created on first use"""
+    global _chat_engine
+    if _chat_engine is None:
+        _chat_engine = ChatEngine(
+            provider=create_chat_provider(),
+            tool_runtime=tool_runtime,
+            tools=TOOL_DEFINITIONS,
+            max_buffered_frames=int(os.environ.get("CHAT_STREAM_BUFFER", "64")),
+            send_timeout=float(os.environ.get("CHAT_SEND_TIMEOUT", "30")),
+            max_concurrent_streams=int(os.environ.get("CHAT_MAX_STREAMS", "500"))
+        )
+    return _chat_engine
+
+_history_compactor = None
+
+def get_history_compactor() -> HistoryCompactor:
+    """History compactor sharing the chat provider for summaries"""
+    global _history_compactor
+    if _history_compactor is None:
+        provider = get_chat_engine().provider
+        budget = os.environ.get("CHAT_HISTORY_TOKEN_BUDGET")
+        _history_compactor = HistoryCompactor(
+            summarizer=provider,
+            model=getattr(provider, "model", None),
+            token_budget=int(budget) if budget else None
+        )
+    return _history_compactor
+
+_chat_session_store = None
+
+def get_chat_session_store():
+    """Server-held chat sessions (CHAT_SESSION_STORE=memory|sqlite), created on first use"""
+    global _chat_session_store
+    if _chat_session_store is None:
+        _chat_session_store = create_session_store()
+    return _chat_session_store
 
 @app.post("/api/chat")
 async def handle_chat_data(request: ChatRequest, protocol: str = Query('data')):
-    """Handle chat requests with streaming"""
-    messages = request.messages
-    openai_messages = convert_to_openai_messages(messages)
+    """
+    Handle chat requests with streaming
+
+    Clients that send a session_id with the whole history (messages) can then
+    send only the new message with that session_id, and resend the whole
+    history on a 404. Requests with the whole history and no session_id are
+    not kept on the server.
+    """
+    tag_usage(endpoint="chat")
+    chat_session_store = get_chat_session_store()
+    session = chat_session_store.get(request.session_id) if request.session_id else None
+    persistent = request.session_id is not None
+
+    # Attachment preprocessing (decoding, image downscaling) runs off the event loop
+    if request.messages is not None:
+        # Full history: keep the cached turns the client still has unchanged, convert the rest
+        session = session or chat_session_store.create(request.session_id)
+        await run_in_threadpool(session.sync, request.messages)
+    elif request.message is not None:
+        if session is None:
+            raise HTTPException(status_code=404, detail="Chat session not found or expired, resend the full messages")
+        await run_in_threadpool(session.append, request.message)
+    else:
+        raise HTTPException(status_code=422, detail="Either messages or session_id and message are required")
 
-    response = StreamingResponse(stream_text(openai_messages, protocol))
+    if persistent:
+        chat_session_store.save(session)
+
+    openai_messages = await get_history_compactor().compact(session.provider_messages())
+    openai_messages = dedupe_attachments(openai_messages)
+
+    def store_reply(reply: dict):
+        session.append_reply(reply)
+        chat_session_store.save(session)
+
+    response = StreamingResponse(get_chat_engine().stream(
+        openai_messages, on_complete=store_reply if persistent else None
+    ))
     response.headers['x-vercel-ai-data-stream'] = 'v1'
+    if persistent:
+        response.headers['x-session-id'] = session.session_id
     return response
 
+def format_lesson_response(lesson_response: LessonResponse) -> dict:
+    """Format a LessonResponse as returned by /api/lessons/create"""
+    return {
+        "success": True,
+        "lesson": {
+            "lesson_id": lesson_response.lesson.lesson_id,
+            "topic": lesson_response.lesson.topic,
+            "category": lesson_response.lesson.category,
+            "subcategory": lesson_response.lesson.subcategory,
+            "lesson_content": lesson_response.lesson.lesson_content,
+            "learning_objectives": lesson_response.lesson.learning_objectives,
+            "difficulty_level": lesson_response.lesson.difficulty_level,
+            "created_at": lesson_response.lesson.created_at
+        },
+        "exercise": {
+            "exercise_id": lesson_response.exercise.exercise_id,
+            "topic": lesson_response.exercise.topic,
+            "difficulty_level": lesson_response.exercise.difficulty_level,
+            "target_concepts": lesson_response.exercise.target_concepts,
+            "created_at": lesson_response.exercise.created_at
+        },
+        "questions": [
+            {
+                "question_id": q.question_id,
+                "text": q.text,
+                "category": q.category,
+                "subcategory": q.subcategory,
+                "topic": q.topic,
+                "difficulty": q.difficulty,
+                "options": q.options,
+                "correct_answer": q.correct_answer,
+                "explanation": q.explanation
+            }
+            for q in lesson_response.questions
+        ]
+    }
+
 @app.post("/api/lessons/create")
 async def create_lesson_endpoint(request: LessonRequest):
     """
@@ -147,60 +227,247 @@ async def create_lesson_endpoint(request: LessonRequest):
     Returns the complete lesson with content, exercises, and questions
     """
     try:
-        lesson_response = await create_adaptive_lesson(
-            topic=request.topic,
-            user_context=request.user_context
+        return await run_lesson_request(request, endpoint="lessons_create")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lesson generation failed: {str(e)}")
+
+async def run_lesson_request(request: LessonRequest, endpoint: str = "lesson_jobs") -> dict:
+    """Generate a lesson for a request and format it like /api/lessons/create"""
+    from api.utils.lesson_service import create_adaptive_lesson
+
+    tag_usage(endpoint=endpoint)
+    # Server-side mastery state takes precedence over the client copy
+    user_context = await run_in_threadpool(
+        get_knowledge_service().resolve_user_context, request.user_context
+    )
+
+    lesson_response = await create_adaptive_lesson(
+        topic=request.topic,
+        user_context=user_context
+    )
+
+    return format_lesson_response(lesson_response)
+
+_lesson_job_queue = None
+
+def get_lesson_job_queue() -> LessonJobQueue:
+    """Background lesson jobs (LESSON_JOB_STORE=memory|sqlite), created on first use"""
+    global _lesson_job_queue
+    if _lesson_job_queue is None:
+        _lesson_job_queue = LessonJobQueue(
+            store=create_job_store(),
+            runner=run_lesson_request,
+            workers=int(os.environ.get("LESSON_JOB_WORKERS", "4")),
+            ttl_seconds=float(os.environ.get("LESSON_JOB_TTL", "3600")),
+            lease_seconds=float(os.environ.get("LESSON_JOB_LEASE_SECONDS", "60")),
+            max_attempts=int(os.environ.get("LESSON_JOB_MAX_ATTEMPTS", "3"))
         )
+    return _lesson_job_queue
+
+metrics.callback(
+    "admissia_lesson_jobs", "Lesson jobs waiting or running in this worker",
+    lambda: [({"state": "queued"}, _lesson_job_queue.metrics()["queue_depth"]),
+             ({"state": "running"}, _lesson_job_queue.running)] if _lesson_job_queue is not None else []
+)
+
+def prewarm_services():
+    """Build the lazily created services and import their clients ahead of the first request"""
+    from api.utils.lesson_service import LessonOrchestrator
+
+    get_chat_session_store()
+    get_lesson_job_queue()
+    get_history_compactor()
+    LessonOrchestrator().map_topic("warmup")
+
+def format_job(job: LessonJob) -> dict:
+    """Public view of a lesson job"""
+    return {
+        "job_id": job.job_id,
+        "status": job.status.value,
+        "topic": job.request.topic,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "expires_at": job.expires_at,
+        "result": job.result,
+        "error": job.error
+    }
+
+@app.post("/api/lessons/jobs", status_code=202)
+async def submit_lesson_job(request: LessonRequest):
+    """
+    Queue lesson generation and return a job ID immediately
+
+    Identical requests share the same job while it is queued, running or cached
+    """
+    job, deduplicated = await get_lesson_job_queue().submit(request)
+    return {
+        "job_id": job.job_id,
+        "status": job.status.value,
+        "deduplicated": deduplicated,
+        "status_url": f"/api/lessons/jobs/{job.job_id}",
+        "events_url": f"/api/lessons/jobs/{job.job_id}/events"
+    }
+
+@app.get("/api/lessons/jobs/metrics")
+async def lesson_job_metrics():
+    """Queue depth, job counters and wait/run time statistics"""
+    return get_lesson_job_queue().metrics()
+
+@app.get("/api/lessons/jobs/{job_id}")
+async def get_lesson_job(job_id: str):
+    """Poll the status (and result once finished) of a lesson job"""
+    job = get_lesson_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found or expired")
+    return format_job(job)
+
+@app.get("/api/lessons/jobs/{job_id}/events")
+async def stream_lesson_job_events(job_id: str):
+    """Server-Sent Events stream pushing job status changes until the job finishes"""
+    if get_lesson_job_queue().get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found or expired")
+
+    async def event_stream():
+        last_status = None
+        while True:
+            job = get_lesson_job_queue().get(job_id)
+            if job is None:
+                yield 'event: expired\ndata: {}\n\n'
+                return
+            if job.status != last_status:
+                last_status = job.status
+                yield 'event: status\ndata: {data}\n\n'.format(data=json.dumps(format_job(job)))
+            if job.status in TERMINAL_STATUSES:
+                return
+            # Wake up on local updates, re-check the store periodically for other workers
+            await get_lesson_job_queue().wait_for_change(job_id, timeout=1.0)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@app.post("/api/answers")
+async def submit_answers(batch: AnswerBatch):
+    """
+    Ingest a batch of answer events and update the user's concept mastery
+
+    Returns the updated user context computed from server-side state
+    """
+    try:
+        knowledge_service = get_knowledge_service()
+        result = await run_in_threadpool(knowledge_service.record_answers, batch.user_id, batch.events)
+        user_context = await run_in_threadpool(knowledge_service.get_user_context, batch.user_id)
 
         return {
             "success": True,
-            "lesson": {
-                "lesson_id": lesson_response.lesson.lesson_id,
-                "topic": lesson_response.lesson.topic,
-                "category": lesson_response.lesson.category,
-                "subcategory": lesson_response.lesson.subcategory,
-                "lesson_content": lesson_response.lesson.lesson_content,
-                "learning_objectives": lesson_response.lesson.learning_objectives,
-                "difficulty_level": lesson_response.lesson.difficulty_level,
-                "created_at": lesson_response.lesson.created_at
-            },
-            "exercise": {
-                "exercise_id": lesson_response.exercise.exercise_id,
-                "topic": lesson_response.exercise.topic,
-                "difficulty_level": lesson_response.exercise.difficulty_level,
-                "target_concepts": lesson_response.exercise.target_concepts,
-                "created_at": lesson_response.exercise.created_at
-            },
-            "questions": [
-                {
-                    "question_id": q.question_id,
-                    "text": q.text,
-                    "category": q.category,
-                    "subcategory": q.subcategory,
-                    "topic": q.topic,
-                    "difficulty": q.difficulty,
-                    "options": q.options,
-                    "correct_answer": q.correct_answer,
-                    "explanation": q.explanation
-                }
-                for q in lesson_response.questions
-            ]
+            "accepted": len(batch.events),
+            "graded": result["graded"],
+            "unknown_questions": result["unknown_questions"],
+            "user_context": user_context.model_dump() if user_context else None
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Lesson generation failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Answer ingestion failed: {str(e)}")
 
-try:
-    from api.utils.lesson_service import create_adaptive_lesson
-    print("✅ Using real Weaviate lesson service")
-except Exception as e:
-    print(f"⚠️ Weaviate service error ({e}), check connection")
-    # You can add a mock fallback here if needed
+@app.get("/api/users/{user_id}/context")
+async def get_user_context(user_id: str):
+    """Get the current user context computed from recorded answers"""
+    user_context = await run_in_threadpool(get_knowledge_service().get_user_context, user_id)
+    if user_context is None:
+        raise HTTPException(status_code=404, detail=f"No recorded answers for user '{user_id}'")
+    return user_context.model_dump()
+
+@app.get("/api/questions/stats")
+async def get_question_stats(limit: int = Query(50, ge=1, le=1000)):
+    """Answer counts and success rate per canonical question (near-duplicates merged)"""
+    rows = await run_in_threadpool(get_knowledge_service().get_question_stats, limit)
+    return {"questions": rows}
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics: stage latency histograms, cache hits, fallbacks and token usage"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/usage")
+async def get_usage(group_by: str = Query("endpoint"), since: Optional[str] = None,
+                    until: Optional[str] = None, limit: int = Query(50, ge=1, le=1000)):
+    """
+    LLM token usage and estimated cost, most expensive first
+
+    Args:
+        group_by: Comma-separated dimensions (day, endpoint, category, subcategory, topic,
+                  prompt_version, model, user_id)
+        since, until: Inclusive UTC days (YYYY-MM-DD)
+    """
+    dimensions = [name.strip() for name in group_by.split(",") if name.strip()]
+    if not dimensions or any(name not in DIMENSIONS for name in dimensions):
+        raise HTTPException(status_code=422, detail=f"group_by must be a subset of {list(DIMENSIONS)}")
+    rows = await run_in_threadpool(usage_tracker.report, dimensions, since, until, limit)
+    return {"group_by": dimensions, "since": since, "until": until, "rows": rows}
 
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "medical-ai-education"}
 
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows a content coding (explicit or "*" entry with q > 0)"""
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    return weights.get(encoding, weights.get("*", 0.0)) > 0
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header lists the ETag (weak comparison, as for GET)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+def stored_lesson_response(request: Request, lesson_id: Optional[str] = None, topic: Optional[str] = None) -> Response:
+    """Stored lesson bytes from the lesson pack, sent without re-encoding"""
+    # Entry and payload come from the same view of the pack, even if it is compacted meanwhile
+    record = get_lesson_pack().record(lesson_id, topic)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Lesson not found in the lesson pack")
+    entry, payload, codec = record
+
+    # Packs without a dictionary hold deflate streams that clients can decode themselves
+    encoding = codec.http_encoding
+    if encoding and not accepts_encoding(request.headers.get("accept-encoding", ""), encoding):
+        encoding = None
+    # Each representation gets its own strong ETag so caches never serve one for the other
+    etag = f'{entry.etag[:-1]}-{encoding}"' if encoding else entry.etag
+
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=300", "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        return Response(payload, media_type="application/json", headers=headers)
+    return Response(codec.decompress(payload, entry.size), media_type="application/json", headers=headers)
+
+@app.get("/api/lessons/stored/{lesson_id}")
+async def get_stored_lesson(lesson_id: str, request: Request):
+    """Stored lesson by ID (generation_metadata, lesson, exercise, questions)"""
+    return stored_lesson_response(request, lesson_id=lesson_id)
+
+@app.get("/api/lessons/stored/topic/{topic}")
+async def get_stored_lesson_by_topic(topic: str, request: Request):
+    """Latest stored lesson of a topic"""
+    return stored_lesson_response(request, topic=topic.replace('_', ' '))
+
 @app.get("/api/lessons/{topic}")
 async def get_lesson_by_topic(topic: str):
     """
@@ -212,6 +479,9 @@ async def get_lesson_by_topic(topic: str):
     Returns:
         Complete lesson data with generation_metadata, lesson, exercise, and questions
     """
+    from api.utils.lesson_service import create_adaptive_lesson
+
+    tag_usage(endpoint="lessons_topic")
     try:
         # Create a default user context for topic-based requests
         default_user_context = UserContext(
@@ -296,6 +566,9 @@ async def generate_precise_lesson(topic: str, category: str, subcategory: str):
     Returns:
         Complete lesson data with generation_metadata, lesson, exercise, and questions
     """
+    from api.utils.lesson_service import create_adaptive_lesson
+
+    tag_usage(endpoint="lessons_generate")
     try:
         # Create enhanced user context with category/subcategory info
         enhanced_user_context = UserContext(
@@ -386,8 +659,15 @@ async def root():
         "endpoints": [
             "/health", 
             "/api/lessons/create", 
+            "/api/lessons/jobs",
+            "/api/lessons/jobs/{job_id}",
+            "/api/lessons/jobs/{job_id}/events",
             "/api/lessons/{topic}", 
             "/api/lessons/generate?topic=...&category=...&subcategory=...",  # NEW!
-            "/api/chat"
+            "/api/answers",
+            "/api/users/{user_id}/context",
+            "/api/chat",
+            "/api/metrics",
+            "/api/usage"
         ]
     }
@@ -3,7 +3,8 @@ Pydantic Models for Lesson Generation System
 Contains all data models used across the lesson generation pipeline
 """
 
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
+from enum import Enum
 from pydantic import BaseModel
 import datetime
 
@@ -76,6 +77,47 @@ class LessonRequest(BaseModel):
     topic: str
     user_context: UserContext
 
+# =============================================================================
+# KNOWLEDGE TRACING MODELS
+# =============================================================================
+
+class AnswerEvent(BaseModel):
+    """Single answer given by a student to a QCM question"""
+    question_id: str
+    chosen_option: str
+    latency_ms: int = 0
+    answered_at: Optional[str] = None
+
+class AnswerBatch(BaseModel):
+    """Batch of answer events submitted by one user"""
+    user_id: str
+    events: List[AnswerEvent]
+
+# =============================================================================
+# LESSON JOB MODELS
+# =============================================================================
+
+class LessonJobStatus(str, Enum):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+class LessonJob(BaseModel):
+    """Asynchronous lesson generation job"""
+    job_id: str
+    dedup_key: str
+    status: LessonJobStatus = LessonJobStatus.QUEUED
+    request: LessonRequest
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    expires_at: float
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    request_id: Optional[str] = None
+
 # =============================================================================
 # ACADEMIC PROGRAM MODELS
 # =============================================================================
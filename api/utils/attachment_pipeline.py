@@ -0,0 +1,229 @@
+"""
+Attachment Pipeline
+Content-hashed preprocessing of chat attachments with a bounded disk cache for downscaled images
+"""
+
+import io
+import logging
+import os
+import base64
+import hashlib
+import binascii
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote_to_bytes
+
+from api.utils.attachment import ClientAttachment
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=None)
+def _load_pillow():
+    """Pillow's Image module, imported on first use (None if Pillow is not installed)"""
+    try:
+        from PIL import Image
+    except ImportError:  # Listed in requirements.txt; without it images are sent unchanged
+        logger.warning("⚠️ Pillow is not installed: image attachments are sent without downscaling or caching")
+        return None
+    return Image
+
+# Private marker on provider parts, removed by dedupe_attachments before sending
+ATTACHMENT_KEY = "attachment"
+
+
+def parse_data_url(url: str) -> Optional[Tuple[str, bytes]]:
+    """Decode a data: URL into (media type, bytes), or None if it is not one"""
+    if not url.startswith("data:"):
+        return None
+    header, separator, payload = url[5:].partition(",")
+    if not separator:
+        return None
+
+    params = header.split(";")
+    media_type = params[0] or "text/plain"
+    try:
+        data = base64.b64decode(payload) if "base64" in params[1:] else unquote_to_bytes(payload)
+    except (ValueError, binascii.Error):
+        return None
+    return media_type, data
+
+
+class AttachmentPipeline:
+    """
+    Converts client attachments into provider message parts
+
+    - Parts are cached in memory by content hash, so repeated turns do no work
+    - Data-URL text is decoded and inlined up to `max_text_chars`
+    - Images are downscaled and re-encoded (Pillow) into a bounded disk cache
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_cache_bytes: Optional[int] = None,
+                 max_text_chars: Optional[int] = None, max_image_side: Optional[int] = None,
+                 image_quality: int = 85, max_memory_entries: int = 256):
+        """Initialize the pipeline from arguments or environment variables"""
+        self.cache_dir = cache_dir or os.environ.get("ATTACHMENT_CACHE_DIR", ".data/attachments")
+        self.max_cache_bytes = max_cache_bytes if max_cache_bytes is not None else \
+            int(os.environ.get("ATTACHMENT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        self.max_text_chars = max_text_chars if max_text_chars is not None else \
+            int(os.environ.get("ATTACHMENT_TEXT_MAX_CHARS", "20000"))
+        self.max_image_side = max_image_side if max_image_side is not None else \
+            int(os.environ.get("ATTACHMENT_IMAGE_MAX_SIDE", "1024"))
+        self.image_quality = image_quality
+        self.max_memory_entries = max_memory_entries
+
+        self._lock = threading.Lock()
+        self._parts: "OrderedDict[str, Dict]" = OrderedDict()
+        self._disk_bytes: Optional[int] = None
+
+    @staticmethod
+    def digest(attachment: ClientAttachment) -> str:
+        """Content hash of an attachment"""
+        return hashlib.sha256(f"{attachment.contentType}\0{attachment.url}".encode("utf-8")).hexdigest()
+
+    def to_part(self, attachment: ClientAttachment) -> Optional[Dict]:
+        """Provider message part for an attachment, or None if its type is not supported"""
+        digest = self.digest(attachment)
+        with self._lock:
+            part = self._parts.get(digest)
+            if part is not None:
+                self._parts.move_to_end(digest)
+                return part
+
+        if attachment.contentType.startswith("image"):
+            part = {"type": "image_url", "image_url": {"url": self._image_url(attachment, digest)}}
+        elif attachment.contentType.startswith("text"):
+            part = {"type": "text", "text": self._text(attachment)}
+        else:
+            return None
+        part[ATTACHMENT_KEY] = {"digest": digest, "name": attachment.name}
+
+        with self._lock:
+            self._parts[digest] = part
+            while len(self._parts) > self.max_memory_entries:
+                self._parts.popitem(last=False)
+        return part
+
+    # =========================================================================
+    # TEXT
+    # =========================================================================
+
+    def _text(self, attachment: ClientAttachment) -> str:
+        """Inline data-URL text up to the limit; other URLs are referenced, not copied"""
+        decoded = parse_data_url(attachment.url)
+        if decoded is None:
+            return f"Attachment {attachment.name}: {attachment.url}"
+
+        text = decoded[1].decode("utf-8", errors="replace")
+        if len(text) > self.max_text_chars:
+            omitted = len(text) - self.max_text_chars
+            text = f"{text[:self.max_text_chars]}... [truncated {omitted} characters]"
+        return f"Attachment {attachment.name}:\n{text}"
+
+    # =========================================================================
+    # IMAGES
+    # =========================================================================
+
+    def _image_url(self, attachment: ClientAttachment, digest: str) -> str:
+        """Downscaled data URL for an inline image, served from the disk cache when possible"""
+        if not attachment.url.startswith("data:") or _load_pillow() is None:
+            return attachment.url
+
+        for extension, media_type in (("jpg", "image/jpeg"), ("png", "image/png")):
+            path = os.path.join(self.cache_dir, f"{digest}.{extension}")
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.utime(path)
+                return f"data:{media_type};base64,{base64.b64encode(data).decode('ascii')}"
+            except FileNotFoundError:
+                continue
+
+        decoded = parse_data_url(attachment.url)
+        if decoded is None:
+            return attachment.url
+        try:
+            extension, media_type, data = self._downscale(decoded[1])
+        except Exception as e:
+            logger.warning("⚠️ Could not preprocess image '%s': %s", attachment.name, e)
+            return attachment.url
+        if len(data) >= len(decoded[1]):
+            data, media_type, extension = decoded[1], decoded[0], None
+
+        if extension:
+            self._write_cache(f"{digest}.{extension}", data)
+        return f"data:{media_type};base64,{base64.b64encode(data).decode('ascii')}"
+
+    def _downscale(self, data: bytes) -> Tuple[str, str, bytes]:
+        """Resize to `max_image_side` and re-encode (PNG if transparent, JPEG otherwise)"""
+        with _load_pillow().open(io.BytesIO(data)) as image:
+            image.thumbnail((self.max_image_side, self.max_image_side))
+            output = io.BytesIO()
+            if image.mode in ("RGBA", "LA", "P"):
+                image.save(output, format="PNG", optimize=True)
+                return "png", "image/png", output.getvalue()
+            image.convert("RGB").save(output, format="JPEG", quality=self.image_quality, optimize=True)
+            return "jpg", "image/jpeg", output.getvalue()
+
+    def _write_cache(self, filename: str, data: bytes):
+        """Atomically add a file to the disk cache, evicting least recently used files beyond the bound"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, filename)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(entry.stat().st_size for entry in self._cache_entries())
+            else:
+                self._disk_bytes += len(data)
+            if self._disk_bytes <= self.max_cache_bytes:
+                return
+
+            entries = sorted(self._cache_entries(), key=lambda entry: entry.stat().st_mtime)
+            for entry in entries:
+                if self._disk_bytes <= self.max_cache_bytes or entry.path == path:
+                    continue
+                try:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+                    self._disk_bytes -= size
+                except FileNotFoundError:
+                    continue
+
+    def _cache_entries(self) -> List[os.DirEntry]:
+        return [entry for entry in os.scandir(self.cache_dir) if entry.is_file() and not entry.name.endswith(".tmp")]
+
+
+def dedupe_attachments(messages: List[Dict]) -> List[Dict]:
+    """
+    Send each attachment once per conversation window: later copies of the same
+    content are replaced by a short reference, and pipeline markers are removed
+    """
+    seen = set()
+    deduped = []
+    for message in messages:
+        content = message.get("content")
+        if not isinstance(content, list) or not any(ATTACHMENT_KEY in part for part in content):
+            deduped.append(message)
+            continue
+
+        parts = []
+        for part in content:
+            marker = part.get(ATTACHMENT_KEY)
+            if marker is None:
+                parts.append(part)
+            elif marker["digest"] in seen:
+                parts.append({"type": "text", "text": f"[Attachment {marker['name']} was shared earlier in the conversation]"})
+            else:
+                seen.add(marker["digest"])
+                parts.append({key: value for key, value in part.items() if key != ATTACHMENT_KEY})
+        deduped.append({**message, "content": parts})
+    return deduped
+
+
+# Global pipeline instance
+attachment_pipeline = AttachmentPipeline()
@@ -0,0 +1,427 @@
+"""
+Async Chat Engine
+Streams chat completions in the Vercel AI data-stream format from pluggable async providers
+"""
+
+import os
+import logging
+import json
+import time
+import asyncio
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, List, Optional
+
+from api.utils.tool_runtime import ToolRuntime
+from api.utils.telemetry import STAGE_SECONDS
+from api.utils.usage_tracking import usage_tracker
+
+if TYPE_CHECKING:  # HTTP clients are imported when a provider is first used
+    import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Usage accounting version of the chat request shape (history compaction, tools)
+CHAT_PROMPT_VERSION = "chat-v1"
+
+# Provider events are plain dicts:
+#   {"type": "text", "text": str}
+#   {"type": "tool_call", "index": int, "id": str | None, "name": str | None, "arguments": str}
+#   {"type": "finish", "reason": "stop" | "tool_calls" | ...}
+#   {"type": "usage", "prompt_tokens": int, "completion_tokens": int}
+#   When a provider reports no usage, the engine estimates it locally and marks it "estimated"
+
+
+# =============================================================================
+# PROVIDERS
+# =============================================================================
+
+class ChatProvider(ABC):
+    """Async streaming chat completion provider"""
+
+    @abstractmethod
+    def stream(self, messages: List[Dict], tools: Optional[List[Dict]] = None) -> AsyncIterator[Dict]:
+        """Stream normalized events for one completion"""
+
+    async def close(self):
+        """Release provider resources"""
+
+
+class OpenAICompatibleProvider(ChatProvider):
+    """Any OpenAI-compatible endpoint through the async OpenAI client"""
+
+    def __init__(self, model: str = "gpt-4o", base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 include_usage: bool = True):
+        """
+        Initialize the async client
+
+        Args:
+            include_usage: Ask for a final usage chunk (stream_options.include_usage); disable for
+                           compatible servers that reject the option
+        """
+        from openai import AsyncOpenAI
+
+        self.model = model
+        self.include_usage = include_usage
+        self.client = AsyncOpenAI(base_url=base_url, api_key=api_key)
+
+    async def stream(self, messages: List[Dict], tools: Optional[List[Dict]] = None) -> AsyncIterator[Dict]:
+        kwargs = {"tools": tools} if tools else {}
+        if self.include_usage:
+            # Sent as a raw body field: the pinned client predates the stream_options argument
+            kwargs["extra_body"] = {"stream_options": {"include_usage": True}}
+        stream = await self.client.chat.completions.create(
+            messages=messages,
+            model=self.model,
+            stream=True,
+            **kwargs
+        )
+
+        async for chunk in stream:
+            for choice in chunk.choices:
+                if choice.delta and choice.delta.tool_calls:
+                    for tool_call in choice.delta.tool_calls:
+                        yield {
+                            "type": "tool_call",
+                            "index": tool_call.index,
+                            "id": tool_call.id,
+                            "name": tool_call.function.name if tool_call.function else None,
+                            "arguments": (tool_call.function.arguments or "") if tool_call.function else ""
+                        }
+                elif choice.delta and choice.delta.content:
+                    yield {"type": "text", "text": choice.delta.content}
+
+                if choice.finish_reason:
+                    yield {"type": "finish", "reason": choice.finish_reason}
+
+            usage = getattr(chunk, "usage", None)
+            if usage:
+                # The pinned client has no usage field on chunks and keeps it as a raw dict
+                if not isinstance(usage, dict):
+                    usage = usage.model_dump()
+                yield {
+                    "type": "usage",
+                    "prompt_tokens": usage.get("prompt_tokens") or 0,
+                    "completion_tokens": usage.get("completion_tokens") or 0
+                }
+
+    async def close(self):
+        await self.client.close()
+
+
+class MistralChatProvider(ChatProvider):
+    """Mistral chat completions over server-sent events with a shared aiohttp session"""
+
+    def __init__(self, model: str = "mistral-small-latest", base_url: Optional[str] = None,
+                 api_key: Optional[str] = None, timeout: float = 120):
+        """Initialize the provider (the HTTP session is opened on first use)"""
+        self.model = model
+        self.api_key = api_key or os.environ.get("MISTRAL_API_KEY")
+        if not self.api_key:
+            raise ValueError("MISTRAL_API_KEY environment variable required")
+        base_url = base_url or os.environ.get("MISTRAL_BASE_URL", "https://api.mistral.ai/v1")
+        self.api_url = f"{base_url.rstrip('/')}/chat/completions"
+        self.timeout = timeout
+        self._session: Optional["aiohttp.ClientSession"] = None
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        if self._session is None or self._session.closed:
+            import aiohttp
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None, sock_read=self.timeout))
+        return self._session
+
+    async def stream(self, messages: List[Dict], tools: Optional[List[Dict]] = None) -> AsyncIterator[Dict]:
+        payload = {
+            "model": self.model,
+            "messages": [_drop_empty_fields(message) for message in messages],
+            "stream": True
+        }
+        if tools:
+            payload["tools"] = tools
+
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream"
+        }
+
+        async with self._get_session().post(self.api_url, headers=headers, json=payload) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise Exception(f"Mistral API error {response.status}: {error_text}")
+
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+
+                chunk = json.loads(data)
+                for choice in chunk.get("choices", []):
+                    delta = choice.get("delta") or {}
+                    for position, tool_call in enumerate(delta.get("tool_calls") or []):
+                        function = tool_call.get("function") or {}
+                        arguments = function.get("arguments") or ""
+                        yield {
+                            "type": "tool_call",
+                            "index": tool_call.get("index", position),
+                            "id": tool_call.get("id"),
+                            "name": function.get("name"),
+                            "arguments": arguments if isinstance(arguments, str) else json.dumps(arguments)
+                        }
+                    if delta.get("content"):
+                        yield {"type": "text", "text": delta["content"]}
+                    if choice.get("finish_reason"):
+                        yield {"type": "finish", "reason": choice["finish_reason"]}
+
+                usage = chunk.get("usage")
+                if usage:
+                    yield {
+                        "type": "usage",
+                        "prompt_tokens": usage.get("prompt_tokens", 0),
+                        "completion_tokens": usage.get("completion_tokens", 0)
+                    }
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class FakeChatProvider(ChatProvider):
+    """
+    Deterministic offline provider for tests and load tests
+    Echoes the last user message word by word
+    """
+
+    def __init__(self, reply_prefix: str = "You said:", token_delay: float = 0.0):
+        """Initialize the fake provider"""
+        self.reply_prefix = reply_prefix
+        self.token_delay = token_delay
+
+    async def stream(self, messages: List[Dict], tools: Optional[List[Dict]] = None) -> AsyncIterator[Dict]:
+        last_user = next((m for m in reversed(messages) if m.get("role") == "user"), None)
+        words = [self.reply_prefix] + message_text(last_user).split()
+
+        for position, word in enumerate(words):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield {"type": "text", "text": word if position == 0 else f" {word}"}
+
+        yield {"type": "finish", "reason": "stop"}
+        yield {
+            "type": "usage",
+            "prompt_tokens": sum(len(message_text(m).split()) for m in messages),
+            "completion_tokens": len(words)
+        }
+
+
+def _drop_empty_fields(message: Dict) -> Dict:
+    """Remove null fields (e.g. "tool_calls": None) that stricter providers reject"""
+    return {key: value for key, value in message.items() if value is not None}
+
+
+def message_text(message: Optional[Dict]) -> str:
+    """Plain text of a provider message (string or content parts)"""
+    if not message:
+        return ""
+    content = message.get("content")
+    if isinstance(content, str):
+        return content
+    return " ".join(part.get("text", "") for part in content or [] if part.get("type") == "text")
+
+
+def estimate_usage(messages: List[Dict], reply: Dict) -> Dict:
+    """Local token estimate of a turn, for providers that report no usage"""
+    from api.utils.history import estimate_tokens
+
+    completion = {"role": "assistant", "content": reply["text"],
+                  "tool_calls": [{key: call.get(key) for key in ("name", "arguments")}
+                                 for call in reply["tool_invocations"]]}
+    return {
+        "type": "usage",
+        "prompt_tokens": sum(estimate_tokens(message) for message in messages),
+        "completion_tokens": estimate_tokens(completion),
+        "estimated": True
+    }
+
+
+def create_chat_provider() -> ChatProvider:
+    """Build the provider selected by CHAT_PROVIDER (openai, mistral or fake)"""
+    provider = os.environ.get("CHAT_PROVIDER", "openai").lower()
+    model = os.environ.get("CHAT_MODEL")
+
+    if provider == "openai":
+        return OpenAICompatibleProvider(
+            model=model or "gpt-4o",
+            base_url=os.environ.get("OPENAI_BASE_URL"),
+            include_usage=os.environ.get("CHAT_STREAM_USAGE", "1") == "1"
+        )
+    if provider == "mistral":
+        return MistralChatProvider(model=model or "mistral-small-latest")
+    if provider == "fake":
+        return FakeChatProvider(token_delay=float(os.environ.get("FAKE_CHAT_TOKEN_DELAY", "0")))
+    raise ValueError(f"Unknown CHAT_PROVIDER: {provider}")
+
+
+# =============================================================================
+# ENGINE
+# =============================================================================
+
+class ChatEngine:
+    """
+    Turns provider events into Vercel AI data-stream frames (0:, 9:, a:, e:)
+
+    The provider is read by a producer task into a bounded buffer: when a client
+    reads slowly the buffer fills up and the producer stops pulling from upstream.
+    Clients that stall longer than `send_timeout` are dropped.
+    """
+
+    def __init__(self, provider: ChatProvider, tool_runtime: ToolRuntime, tools: Optional[List[Dict]] = None,
+                 max_buffered_frames: int = 64, send_timeout: float = 30.0, max_concurrent_streams: int = 500):
+        """Initialize the engine"""
+        self.provider = provider
+        self.tool_runtime = tool_runtime
+        self.tools = tools
+        self.max_buffered_frames = max_buffered_frames
+        self.send_timeout = send_timeout
+        self.max_concurrent_streams = max_concurrent_streams
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.active_streams = 0
+
+    async def stream(self, messages: List[Dict],
+                     on_complete: Optional[Callable[[Dict], None]] = None) -> AsyncIterator[str]:
+        """
+        Stream data-stream frames for one chat turn
+
+        Args:
+            messages: Provider messages for the turn
+            on_complete: Called with the assistant reply ({"text", "tool_invocations"})
+                         once the turn has been fully produced
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent_streams)
+
+        async with self._slots:
+            self.active_streams += 1
+            buffer: asyncio.Queue = asyncio.Queue(maxsize=self.max_buffered_frames)
+            producer = asyncio.create_task(self._produce(messages, buffer, on_complete))
+            try:
+                while True:
+                    frame = await buffer.get()
+                    if frame is None:
+                        break
+                    yield frame
+            finally:
+                producer.cancel()
+                self.active_streams -= 1
+
+    async def _produce(self, messages: List[Dict], buffer: asyncio.Queue,
+                       on_complete: Optional[Callable[[Dict], None]] = None):
+        """Read the provider and push frames, waiting while the buffer is full"""
+        reply = {"text": "", "tool_invocations": []}
+        frames = self._frames(messages, reply)
+        try:
+            async for frame in frames:
+                await self._put(buffer, frame)
+            if on_complete is not None:
+                on_complete(reply)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Chat client too slow, dropping stream")
+            while not buffer.empty():
+                buffer.get_nowait()
+            buffer.put_nowait(None)
+            return
+        except Exception as e:
+            logger.error("❌ Chat stream error: %s", e)
+            await buffer.put('3:{error}\n'.format(error=json.dumps(str(e))))
+        finally:
+            # Close the upstream stream now, also when the client left: not whenever the generator is collected
+            await frames.aclose()
+
+        await buffer.put(None)
+
+    async def _put(self, buffer: asyncio.Queue, frame: str):
+        """
+        Push a frame, raising asyncio.TimeoutError when the client has not made room within send_timeout
+
+        Not asyncio.wait_for: on Python 3.11 a cancellation landing as it starts can leave the producer stuck.
+        """
+        if not buffer.full():
+            buffer.put_nowait(frame)
+            return
+        put = asyncio.ensure_future(buffer.put(frame))
+        try:
+            done, _ = await asyncio.wait({put}, timeout=self.send_timeout)
+        finally:
+            if not put.done():
+                put.cancel()
+        if not done:
+            raise asyncio.TimeoutError()
+
+    async def _frames(self, messages: List[Dict], reply: Dict) -> AsyncIterator[str]:
+        """Format provider events as data-stream frames, running tools when requested"""
+        draft_tool_calls: Dict[int, Dict] = {}
+        usage = None
+
+        started_at = time.perf_counter()
+        first_token = True
+        events = self.provider.stream(messages, self.tools)
+        try:
+            async for event in events:
+                if first_token and event["type"] in ("text", "tool_call"):
+                    STAGE_SECONDS.observe(time.perf_counter() - started_at, stage="chat_first_token")
+                    first_token = False
+
+                if event["type"] == "text":
+                    reply["text"] += event["text"]
+                    yield '0:{text}\n'.format(text=json.dumps(event["text"]))
+
+                elif event["type"] == "tool_call":
+                    draft = draft_tool_calls.setdefault(event["index"], {"id": None, "name": None, "arguments": ""})
+                    draft["id"] = event["id"] or draft["id"]
+                    draft["name"] = event["name"] or draft["name"]
+                    draft["arguments"] += event["arguments"]
+
+                elif event["type"] == "finish" and event["reason"] == "tool_calls":
+                    async for frame in self._run_tool_calls(
+                            [draft_tool_calls[index] for index in sorted(draft_tool_calls)], reply):
+                        yield frame
+
+                elif event["type"] == "usage":
+                    usage = event
+        finally:
+            await events.aclose()
+
+        STAGE_SECONDS.observe(time.perf_counter() - started_at, stage="chat_completion")
+        model = getattr(self.provider, "model", type(self.provider).__name__)
+        if usage is None:
+            usage = estimate_usage(messages, reply)
+            logger.warning("⚠️ No usage reported by %s, recording an estimate", model)
+        usage_tracker.record(model, CHAT_PROMPT_VERSION, usage["prompt_tokens"], usage["completion_tokens"],
+                             metered=not usage.get("estimated"))
+
+        yield 'e:{{"finishReason":"{reason}","usage":{{"promptTokens":{prompt},"completionTokens":{completion}{estimated}}},"isContinued":false}}\n'.format(
+            reason="tool-calls" if len(draft_tool_calls) > 0 else "stop",
+            prompt=usage["prompt_tokens"],
+            completion=usage["completion_tokens"],
+            estimated=',"estimated":true' if usage.get("estimated") else ""
+        )
+
+    async def _run_tool_calls(self, tool_calls: List[Dict], reply: Dict) -> AsyncIterator[str]:
+        """Announce tool calls, run them concurrently and emit their results"""
+        for tool_call in tool_calls:
+            yield '9:{{"toolCallId":"{id}","toolName":"{name}","args":{args}}}\n'.format(
+                id=tool_call["id"],
+                name=tool_call["name"],
+                args=tool_call["arguments"] or "{}")
+
+        tool_results = await self.tool_runtime.run_all(tool_calls)
+
+        for tool_call, tool_result in zip(tool_calls, tool_results):
+            reply["tool_invocations"].append({**tool_call, "result": tool_result})
+            yield 'a:{{"toolCallId":"{id}","toolName":"{name}","args":{args},"result":{result}}}\n'.format(
+                id=tool_call["id"],
+                name=tool_call["name"],
+                args=tool_call["arguments"] or "{}",
+                result=json.dumps(tool_result))
@@ -0,0 +1,209 @@
+"""
+Chat Sessions
+Server-held conversation state so clients only send the new message of each turn
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from api.utils.prompt import ClientMessage, ToolInvocation, ToolInvocationState, convert_message
+
+
+class ChatSession(BaseModel):
+    """Conversation state: each turn keeps the client message and its converted provider messages"""
+    session_id: str
+    turns: List[Dict[str, Any]] = []
+    created_at: float
+    last_access: float
+
+    def append(self, message: ClientMessage):
+        """Add a client message, converting it to provider messages once"""
+        self.turns.append({
+            "client": message.model_dump(),
+            "provider": convert_message(message)
+        })
+
+    def sync(self, messages: List[ClientMessage]) -> int:
+        """
+        Replace the conversation with a full client history
+
+        Turns whose client message is unchanged keep their converted provider messages,
+        only the rest are converted. Returns the number of reused turns.
+        """
+        reused = 0
+        for turn, message in zip(self.turns, messages):
+            if turn["client"] != message.model_dump():
+                break
+            reused += 1
+        del self.turns[reused:]
+        for message in messages[reused:]:
+            self.append(message)
+        return reused
+
+    def append_reply(self, reply: Dict):
+        """Add the assistant reply produced by the chat engine"""
+        tool_invocations = [
+            ToolInvocation(
+                state=ToolInvocationState.RESULT,
+                toolCallId=invocation["id"],
+                toolName=invocation["name"],
+                args=_parse_arguments(invocation["arguments"]),
+                result=invocation["result"]
+            )
+            for invocation in reply.get("tool_invocations", [])
+        ]
+        self.append(ClientMessage(
+            role="assistant",
+            content=reply.get("text", ""),
+            toolInvocations=tool_invocations or None
+        ))
+
+    def provider_messages(self) -> List[Dict]:
+        """All cached provider messages of the conversation"""
+        return [message for turn in self.turns for message in turn["provider"]]
+
+
+def _parse_arguments(arguments: str) -> Any:
+    """Decode tool call arguments, keeping the raw string if they are not valid JSON"""
+    try:
+        return json.loads(arguments or "{}")
+    except json.JSONDecodeError:
+        return arguments
+
+
+# =============================================================================
+# SESSION STORES
+# =============================================================================
+
+class InMemorySessionStore:
+    """
+    Process-local session store (default)
+    Idle sessions expire after `ttl_seconds`; the least recently used sessions are
+    evicted beyond `max_sessions` or `max_bytes` of serialized state
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_sessions: int = 1000, max_bytes: int = 64 * 1024 * 1024):
+        """Initialize an empty store"""
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+
+    def create(self, session_id: Optional[str] = None) -> ChatSession:
+        """Start a new empty session (under a client-chosen ID when given)"""
+        now = time.time()
+        return ChatSession(session_id=session_id or uuid.uuid4().hex, created_at=now, last_access=now)
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        """Fetch a live session and mark it as recently used"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if session.last_access + self.ttl_seconds < time.time():
+            self._remove(session_id)
+            return None
+        session.last_access = time.time()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def save(self, session: ChatSession):
+        """Store (or update) a session and enforce the TTL and memory bounds"""
+        session.last_access = time.time()
+        size = len(session.model_dump_json())
+
+        self._total_bytes += size - self._sizes.get(session.session_id, 0)
+        self._sizes[session.session_id] = size
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        self._evict()
+
+    def _evict(self):
+        """Drop expired sessions, then least recently used ones beyond the bounds"""
+        expiry = time.time() - self.ttl_seconds
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            over_bounds = len(self._sessions) > self.max_sessions or self._total_bytes > self.max_bytes
+            if oldest.last_access >= expiry and not over_bounds:
+                break
+            self._remove(oldest_id)
+
+    def _remove(self, session_id: str):
+        self._sessions.pop(session_id, None)
+        self._total_bytes -= self._sizes.pop(session_id, 0)
+
+
+class SQLiteSessionStore(InMemorySessionStore):
+    """In-memory session cache with write-through SQLite persistence"""
+
+    def __init__(self, db_path: Optional[str] = None, **kwargs):
+        """Open (or create) the session database"""
+        super().__init__(**kwargs)
+        self.db_path = db_path or os.environ.get("CHAT_SESSION_DB_PATH", ".data/chat_sessions.db")
+        if self.db_path != ":memory:":
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS chat_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    last_access REAL NOT NULL,
+                    payload TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_chat_sessions_access ON chat_sessions(last_access);
+            """)
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        session = super().get(session_id)
+        if session is not None:
+            return session
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM chat_sessions WHERE session_id = ? AND last_access >= ?",
+                (session_id, time.time() - self.ttl_seconds)
+            ).fetchone()
+        if row is None:
+            return None
+
+        session = ChatSession.model_validate_json(row[0])
+        super().save(session)
+        return session
+
+    def save(self, session: ChatSession):
+        super().save(session)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions (session_id, last_access, payload) VALUES (?, ?, ?)",
+                (session.session_id, session.last_access, session.model_dump_json())
+            )
+            self._conn.execute(
+                "DELETE FROM chat_sessions WHERE last_access < ?", (time.time() - self.ttl_seconds,)
+            )
+
+
+def create_session_store() -> InMemorySessionStore:
+    """Build the session store selected by CHAT_SESSION_STORE (memory or sqlite)"""
+    backend = os.environ.get("CHAT_SESSION_STORE", "memory").lower()
+    options = {
+        "ttl_seconds": float(os.environ.get("CHAT_SESSION_TTL", "3600")),
+        "max_sessions": int(os.environ.get("CHAT_SESSION_MAX", "1000")),
+        "max_bytes": int(os.environ.get("CHAT_SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+    }
+    if backend == "sqlite":
+        return SQLiteSessionStore(**options)
+    if backend != "memory":
+        raise ValueError(f"Unknown CHAT_SESSION_STORE backend: {backend}")
+    return InMemorySessionStore(**options)
@@ -0,0 +1,196 @@
+"""
+Chat History Compaction
+Keeps chat prompts within a per-model token budget using a cached rolling summary
+"""
+
+import json
+import logging
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from api.utils.chat_engine import ChatProvider, estimate_usage, message_text
+from api.utils.usage_tracking import usage_tracker
+
+logger = logging.getLogger(__name__)
+
+# Prompt token budgets for the conversation history (well below each context window)
+MODEL_TOKEN_BUDGETS = {
+    "gpt-4o": 24000,
+    "gpt-4o-mini": 24000,
+    "mistral-small-latest": 16000,
+    "mistral-large-latest": 24000,
+}
+DEFAULT_TOKEN_BUDGET = 8000
+
+# Rough cost of an image part, whatever its size
+IMAGE_PART_TOKENS = 800
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+# Usage accounting version of the summary prompt below
+SUMMARY_PROMPT_VERSION = "summary-v1"
+
+
+def estimate_tokens(message: Dict) -> int:
+    """Cheap token estimate (~4 characters per token) for a provider message"""
+    content = message.get("content")
+    tokens = 4
+    if isinstance(content, str):
+        tokens += len(content) // 4
+    else:
+        for part in content or []:
+            if part.get("type") == "text":
+                tokens += len(part.get("text", "")) // 4
+            else:
+                tokens += IMAGE_PART_TOKENS
+    for tool_call in message.get("tool_calls") or []:
+        tokens += len(json.dumps(tool_call)) // 4
+    return tokens
+
+
+class HistoryCompactor:
+    """
+    Compacts provider messages before each chat turn
+
+    - System messages and the most recent turns are kept verbatim
+    - Large tool results are truncated
+    - Older turns are replaced by a rolling summary, cached by the digest of the
+      summarized prefix and only recomputed when the window actually shifts
+    """
+
+    def __init__(self, summarizer: Optional[ChatProvider] = None, model: Optional[str] = None,
+                 token_budget: Optional[int] = None, max_tool_result_chars: int = 2000,
+                 low_watermark: float = 0.6, max_cached_summaries: int = 512):
+        """
+        Args:
+            summarizer: Provider used to write summaries (extractive fallback if None)
+            model: Model name used to pick the token budget
+            token_budget: Explicit budget overriding MODEL_TOKEN_BUDGETS
+            max_tool_result_chars: Tool results longer than this are truncated
+            low_watermark: Fraction of the budget kept after a shift, leaving room for later turns
+            max_cached_summaries: Bound of the summary cache
+        """
+        self.summarizer = summarizer
+        self.token_budget = token_budget or MODEL_TOKEN_BUDGETS.get(model or "", DEFAULT_TOKEN_BUDGET)
+        self.max_tool_result_chars = max_tool_result_chars
+        self.low_watermark = low_watermark
+        self.max_cached_summaries = max_cached_summaries
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+
+    async def compact(self, messages: List[Dict]) -> List[Dict]:
+        """Return the messages to send for this turn"""
+        messages = [self._truncate_tool_result(message) for message in messages]
+
+        system_messages = [m for m in messages if m.get("role") == "system"]
+        conversation = [m for m in messages if m.get("role") != "system"]
+        turns = self._split_turns(conversation)
+
+        budget = self.token_budget - sum(estimate_tokens(m) for m in system_messages)
+        turn_tokens = [sum(estimate_tokens(m) for m in turn) for turn in turns]
+        if sum(turn_tokens) <= budget or len(turns) <= 1:
+            return system_messages + conversation
+
+        # Minimal number of leading turns to drop so the rest fits
+        required_cut = 0
+        remaining = sum(turn_tokens)
+        while required_cut < len(turns) - 1 and remaining > budget:
+            remaining -= turn_tokens[required_cut]
+            required_cut += 1
+
+        boundaries = self._boundary_digests(turns)
+
+        # Reuse a previously summarized cut point if it still fits: no recomputation
+        cut = next((c for c in range(required_cut, len(turns)) if boundaries[c] in self._summaries), None)
+        if cut is None:
+            # Shift further than required so the next turns fit without moving the window again
+            cut = required_cut
+            while cut < len(turns) - 1 and remaining > budget * self.low_watermark:
+                remaining -= turn_tokens[cut]
+                cut += 1
+            await self._summarize_prefix(turns, boundaries, cut)
+
+        summary = self._summaries[boundaries[cut]]
+        self._summaries.move_to_end(boundaries[cut])
+
+        summary_message = {"role": "system", "content": SUMMARY_PREFIX + summary}
+        return system_messages + [summary_message] + [m for turn in turns[cut:] for m in turn]
+
+    def _truncate_tool_result(self, message: Dict) -> Dict:
+        """Shorten oversized tool results"""
+        content = message.get("content")
+        if message.get("role") != "tool" or not isinstance(content, str) or len(content) <= self.max_tool_result_chars:
+            return message
+        omitted = len(content) - self.max_tool_result_chars
+        return {**message, "content": f"{content[:self.max_tool_result_chars]}... [truncated {omitted} characters]"}
+
+    @staticmethod
+    def _split_turns(conversation: List[Dict]) -> List[List[Dict]]:
+        """Group messages into turns, each starting at a user message"""
+        turns: List[List[Dict]] = []
+        for message in conversation:
+            if message.get("role") == "user" or not turns:
+                turns.append([])
+            turns[-1].append(message)
+        return turns
+
+    @staticmethod
+    def _boundary_digests(turns: List[List[Dict]]) -> List[str]:
+        """Digest of the conversation prefix before each turn boundary"""
+        digest = hashlib.sha256()
+        boundaries = [digest.hexdigest()]
+        for turn in turns:
+            for message in turn:
+                digest.update(json.dumps(message, sort_keys=True, default=str).encode("utf-8"))
+            boundaries.append(digest.copy().hexdigest())
+        return boundaries
+
+    async def _summarize_prefix(self, turns: List[List[Dict]], boundaries: List[str], cut: int):
+        """Summarize turns[:cut], extending the longest already summarized prefix"""
+        start = next((c for c in range(cut - 1, 0, -1) if boundaries[c] in self._summaries), 0)
+        previous_summary = self._summaries.get(boundaries[start], "") if start else ""
+        new_messages = [m for turn in turns[start:cut] for m in turn]
+
+        summary = await self._write_summary(previous_summary, new_messages)
+
+        self._summaries[boundaries[cut]] = summary
+        while len(self._summaries) > self.max_cached_summaries:
+            self._summaries.popitem(last=False)
+
+    async def _write_summary(self, previous_summary: str, new_messages: List[Dict]) -> str:
+        """Ask the summarizer for an updated summary, falling back to an extractive one"""
+        transcript = "\n".join(
+            f"{m.get('role')}: {message_text(m)[:1000]}" for m in new_messages if message_text(m)
+        )
+
+        if self.summarizer is not None:
+            prompt = (
+                "Update the summary of a tutoring conversation between a medical student and an assistant. "
+                "Keep topics covered, the student's difficulties and any open questions. "
+                "Answer with the summary only, in at most 150 words.\n\n"
+                f"CURRENT SUMMARY:\n{previous_summary or '(none)'}\n\nNEW MESSAGES:\n{transcript}"
+            )
+            model = getattr(self.summarizer, "model", type(self.summarizer).__name__)
+            try:
+                parts = []
+                usage = None
+                async for event in self.summarizer.stream([{"role": "user", "content": prompt}]):
+                    if event["type"] == "text":
+                        parts.append(event["text"])
+                    elif event["type"] == "usage":
+                        usage = event
+                if usage is None:
+                    usage = estimate_usage([{"role": "user", "content": prompt}],
+                                           {"text": "".join(parts), "tool_invocations": []})
+                usage_tracker.record(model, SUMMARY_PROMPT_VERSION, usage["prompt_tokens"], usage["completion_tokens"],
+                                     metered=not usage.get("estimated"))
+                if parts:
+                    return "".join(parts).strip()
+            except Exception as e:
+                logger.warning("⚠️ History summary failed, using extractive fallback: %s", e)
+
+        user_lines = [
+            f"- {message_text(m)[:200]}" for m in new_messages if m.get("role") == "user" and message_text(m)
+        ]
+        return "\n".join(filter(None, [previous_summary] + user_lines))
+
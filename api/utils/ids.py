@@ -0,0 +1,68 @@
+"""
+Deterministic Content IDs
+Stable lesson, exercise and question IDs derived from a digest of their normalized inputs
+"""
+
+import json
+import hashlib
+import unicodedata
+from typing import Any, Dict, Iterable, List
+
+from api.models.lesson_models import ProgramMapping, UserContext
+
+# Hex characters kept from the SHA-256 digest (64 bits: collisions stay negligible at millions of IDs)
+DIGEST_CHARS = 16
+
+
+def normalize_text(value: str) -> str:
+    """Unicode-normalized, case-folded text with collapsed whitespace"""
+    return " ".join(unicodedata.normalize("NFKC", value).casefold().split())
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return normalize_text(value)
+    if isinstance(value, dict):
+        return {str(key): _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def stable_digest(*parts: Any) -> str:
+    """Digest of JSON-serializable parts, independent of the process, hash seed and key order"""
+    canonical = json.dumps(_normalize(list(parts)), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:DIGEST_CHARS]
+
+
+def personalization_fingerprint(user_context: UserContext, prompt_version: str = "") -> str:
+    """
+    Fingerprint of everything that makes a lesson user-specific
+
+    Users at the same level without weak concepts share the base lesson, so they share a fingerprint.
+    """
+    if not user_context.weak_concepts:
+        return f"base:{normalize_text(user_context.current_level)}"
+    return stable_digest(user_context.current_level, sorted(_normalize(user_context.weak_concepts)), prompt_version)
+
+
+def make_lesson_id(topic: str, topic_mapping: ProgramMapping, fingerprint: str, prompt_version: str) -> str:
+    """ID of the lesson generated for a topic, program mapping, personalization and prompt version"""
+    return "lesson_" + stable_digest(
+        topic, topic_mapping.category, topic_mapping.subcategory, topic_mapping.semester, fingerprint, prompt_version
+    )
+
+
+def make_exercise_id(lesson_id: str, question_ids: Iterable[str]) -> str:
+    """ID of the exercise grouping these questions of a lesson"""
+    return "ex_" + stable_digest(lesson_id, list(question_ids))
+
+
+def make_question_id(question: Dict) -> str:
+    """ID of a question from its content (text, options and answer), so a question keeps its ID across lessons"""
+    options: List[Dict] = question.get("options") or []
+    return "q_" + stable_digest(
+        question.get("text", ""),
+        [[option.get("id", ""), option.get("text", "")] for option in options if isinstance(option, dict)],
+        question.get("correct_answer", "")
+    )
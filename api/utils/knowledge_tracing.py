@@ -0,0 +1,336 @@
+"""
+Knowledge Tracing Service
+Records student answers in a durable log and keeps per-concept mastery up to date
+using Bayesian Knowledge Tracing (BKT)
+"""
+
+import os
+import json
+import sqlite3
+import datetime
+import threading
+from typing import List, Dict, Optional
+
+from api.models.lesson_models import UserContext, Question, AnswerEvent
+
+
+class KnowledgeTracingService:
+    """
+    SQLite-backed answer log and mastery store
+    The server-side source of truth for UserContext personalization
+    """
+
+    # BKT parameters (4-option QCM => guess of 0.25)
+    P_INIT = 0.3
+    P_TRANSIT = 0.1
+    P_GUESS = 0.25
+    P_SLIP = 0.1
+
+    WEAK_THRESHOLD = 0.6
+    MAX_WEAK_CONCEPTS = 5
+    MAX_ERROR_PATTERNS = 5
+    MIN_ATTEMPTS_FOR_LEVEL = 5
+    VELOCITY_ALPHA = 0.1
+
+    def __init__(self, db_path: Optional[str] = None):
+        """Open (or create) the knowledge tracing database"""
+        self.db_path = db_path or os.environ.get("KNOWLEDGE_DB_PATH", ".data/knowledge.db")
+        if self.db_path != ":memory:":
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        """Create tables for the answer log, question registry and mastery state"""
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS answer_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    question_id TEXT NOT NULL,
+                    chosen_option TEXT NOT NULL,
+                    correct INTEGER,
+                    latency_ms INTEGER NOT NULL,
+                    answered_at TEXT,
+                    recorded_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_answer_events_user ON answer_events(user_id);
+
+                CREATE TABLE IF NOT EXISTS questions (
+                    question_id TEXT PRIMARY KEY,
+                    topic TEXT NOT NULL,
+                    concepts TEXT NOT NULL,
+                    correct_answer TEXT NOT NULL,
+                    difficulty TEXT,
+                    updated_at TEXT NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS concept_mastery (
+                    user_id TEXT NOT NULL,
+                    concept TEXT NOT NULL,
+                    p_known REAL NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    correct INTEGER NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (user_id, concept)
+                );
+
+                CREATE TABLE IF NOT EXISTS user_profiles (
+                    user_id TEXT PRIMARY KEY,
+                    learning_velocity REAL NOT NULL,
+                    error_patterns TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                );
+            """)
+
+        # Near-duplicate detector on this database (imports numpy). Its tables are created here, on their own:
+        # executescript commits, so it must never run inside a registry transaction
+        from api.utils.question_dedupe import QuestionDeduplicator
+        with self._lock:
+            self.deduplicator = QuestionDeduplicator(self._conn)
+
+    # =========================================================================
+    # QUESTION REGISTRY
+    # =========================================================================
+
+    def register_questions(self, questions: List[Question], concepts: Optional[List[str]] = None) -> Dict[str, str]:
+        """
+        Remember served questions so later answers can be graded server-side
+
+        Args:
+            questions: Questions of the served exercise
+            concepts: The exercise's target concepts, credited by every answer (the topic alone when empty)
+
+        Returns:
+            Dict mapping each question ID to its canonical ID (itself unless it near-duplicates a known question)
+        """
+        if not questions:
+            return {}
+
+        now = datetime.datetime.now().isoformat()
+        rows = [
+            (q.question_id, q.topic, json.dumps(list(dict.fromkeys(c for c in concepts or [q.topic] if c))),
+             q.correct_answer, q.difficulty, now)
+            for q in questions
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO questions "
+                "(question_id, topic, concepts, correct_answer, difficulty, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            return {
+                q.question_id: self.deduplicator.canonicalize(
+                    q.question_id, q.text, [option.get("text", "") for option in q.options],
+                    answer=next((option.get("text", "") for option in q.options
+                                 if option.get("id") == q.correct_answer), q.correct_answer)
+                )
+                for q in questions
+            }
+
+    def get_question_stats(self, limit: int = 50) -> List[Dict]:
+        """Answer counts and success rate per canonical question, most answered first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT COALESCE(a.canonical_id, e.question_id) AS canonical, COUNT(*), SUM(e.correct), "
+                "COUNT(DISTINCT e.question_id) "
+                "FROM answer_events e LEFT JOIN question_aliases a ON a.question_id = e.question_id "
+                "WHERE e.correct IS NOT NULL GROUP BY canonical ORDER BY COUNT(*) DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            {"canonical_id": canonical, "answers": answers, "correct": correct,
+             "success_rate": round(correct / answers, 4), "variants": variants}
+            for canonical, answers, correct, variants in rows
+        ]
+
+    # =========================================================================
+    # ANSWER INGESTION
+    # =========================================================================
+
+    def record_answers(self, user_id: str, events: List[AnswerEvent]) -> Dict:
+        """
+        Append a batch of answers to the log and update mastery incrementally
+
+        The whole batch is written in a single transaction.
+
+        Returns:
+            Dict with the number of graded events and the unknown question IDs
+        """
+        now = datetime.datetime.now().isoformat()
+        unknown_questions = []
+        graded = 0
+
+        with self._lock, self._conn:
+            question_ids = list({event.question_id for event in events})
+            questions = self._load_questions(question_ids)
+            mastery = self._load_mastery(user_id)
+            velocity, error_patterns = self._load_profile(user_id)
+
+            log_rows = []
+            for event in events:
+                question = questions.get(event.question_id)
+                if question is None:
+                    unknown_questions.append(event.question_id)
+                    log_rows.append((user_id, event.question_id, event.chosen_option, None,
+                                     event.latency_ms, event.answered_at, now))
+                    continue
+
+                correct = event.chosen_option.strip().lower() == question["correct_answer"].strip().lower()
+                log_rows.append((user_id, event.question_id, event.chosen_option, int(correct),
+                                 event.latency_ms, event.answered_at, now))
+                graded += 1
+
+                for concept in question["concepts"]:
+                    state = mastery.setdefault(concept, {"p_known": self.P_INIT, "attempts": 0, "correct": 0})
+                    state["p_known"] = self._bkt_update(state["p_known"], correct)
+                    state["attempts"] += 1
+                    state["correct"] += int(correct)
+                    state["dirty"] = True
+
+                    if not correct:
+                        if concept in error_patterns:
+                            error_patterns.remove(concept)
+                        error_patterns.insert(0, concept)
+
+                velocity = (1 - self.VELOCITY_ALPHA) * velocity + self.VELOCITY_ALPHA * float(correct)
+
+            self._conn.executemany(
+                "INSERT INTO answer_events "
+                "(user_id, question_id, chosen_option, correct, latency_ms, answered_at, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                log_rows
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO concept_mastery "
+                "(user_id, concept, p_known, attempts, correct, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (user_id, concept, state["p_known"], state["attempts"], state["correct"], now)
+                    for concept, state in mastery.items() if state.get("dirty")
+                ]
+            )
+            if graded:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO user_profiles "
+                    "(user_id, learning_velocity, error_patterns, updated_at) VALUES (?, ?, ?, ?)",
+                    (user_id, velocity, json.dumps(error_patterns[:self.MAX_ERROR_PATTERNS]), now)
+                )
+
+        return {"graded": graded, "unknown_questions": unknown_questions}
+
+    def _bkt_update(self, p_known: float, correct: bool) -> float:
+        """Single Bayesian Knowledge Tracing step: posterior given the answer, then learning transition"""
+        if correct:
+            evidence = p_known * (1 - self.P_SLIP)
+            posterior = evidence / (evidence + (1 - p_known) * self.P_GUESS)
+        else:
+            evidence = p_known * self.P_SLIP
+            posterior = evidence / (evidence + (1 - p_known) * (1 - self.P_GUESS))
+        return posterior + (1 - posterior) * self.P_TRANSIT
+
+    def _load_questions(self, question_ids: List[str]) -> Dict[str, Dict]:
+        """Fetch registered questions by ID"""
+        if not question_ids:
+            return {}
+        placeholders = ",".join("?" for _ in question_ids)
+        rows = self._conn.execute(
+            f"SELECT question_id, concepts, correct_answer FROM questions WHERE question_id IN ({placeholders})",
+            question_ids
+        ).fetchall()
+        return {
+            question_id: {"concepts": json.loads(concepts), "correct_answer": correct_answer}
+            for question_id, concepts, correct_answer in rows
+        }
+
+    def _load_mastery(self, user_id: str) -> Dict[str, Dict]:
+        """Fetch the per-concept mastery state of a user"""
+        rows = self._conn.execute(
+            "SELECT concept, p_known, attempts, correct FROM concept_mastery WHERE user_id = ?",
+            (user_id,)
+        ).fetchall()
+        return {
+            concept: {"p_known": p_known, "attempts": attempts, "correct": correct}
+            for concept, p_known, attempts, correct in rows
+        }
+
+    def _load_profile(self, user_id: str):
+        """Fetch learning velocity and recent error patterns of a user"""
+        row = self._conn.execute(
+            "SELECT learning_velocity, error_patterns FROM user_profiles WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+        if row is None:
+            return UserContext.model_fields["learning_velocity"].default, []
+        return row[0], json.loads(row[1])
+
+    # =========================================================================
+    # USER CONTEXT
+    # =========================================================================
+
+    def get_user_context(self, user_id: str) -> Optional[UserContext]:
+        """Build the current UserContext from stored state, or None for unknown users"""
+        with self._lock:
+            mastery = self._load_mastery(user_id)
+            velocity, error_patterns = self._load_profile(user_id)
+
+        if not mastery:
+            return None
+
+        weak_concepts = sorted(
+            (concept for concept, state in mastery.items() if state["p_known"] < self.WEAK_THRESHOLD),
+            key=lambda concept: mastery[concept]["p_known"]
+        )[:self.MAX_WEAK_CONCEPTS]
+
+        return UserContext(
+            user_id=user_id,
+            current_level=self._estimate_level(mastery),
+            concept_mastery={concept: round(state["p_known"], 4) for concept, state in mastery.items()},
+            weak_concepts=weak_concepts,
+            learning_velocity=round(velocity, 4),
+            error_patterns=error_patterns
+        )
+
+    def resolve_user_context(self, user_context: UserContext) -> UserContext:
+        """Prefer server-side state over the client-provided context when the user is known"""
+        server_context = self.get_user_context(user_context.user_id)
+        if server_context is None:
+            return user_context
+        server_context.learning_style = user_context.learning_style
+        return server_context
+
+    def _estimate_level(self, mastery: Dict[str, Dict]) -> str:
+        """Map average mastery to a student level"""
+        attempts = sum(state["attempts"] for state in mastery.values())
+        if attempts < self.MIN_ATTEMPTS_FOR_LEVEL:
+            return UserContext.model_fields["current_level"].default
+
+        average = sum(state["p_known"] for state in mastery.values()) / len(mastery)
+        if average < 0.4:
+            return "beginner"
+        if average < 0.75:
+            return "intermediate"
+        return "advanced"
+
+    def close(self):
+        """Close the database connection"""
+        self._conn.close()
+
+
+# =============================================================================
+# SHARED INSTANCE
+# =============================================================================
+
+_knowledge_service: Optional[KnowledgeTracingService] = None
+
+
+def get_knowledge_service() -> KnowledgeTracingService:
+    """Return the process-wide knowledge tracing service"""
+    global _knowledge_service
+    if _knowledge_service is None:
+        _knowledge_service = KnowledgeTracingService()
+    return _knowledge_service
@@ -0,0 +1,268 @@
+"""
+Lesson Cache
+In-process LRU cache with TTL and single-flight generation, over an optional SQLite tier shared by workers
+"""
+
+import os
+import copy
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+# =============================================================================
+# SHARED DISK TIER
+# =============================================================================
+
+class SharedDiskCache:
+    """
+    SQLite key-value cache shared by the worker processes of one host
+
+    - Values are JSON, written in one transaction (readers never see partial entries)
+    - Size cap with LRU eviction on last access (access times are refreshed at most once a minute)
+    - Leases: one worker at a time may generate a missing key; the others wait for its result
+    - Survives restarts; expired entries are purged on write
+    """
+
+    TOUCH_INTERVAL = 60.0
+
+    def __init__(self, db_path: Optional[str] = None, max_bytes: Optional[int] = None):
+        """Open (or create) the cache database"""
+        self.db_path = db_path or os.environ.get("BASE_LESSON_CACHE_DB_PATH", ".data/lesson_cache.db")
+        self.max_bytes = max_bytes or int(os.environ.get("BASE_LESSON_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        if self.db_path != ":memory:":
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_cache_entries_access ON cache_entries(last_access);
+                CREATE TABLE IF NOT EXISTS cache_leases (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+            """)
+
+    @staticmethod
+    def encode_key(key: Hashable) -> str:
+        """Stable text form of a cache key (tuples of strings)"""
+        return json.dumps(list(key) if isinstance(key, tuple) else key, ensure_ascii=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache_entries WHERE key = ? AND expires_at >= ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE cache_entries SET last_access = ? WHERE key = ? AND last_access < ?",
+                    (now, key, now - self.TOUCH_INTERVAL)
+                )
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        """Store a value, then evict expired and least recently used entries beyond the size cap"""
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, size, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now + ttl_seconds, now)
+            )
+            self._conn.execute("DELETE FROM cache_entries WHERE expires_at < ?", (now,))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                victims, freed = [], 0
+                for victim, size in self._conn.execute(
+                        "SELECT key, size FROM cache_entries ORDER BY last_access"):
+                    if freed >= excess:
+                        break
+                    victims.append((victim,))
+                    freed += size
+                self._conn.executemany("DELETE FROM cache_entries WHERE key = ?", victims)
+
+    def acquire_lease(self, key: str, owner: str, ttl_seconds: float) -> bool:
+        """Take the generation lease of a key unless another owner holds a live one"""
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO cache_leases (key, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE cache_leases.expires_at < ? OR cache_leases.owner = excluded.owner",
+                (key, owner, now + ttl_seconds, now)
+            )
+        return cursor.rowcount == 1
+
+    def release_lease(self, key: str, owner: str):
+        """Give a lease back (only its owner can)"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache_leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def stats(self) -> Dict[str, int]:
+        """Entry count and stored bytes"""
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+            ).fetchone()
+        return {"entries": count, "bytes": size}
+
+
+# =============================================================================
+# IN-PROCESS CACHE
+# =============================================================================
+
+class LessonCache:
+    """
+    Bounded LRU cache for generated lesson data
+    Concurrent requests for the same missing key share a single generation
+
+    With a `shared` tier, misses are looked up on disk first and only the worker
+    holding the key's lease generates it; the others poll for its result.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 24 * 3600,
+                 shared: Optional[SharedDiskCache] = None, lease_seconds: float = 120.0,
+                 poll_interval: float = 0.25):
+        """Initialize an empty cache"""
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a copy of the cached value, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entries beyond capacity"""
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def contains(self, key: Hashable) -> bool:
+        """Check whether a fresh value is cached for the key"""
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] >= time.monotonic()
+
+    def is_in_flight(self, key: Hashable) -> bool:
+        """Check whether the value for the key is currently being generated"""
+        return key in self._in_flight
+
+    async def get_or_create(self, key: Hashable, factory: Callable[[], Awaitable[Any]],
+                            cacheable: Callable[[Any], bool] = lambda value: True) -> Any:
+        """
+        Return the cached value or generate it once
+
+        Args:
+            key: Cache key
+            factory: Coroutine function producing the value on a miss
+            cacheable: Predicate deciding whether a generated value may be stored
+                       (e.g. to skip fallback content)
+        """
+        while True:
+            value = self.get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                break
+            # asyncio.wait neither cancels the shared future nor raises when the leader was cancelled
+            await asyncio.wait({in_flight})
+            if not in_flight.cancelled():
+                self.hits += 1
+                return copy.deepcopy(in_flight.result())
+            # The leader was cancelled (e.g. client disconnect): retry, possibly as the new leader
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            if self.shared is None:
+                self.misses += 1
+                value = await factory()
+                stored = cacheable(value)
+            else:
+                value, stored = await self._get_or_create_shared(key, factory, cacheable)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved when nobody else is waiting
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+        if stored:
+            self.set(key, value)
+        future.set_result(value)
+        return copy.deepcopy(value)
+
+    async def _get_or_create_shared(self, key: Hashable, factory: Callable[[], Awaitable[Any]],
+                                    cacheable: Callable[[Any], bool]) -> tuple:
+        """(value, cacheable) from the shared tier, or generated under the key's lease"""
+        shared_key = self.shared.encode_key(key)
+        deadline = time.monotonic() + self.lease_seconds
+        leased = False
+        while True:
+            value = await asyncio.to_thread(self.shared.get, shared_key)
+            if value is not None:
+                self.shared_hits += 1
+                return value, True
+            leased = await asyncio.to_thread(self.shared.acquire_lease, shared_key, self._owner, self.lease_seconds)
+            # Another worker is generating it: wait for its result (or for its lease to lapse)
+            if leased or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(self.poll_interval)
+
+        self.misses += 1
+        try:
+            value = await factory()
+            stored = cacheable(value)
+            if stored:
+                await asyncio.to_thread(self.shared.set, shared_key, value, self.ttl_seconds)
+        finally:
+            if leased:
+                await asyncio.to_thread(self.shared.release_lease, shared_key, self._owner)
+        return value, stored
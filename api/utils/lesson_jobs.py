@@ -0,0 +1,509 @@
+"""
+Lesson Job Queue
+Runs lesson generation in a background worker pool so HTTP requests return immediately
+"""
+
+import os
+import logging
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import contextvars
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from api.models.lesson_models import LessonJob, LessonJobStatus, LessonRequest
+from api.utils.structured_logging import bind_request_id, get_request_id
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = (LessonJobStatus.SUCCEEDED, LessonJobStatus.FAILED)
+
+
+# =============================================================================
+# JOB STORES
+# =============================================================================
+
+class JobStore(ABC):
+    """Storage backend for lesson jobs"""
+
+    @abstractmethod
+    def create(self, job: LessonJob):
+        """Persist a new job"""
+
+    @abstractmethod
+    def update(self, job: LessonJob):
+        """Persist the current state of an existing job"""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[LessonJob]:
+        """Fetch a job by ID, or None if missing or expired"""
+
+    @abstractmethod
+    def find_reusable(self, dedup_key: str) -> Optional[LessonJob]:
+        """Find a live (queued, running under a valid lease, or succeeded) job for the same request"""
+
+    @abstractmethod
+    def claim(self, owner: str, lease_seconds: float, max_attempts: int) -> Optional[LessonJob]:
+        """
+        Mark the oldest runnable job as running under a lease held by `owner` and return it
+
+        Runnable jobs are queued jobs and running jobs whose lease lapsed (their worker died).
+        Jobs that already used `max_attempts` attempts are marked failed instead.
+        """
+
+    @abstractmethod
+    def renew(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """Extend the lease of a running job; False if the lease is no longer held by `owner`"""
+
+    @abstractmethod
+    def release(self, job: LessonJob):
+        """Put a running job back in the queue (its worker is shutting down)"""
+
+    @abstractmethod
+    def queued_count(self) -> int:
+        """Number of jobs waiting for a worker"""
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Delete expired jobs and return how many were removed"""
+
+
+class InMemoryJobStore(JobStore):
+    """Process-local job store (default)"""
+
+    def __init__(self):
+        """Initialize empty indexes"""
+        self._jobs: Dict[str, LessonJob] = {}
+        self._by_key: Dict[str, str] = {}
+        self._queued: deque = deque()
+
+    def create(self, job: LessonJob):
+        self._jobs[job.job_id] = job
+        self._by_key[job.dedup_key] = job.job_id
+        self._queued.append(job.job_id)
+
+    def update(self, job: LessonJob):
+        self._jobs[job.job_id] = job
+
+    def get(self, job_id: str) -> Optional[LessonJob]:
+        job = self._jobs.get(job_id)
+        if job is None or job.expires_at < time.time():
+            return None
+        return job
+
+    def find_reusable(self, dedup_key: str) -> Optional[LessonJob]:
+        job_id = self._by_key.get(dedup_key)
+        job = self.get(job_id) if job_id else None
+        if job is None or job.status == LessonJobStatus.FAILED:
+            return None
+        return job
+
+    def claim(self, owner: str, lease_seconds: float, max_attempts: int) -> Optional[LessonJob]:
+        # Jobs die with the process, so leases never lapse here
+        while self._queued:
+            job = self.get(self._queued.popleft())
+            if job is None or job.status != LessonJobStatus.QUEUED:
+                continue
+            job.status = LessonJobStatus.RUNNING
+            job.started_at = time.time()
+            job.attempts += 1
+            return job
+        return None
+
+    def renew(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        return job_id in self._jobs
+
+    def release(self, job: LessonJob):
+        job.status = LessonJobStatus.QUEUED
+        self._queued.appendleft(job.job_id)
+
+    def queued_count(self) -> int:
+        return len(self._queued)
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        expired = [job for job in self._jobs.values() if job.expires_at < now]
+        for job in expired:
+            del self._jobs[job.job_id]
+            if self._by_key.get(job.dedup_key) == job.job_id:
+                del self._by_key[job.dedup_key]
+        return len(expired)
+
+
+class SQLiteJobStore(JobStore):
+    """SQLite job store, readable by every worker process on the host"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """Open (or create) the job database"""
+        self.db_path = db_path or os.environ.get("LESSON_JOB_DB_PATH", ".data/lesson_jobs.db")
+        if self.db_path != ":memory:":
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS lesson_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    dedup_key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    payload TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_lesson_jobs_key ON lesson_jobs(dedup_key);
+                CREATE INDEX IF NOT EXISTS idx_lesson_jobs_expiry ON lesson_jobs(expires_at);
+            """)
+            # Lease columns (added after the first release of this table)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(lesson_jobs)")}
+            if "lease_owner" not in columns:
+                self._conn.execute("ALTER TABLE lesson_jobs ADD COLUMN lease_owner TEXT")
+            if "lease_expires_at" not in columns:
+                self._conn.execute("ALTER TABLE lesson_jobs ADD COLUMN lease_expires_at REAL")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_lesson_jobs_status ON lesson_jobs(status)")
+
+    def _write(self, job: LessonJob, lease_owner: Optional[str] = None, lease_expires_at: Optional[float] = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO lesson_jobs "
+                "(job_id, dedup_key, status, expires_at, payload, lease_owner, lease_expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job.job_id, job.dedup_key, job.status.value, job.expires_at, job.model_dump_json(),
+                 lease_owner, lease_expires_at)
+            )
+
+    def create(self, job: LessonJob):
+        self._write(job)
+
+    def update(self, job: LessonJob):
+        self._write(job)
+
+    def get(self, job_id: str) -> Optional[LessonJob]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM lesson_jobs WHERE job_id = ? AND expires_at >= ?",
+                (job_id, time.time())
+            ).fetchone()
+        return LessonJob.model_validate_json(row[0]) if row else None
+
+    def find_reusable(self, dedup_key: str) -> Optional[LessonJob]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM lesson_jobs WHERE dedup_key = ? AND status != ? AND expires_at >= ? "
+                "AND NOT (status = ? AND COALESCE(lease_expires_at, 0) < ?) "
+                "ORDER BY expires_at DESC LIMIT 1",
+                (dedup_key, LessonJobStatus.FAILED.value, now, LessonJobStatus.RUNNING.value, now)
+            ).fetchone()
+        return LessonJob.model_validate_json(row[0]) if row else None
+
+    def claim(self, owner: str, lease_seconds: float, max_attempts: int) -> Optional[LessonJob]:
+        while True:
+            now = time.time()
+            with self._lock, self._conn:
+                row = self._conn.execute(
+                    "SELECT payload, COALESCE(lease_expires_at, 0) FROM lesson_jobs "
+                    "WHERE expires_at >= ? AND (status = ? OR (status = ? AND COALESCE(lease_expires_at, 0) < ?)) "
+                    "ORDER BY expires_at LIMIT 1",
+                    (now, LessonJobStatus.QUEUED.value, LessonJobStatus.RUNNING.value, now)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                job = LessonJob.model_validate_json(row[0])
+                previous_status, previous_lease = job.status.value, row[1]
+                if job.attempts >= max_attempts:
+                    job.status = LessonJobStatus.FAILED
+                    job.error = f"Abandoned after {job.attempts} attempts (worker lost)"
+                    job.finished_at = now
+                    lease_owner, lease_expires_at = None, None
+                else:
+                    job.status = LessonJobStatus.RUNNING
+                    job.started_at = now
+                    job.attempts += 1
+                    lease_owner, lease_expires_at = owner, now + lease_seconds
+
+                # Guarded on the state we read, so two processes never claim the same job
+                cursor = self._conn.execute(
+                    "UPDATE lesson_jobs SET status = ?, payload = ?, lease_owner = ?, lease_expires_at = ? "
+                    "WHERE job_id = ? AND status = ? AND COALESCE(lease_expires_at, 0) = ?",
+                    (job.status.value, job.model_dump_json(), lease_owner, lease_expires_at,
+                     job.job_id, previous_status, previous_lease)
+                )
+            if cursor.rowcount and job.status == LessonJobStatus.RUNNING:
+                if previous_status == LessonJobStatus.RUNNING.value:
+                    logger.warning("⚠️ Lesson job %s lease lapsed, retrying (attempt %s)", job.job_id, job.attempts)
+                return job
+            if cursor.rowcount:
+                logger.error("❌ Lesson job %s failed: %s", job.job_id, job.error)
+
+    def renew(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE lesson_jobs SET lease_expires_at = ? WHERE job_id = ? AND lease_owner = ? AND status = ?",
+                (time.time() + lease_seconds, job_id, owner, LessonJobStatus.RUNNING.value)
+            )
+        return cursor.rowcount > 0
+
+    def release(self, job: LessonJob):
+        job.status = LessonJobStatus.QUEUED
+        self._write(job)
+
+    def queued_count(self) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM lesson_jobs WHERE status = ? AND expires_at >= ?",
+                (LessonJobStatus.QUEUED.value, time.time())
+            ).fetchone()
+        return row[0]
+
+    def purge_expired(self) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM lesson_jobs WHERE expires_at < ?", (time.time(),))
+        return cursor.rowcount
+
+
+# =============================================================================
+# JOB QUEUE
+# =============================================================================
+
+class LessonJobQueue:
+    """
+    Asyncio worker pool for lesson generation jobs
+    Identical requests are deduplicated onto the same job while it is live
+
+    Workers claim jobs from the store under a lease they keep renewing, so jobs
+    queued or left running by a process that died are picked up by any live worker.
+    """
+
+    WAIT_SAMPLES = 1000
+
+    def __init__(self, store: JobStore, runner: Callable[[LessonRequest], Awaitable[Dict]],
+                 workers: int = 4, ttl_seconds: float = 3600, lease_seconds: float = 60,
+                 max_attempts: int = 3, poll_interval: float = 1.0):
+        """
+        Args:
+            store: Job storage backend
+            runner: Coroutine function producing the job result for a request
+            workers: Number of concurrent worker tasks
+            ttl_seconds: How long jobs (and their results) are kept after creation or completion
+            lease_seconds: How long a running job stays claimed without a heartbeat from its worker
+            max_attempts: Claims of the same job before it is marked failed
+            poll_interval: Seconds between store checks when no job was submitted in this process
+        """
+        self.store = store
+        self.runner = runner
+        self.workers = workers
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+
+        self._owner = uuid.uuid4().hex
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks = []
+        self._changed: Dict[str, asyncio.Event] = {}
+
+        self.running = 0
+        self.submitted = 0
+        self.deduplicated = 0
+        self.succeeded = 0
+        self.failed = 0
+        self._wait_times: deque = deque(maxlen=self.WAIT_SAMPLES)
+        self._run_times: deque = deque(maxlen=self.WAIT_SAMPLES)
+
+    @staticmethod
+    def dedup_key(request: LessonRequest) -> str:
+        """Stable key identifying identical lesson requests"""
+        normalized = {
+            "topic": request.topic.lower().strip(),
+            "user_context": request.user_context.model_dump()
+        }
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def start(self):
+        """Start the worker pool on the running event loop, replacing workers that died"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._tasks = []
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            # Not the context of the request that started the pool: its request ID and usage tags would stick
+            self._tasks.append(loop.create_task(self._worker(), context=contextvars.Context()))
+
+    async def stop(self):
+        """Cancel the workers; their running jobs go back to the queue"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def submit(self, request: LessonRequest) -> Tuple[LessonJob, bool]:
+        """
+        Submit a lesson request
+
+        Returns:
+            The job and whether it was deduplicated onto an existing job
+        """
+        self.start()
+        self.store.purge_expired()
+
+        dedup_key = self.dedup_key(request)
+        existing = self.store.find_reusable(dedup_key)
+        if existing is not None:
+            self.deduplicated += 1
+            return existing, True
+
+        now = time.time()
+        job = LessonJob(
+            job_id=uuid.uuid4().hex,
+            dedup_key=dedup_key,
+            request=request,
+            created_at=now,
+            expires_at=now + self.ttl_seconds,
+            request_id=get_request_id()
+        )
+        self.store.create(job)
+        self.submitted += 1
+        self._wakeup.set()
+        return job, False
+
+    def get(self, job_id: str) -> Optional[LessonJob]:
+        """Fetch a job by ID"""
+        return self.store.get(job_id)
+
+    async def wait_for_change(self, job_id: str, timeout: float):
+        """Wait until the job changes state in this process, or the timeout elapses"""
+        await _wait_event(self._changed.setdefault(job_id, asyncio.Event()), timeout)
+
+    def _wake(self, job_id: str):
+        """Wake up subscribers of a job"""
+        event = self._changed.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def _notify(self, job: LessonJob):
+        """Persist a job update and wake up subscribers"""
+        self.store.update(job)
+        self._wake(job.job_id)
+
+    async def _worker(self):
+        """Claim jobs from the store and run them, sleeping until a submit or the next poll when idle"""
+        while True:
+            # Cleared before claiming so a submit landing during the claim is not missed
+            self._wakeup.clear()
+            try:
+                job = self.store.claim(self._owner, self.lease_seconds, self.max_attempts)
+            except Exception as e:
+                logger.error("❌ Lesson job claim failed: %s", e)
+                job = None
+            if job is not None:
+                # Each job runs in its own context, attributed to the request that submitted it
+                await asyncio.get_running_loop().create_task(self._run(job), context=contextvars.Context())
+                continue
+            await _wait_event(self._wakeup, self.poll_interval)
+
+    async def _heartbeat(self, job_id: str):
+        """Renew the lease of a running job until cancelled"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not self.store.renew(job_id, self._owner, self.lease_seconds):
+                    logger.warning("⚠️ Lost the lease of lesson job %s", job_id)
+            except Exception as e:
+                logger.error("❌ Lease renewal failed for lesson job %s: %s", job_id, e)
+
+    async def _run(self, job: LessonJob):
+        """Run one claimed job and record its outcome"""
+        bind_request_id(job.request_id or f"job-{job.job_id[:12]}")
+        self._wait_times.append(job.started_at - job.created_at)
+        self.running += 1
+        self._wake(job.job_id)
+        heartbeat = asyncio.create_task(self._heartbeat(job.job_id))
+
+        try:
+            job.result = await self.runner(job.request)
+            job.status = LessonJobStatus.SUCCEEDED
+            self.succeeded += 1
+        except asyncio.CancelledError:
+            # Shutting down: hand the job to the next worker
+            self.store.release(job)
+            raise
+        except Exception as e:
+            logger.error("❌ Lesson job %s failed: %s", job.job_id, e)
+            job.error = str(e)
+            job.status = LessonJobStatus.FAILED
+            self.failed += 1
+        finally:
+            self.running -= 1
+            heartbeat.cancel()
+
+        job.finished_at = time.time()
+        job.expires_at = job.finished_at + self.ttl_seconds
+        self._run_times.append(job.finished_at - job.started_at)
+        self._notify(job)
+
+    def metrics(self) -> Dict:
+        """Queue depth, throughput counters and wait/run time statistics"""
+        return {
+            "queue_depth": self.store.queued_count(),
+            "running": self.running,
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "wait_seconds": _summarize(self._wait_times),
+            "run_seconds": _summarize(self._run_times)
+        }
+
+
+async def _wait_event(event: asyncio.Event, timeout: float):
+    """
+    Wait until the event is set or the timeout elapses
+
+    Not asyncio.wait_for: on Python 3.11 it swallows a cancellation that lands as the event is set,
+    which left stopped workers polling forever.
+    """
+    waiter = asyncio.ensure_future(event.wait())
+    try:
+        await asyncio.wait({waiter}, timeout=timeout)
+    finally:
+        waiter.cancel()
+
+
+def _summarize(samples) -> Dict:
+    """Mean and percentiles of recent duration samples"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 4)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 4),
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "max": round(ordered[-1], 4)
+    }
+
+
+def create_job_store() -> JobStore:
+    """Build the job store selected by LESSON_JOB_STORE (memory or sqlite)"""
+    backend = os.environ.get("LESSON_JOB_STORE", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteJobStore()
+    if backend != "memory":
+        raise ValueError(f"Unknown LESSON_JOB_STORE backend: {backend}")
+    return InMemoryJobStore()
@@ -0,0 +1,477 @@
+"""
+Packed Lesson Store
+Append-only pack of compressed lesson records with a sidecar offset index and memory-mapped reads
+"""
+
+import os
+import io
+import json
+import mmap
+import uuid
+import zlib
+import struct
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# FORMAT
+# ============================================================================
+#
+# <name>.pack   MAGIC | header length (uint32) | JSON header | dictionary | records
+#               record = compressed length (uint32) | raw length (uint32) | payload
+# <name>.idx    JSON lines: the pack header first, then one entry per appended record
+#
+# Payloads are the compact UTF-8 JSON of one stored lesson (the shape written to
+# ressources/data), so a record can be served over HTTP without re-encoding.
+# A newer record for the same topic supersedes the older ones; compact() drops them.
+
+MAGIC = b"ADMPACK1"
+RECORD_HEADER = struct.Struct("<II")
+ZLIB_DICTIONARY_BYTES = 32 * 1024
+
+
+@lru_cache(maxsize=1)
+def _load_zstandard():
+    """The zstandard module, imported on first use (None if it is not installed)"""
+    try:
+        import zstandard
+    except ImportError:  # zstandard is optional: packs then use zlib
+        return None
+    return zstandard
+
+
+def default_codec() -> str:
+    """
+    LESSON_PACK_CODEC, zlib by default
+
+    zstd is opt-in: a pack written with it can only be read where zstandard is installed,
+    which requirements.txt does not guarantee.
+    """
+    codec = os.environ.get("LESSON_PACK_CODEC", "").lower()
+    return "zstd" if codec == "zstd" else "zlib"
+
+
+def topic_key(topic: str) -> str:
+    """Normalized topic used to detect superseded versions"""
+    return " ".join(topic.lower().split())
+
+
+def encode_lesson(lesson_data: Dict) -> bytes:
+    """Compact UTF-8 JSON of a stored lesson"""
+    return json.dumps(lesson_data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+@dataclass
+class PackEntry:
+    """Location and identity of one record in the pack"""
+    lesson_id: str
+    topic: str
+    offset: int
+    length: int
+    size: int
+    sha: str
+    generated_at: str = ""
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.sha[:32]}"'
+
+
+class _Codec:
+    """Per-pack compressor and decompressor, bound to the pack's dictionary"""
+
+    def __init__(self, name: str, dictionary: bytes = b"", level: Optional[int] = None):
+        self.name = name
+        self.dictionary = dictionary
+        if name == "zstd":
+            zstandard = _load_zstandard()
+            if zstandard is None:
+                raise RuntimeError("This lesson pack is zstd-compressed; install zstandard to read it")
+            zdict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            self._compressor = zstandard.ZstdCompressor(level=level or 19, dict_data=zdict)
+            self._decompressor = zstandard.ZstdDecompressor(dict_data=zdict)
+        elif name == "zlib":
+            self.level = level or 9
+        else:
+            raise ValueError(f"Unknown lesson pack codec: {name}")
+
+    @property
+    def http_encoding(self) -> Optional[str]:
+        """Content-Encoding under which payloads can be sent as stored (zlib streams are HTTP 'deflate')"""
+        return "deflate" if self.name == "zlib" and not self.dictionary else None
+
+    def compress(self, data: bytes) -> bytes:
+        if self.name == "zstd":
+            return self._compressor.compress(data)
+        if self.dictionary:
+            compressor = zlib.compressobj(self.level, zdict=self.dictionary)
+            return compressor.compress(data) + compressor.flush()
+        return zlib.compress(data, self.level)
+
+    def decompress(self, payload, size: int) -> bytes:
+        if self.name == "zstd":
+            return self._decompressor.decompress(payload, max_output_size=size)
+        if self.dictionary:
+            decompressor = zlib.decompressobj(zdict=self.dictionary)
+            return decompressor.decompress(payload) + decompressor.flush()
+        return zlib.decompress(payload, bufsize=max(size, 1))
+
+
+def train_dictionary(samples: List[bytes], codec: str, size: int = 16 * 1024) -> bytes:
+    """
+    Compression dictionary for small lesson records (empty if there are too few samples)
+
+    zstd trains a real dictionary; zlib uses the samples themselves as a preset
+    dictionary, keeping the last 32 KB since zlib prefers recent data.
+    """
+    if not samples:
+        return b""
+    if codec == "zstd":
+        zstandard = _load_zstandard()
+        try:
+            return zstandard.train_dictionary(size, samples).as_bytes()
+        except Exception as e:  # zstd refuses to train on too few or too small samples
+            logger.warning("⚠️ Could not train a zstd dictionary (%s), packing without one", e)
+            return b""
+    return b"".join(samples)[-min(size, ZLIB_DICTIONARY_BYTES):]
+
+
+# ============================================================================
+# PACK
+# ============================================================================
+
+class LessonPack:
+    """
+    Append-only store of compressed lessons, read through mmap
+
+    - Lookups by lesson ID or topic go to the in-memory offset index, then decompress one record
+    - Readers pick up appends and compactions made by other processes (refresh on access)
+    - One writer process at a time (the pack CLI or the batch generator)
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """Open a pack (created on first append)"""
+        self.path = path or os.environ.get("LESSON_PACK_PATH", ".data/lessons.pack")
+        self.index_path = os.path.splitext(self.path)[0] + ".idx"
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._file = None
+        self._mmap = None
+        self._inode = None
+        self._pack_id = None
+        self._codec: Optional[_Codec] = None
+        self._index_offset = 0
+        self._entries: List[PackEntry] = []
+        self._by_id: Dict[str, PackEntry] = {}
+        self._by_topic: Dict[str, PackEntry] = {}
+
+    def close(self):
+        """Release the mapping and file handle"""
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+            if self._file is not None:
+                self._file.close()
+            self._reset()
+
+    # ---------------------------------------------------------------- reading
+
+    def refresh(self) -> "LessonPack":
+        """Load index lines appended since the last call, or reopen after a compaction"""
+        with self._lock:
+            try:
+                inode = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                if self._inode is not None:
+                    self.close()
+                return self
+            if inode != self._inode:
+                self._open(inode)
+            else:
+                self._read_index()
+        return self
+
+    def _open(self, inode: int):
+        with open(self.path, "rb") as f:
+            header, dictionary, _ = self._read_header(f)
+        index_header = self._read_index_header()
+        if index_header is None or index_header.get("pack_id") != header["pack_id"]:
+            # The pack was just replaced and its index is not in place yet: keep serving the old pack
+            logger.debug("📦 Lesson pack %s is being replaced, keeping the current mapping", self.path)
+            return
+
+        self.close()
+        self._file = open(self.path, "rb")
+        self._inode = inode
+        self._pack_id = header["pack_id"]
+        self._codec = _Codec(header["codec"], dictionary)
+        self._read_index()
+
+    @staticmethod
+    def _read_header(f) -> Tuple[Dict, bytes, int]:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a lesson pack")
+        (header_length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_length))
+        dictionary = f.read(header["dictionary_length"])
+        return header, dictionary, f.tell()
+
+    def _read_index_header(self) -> Optional[Dict]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.loads(f.readline() or "null")
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, "rb") as f:
+                f.seek(self._index_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+
+        pack_size = os.fstat(self._file.fileno()).st_size
+        consumed = 0
+        for line in io.BytesIO(data):
+            if not line.endswith(b"\n"):
+                break  # torn line from a concurrent append, read it next time
+            entry = json.loads(line)
+            if "pack_id" in entry:
+                consumed += len(line)
+                continue
+            entry = PackEntry(**entry)
+            if entry.offset + entry.length > pack_size:
+                break  # index line written before its record reached our view of the pack
+            consumed += len(line)
+            self._add(entry)
+        self._index_offset += consumed
+
+        if self._entries and (self._mmap is None or len(self._mmap) < pack_size):
+            if self._mmap is not None:
+                self._mmap.close()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _add(self, entry: PackEntry):
+        self._entries.append(entry)
+        self._by_id[entry.lesson_id] = entry
+        self._by_topic[topic_key(entry.topic)] = entry
+
+    def entry(self, lesson_id: Optional[str] = None, topic: Optional[str] = None) -> Optional[PackEntry]:
+        """Index entry of a lesson ID, or of the latest version of a topic"""
+        with self._lock:
+            self.refresh()
+            return self._lookup(lesson_id, topic)
+
+    def _lookup(self, lesson_id: Optional[str], topic: Optional[str]) -> Optional[PackEntry]:
+        if lesson_id is not None:
+            return self._by_id.get(lesson_id)
+        return self._by_topic.get(topic_key(topic or ""))
+
+    def record(self, lesson_id: Optional[str] = None,
+               topic: Optional[str] = None) -> Optional[Tuple[PackEntry, bytes, "_Codec"]]:
+        """
+        Entry, stored payload and codec of a lesson, taken from one view of the pack
+
+        Use this rather than entry() followed by raw() or read(): a compaction landing
+        in between would make the entry's offsets point into the new pack.
+        """
+        with self._lock:
+            self.refresh()
+            entry = self._lookup(lesson_id, topic)
+            if entry is None:
+                return None
+            return entry, self._mmap[entry.offset:entry.offset + entry.length], self._codec
+
+    def raw(self, entry: PackEntry) -> bytes:
+        """Compressed payload of an entry, as stored"""
+        with self._lock:
+            return self._mmap[entry.offset:entry.offset + entry.length]
+
+    def read(self, entry: PackEntry) -> bytes:
+        """JSON bytes of an entry"""
+        with self._lock:
+            codec = self._codec
+            payload = self._mmap[entry.offset:entry.offset + entry.length]
+        return codec.decompress(payload, entry.size)
+
+    def get_bytes(self, lesson_id: Optional[str] = None, topic: Optional[str] = None) -> Optional[bytes]:
+        """JSON bytes of a lesson by ID or topic, or None"""
+        record = self.record(lesson_id, topic)
+        if record is None:
+            return None
+        entry, payload, codec = record
+        return codec.decompress(payload, entry.size)
+
+    def get(self, lesson_id: Optional[str] = None, topic: Optional[str] = None) -> Optional[Dict]:
+        """Stored lesson by ID or topic, or None"""
+        data = self.get_bytes(lesson_id, topic)
+        return json.loads(data) if data is not None else None
+
+    def live_entries(self) -> List[PackEntry]:
+        """Latest version of every topic, in pack order"""
+        self.refresh()
+        with self._lock:
+            live = {id(entry) for entry in self._by_topic.values()}
+            return [entry for entry in self._entries if id(entry) in live]
+
+    def iter_bytes(self, include_superseded: bool = False) -> Iterator[Tuple[PackEntry, bytes]]:
+        """Sequential scan of the pack: (entry, JSON bytes)"""
+        self.refresh()
+        with self._lock:
+            entries = list(self._entries) if include_superseded else self.live_entries()
+        for entry in entries:
+            yield entry, self.read(entry)
+
+    def iter_lessons(self, include_superseded: bool = False) -> Iterator[Dict]:
+        """Sequential scan of the pack: stored lessons"""
+        for _, data in self.iter_bytes(include_superseded):
+            yield json.loads(data)
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._by_topic)
+
+    def stats(self) -> Dict:
+        """Record counts and sizes"""
+        self.refresh()
+        with self._lock:
+            live = self.live_entries()
+            return {
+                "path": self.path,
+                "codec": self._codec.name if self._codec else None,
+                "dictionary_bytes": len(self._codec.dictionary) if self._codec else 0,
+                "records": len(self._entries),
+                "live_records": len(live),
+                "superseded_records": len(self._entries) - len(live),
+                "pack_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+                "live_compressed_bytes": sum(entry.length for entry in live),
+                "live_json_bytes": sum(entry.size for entry in live),
+            }
+
+    # ---------------------------------------------------------------- writing
+
+    @staticmethod
+    def _write_header(f, index, codec: str, dictionary: bytes) -> str:
+        pack_id = uuid.uuid4().hex
+        header = json.dumps({
+            "pack_id": pack_id, "codec": codec, "dictionary_length": len(dictionary)
+        }).encode("utf-8")
+        f.write(MAGIC + struct.pack("<I", len(header)) + header + dictionary)
+        index.write(json.dumps({"pack_id": pack_id, "codec": codec}) + "\n")
+        return pack_id
+
+    @staticmethod
+    def _write_record(f, index, codec: _Codec, lesson_data: Dict, data: Optional[bytes] = None) -> PackEntry:
+        data = data if data is not None else encode_lesson(lesson_data)
+        payload = codec.compress(data)
+        f.write(RECORD_HEADER.pack(len(payload), len(data)))
+        lesson = lesson_data.get("lesson", {})
+        entry = PackEntry(
+            lesson_id=str(lesson.get("lesson_id", "")),
+            topic=lesson.get("topic") or lesson_data.get("generation_metadata", {}).get("topic", ""),
+            offset=f.tell(),
+            length=len(payload),
+            size=len(data),
+            sha=hashlib.sha256(data).hexdigest(),
+            generated_at=lesson_data.get("generation_metadata", {}).get("generated_at", ""),
+        )
+        f.write(payload)
+        index.write(json.dumps(asdict(entry), ensure_ascii=False) + "\n")
+        return entry
+
+    def create(self, codec: Optional[str] = None, dictionary: bytes = b"") -> "LessonPack":
+        """Start an empty pack, replacing any existing one"""
+        return self._rewrite([], codec or default_codec(), dictionary)
+
+    def append(self, lessons: Iterable[Dict]) -> List[PackEntry]:
+        """Append stored lessons (newer versions of a topic supersede older ones, unchanged ones are skipped)"""
+        with self._lock:
+            if not os.path.exists(self.path):
+                self.create()
+            self.refresh()
+            entries = []
+            with open(self.path, "ab") as f, open(self.index_path, "a", encoding="utf-8") as index:
+                for lesson_data in lessons:
+                    data = encode_lesson(lesson_data)
+                    current = self._by_id.get(str(lesson_data.get("lesson", {}).get("lesson_id", "")))
+                    if current is not None and current.sha == hashlib.sha256(data).hexdigest():
+                        continue
+                    entries.append(self._write_record(f, index, self._codec, lesson_data, data))
+                    # The record must be on disk before its index line
+                    f.flush()
+                    index.flush()
+            self.refresh()
+        return entries
+
+    def compact(self, retrain_dictionary: bool = False, codec: Optional[str] = None) -> Dict:
+        """Rewrite the pack with only the latest version of each topic; returns before/after stats"""
+        with self._lock:
+            before = self.stats()
+            codec_name = codec or (self._codec.name if self._codec else default_codec())
+            live = [(entry, self.read(entry)) for entry in self.live_entries()]
+            if retrain_dictionary:
+                dictionary = train_dictionary([data for _, data in live], codec_name)
+            else:
+                dictionary = self._codec.dictionary if self._codec and codec_name == self._codec.name else b""
+            self._rewrite([(json.loads(data), data) for _, data in live], codec_name, dictionary)
+            after = self.stats()
+        logger.info("📦 Compacted %s: %d -> %d records, %d -> %d bytes", self.path,
+                    before["records"], after["records"], before["pack_bytes"], after["pack_bytes"])
+        return {"before": before, "after": after}
+
+    def _rewrite(self, lessons: List[Tuple[Dict, bytes]], codec_name: str, dictionary: bytes) -> "LessonPack":
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        codec = _Codec(codec_name, dictionary)
+        pack_tmp, index_tmp = f"{self.path}.tmp", f"{self.index_path}.tmp"
+        with open(pack_tmp, "wb") as f, open(index_tmp, "w", encoding="utf-8") as index:
+            self._write_header(f, index, codec_name, dictionary)
+            for lesson_data, data in lessons:
+                self._write_record(f, index, codec, lesson_data, data)
+        # Readers match the pack and index through pack_id, so a reader between the two swaps keeps the old pack
+        os.replace(pack_tmp, self.path)
+        os.replace(index_tmp, self.index_path)
+        with self._lock:
+            self.close()
+            self.refresh()
+        return self
+
+
+def iter_stored_lessons(source: str) -> Iterator[Tuple[str, Dict]]:
+    """(name, stored lesson) from a directory of lesson JSON files or from a lesson pack"""
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(source, name), "r", encoding="utf-8") as f:
+                    stored = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if isinstance(stored, dict) and "lesson" in stored:
+                yield name, stored
+    elif os.path.exists(source):
+        pack = LessonPack(source)
+        try:
+            for entry, data in pack.iter_bytes():
+                yield entry.lesson_id, json.loads(data)
+        finally:
+            pack.close()
+
+
+_lesson_pack: Optional[LessonPack] = None
+
+def get_lesson_pack() -> LessonPack:
+    """Process-wide pack at LESSON_PACK_PATH, opened on first use"""
+    global _lesson_pack
+    if _lesson_pack is None:
+        _lesson_pack = LessonPack()
+    return _lesson_pack
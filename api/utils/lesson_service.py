@@ -8,8 +8,11 @@ This is the main entry point for lesson generation, orchestrating:
 - Response structuring
 """
 
+import os
+import logging
+import asyncio
 import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 
 from api.models.lesson_models import (
     UserContext, 
@@ -19,8 +22,41 @@ from api.models.lesson_models import (
     Question, 
     ProgramMapping
 )
+from api.utils.ids import make_exercise_id, make_lesson_id, make_question_id, personalization_fingerprint
 from api.utils.academic_program import AcademicProgramLoader
-from api.utils.weaviate_service import WeaviateService
+from api.utils.retrieval import RetrievalBackend, create_retrieval_backend
+from api.utils.mistral_service import MistralService
+from api.utils.knowledge_tracing import get_knowledge_service
+from api.utils.lesson_cache import LessonCache, SharedDiskCache
+from api.utils.prefetch import TopicPrefetcher
+from api.utils.telemetry import FALLBACKS, metrics, span
+
+logger = logging.getLogger(__name__)
+
+
+def _create_shared_lesson_cache() -> Optional[SharedDiskCache]:
+    """Disk tier selected by BASE_LESSON_CACHE_STORE (memory or sqlite)"""
+    backend = os.environ.get("BASE_LESSON_CACHE_STORE", "memory").lower()
+    if backend == "sqlite":
+        return SharedDiskCache()
+    if backend != "memory":
+        raise ValueError(f"Unknown BASE_LESSON_CACHE_STORE backend: {backend}")
+    return None
+
+
+# Shared base lessons per (topic, category, subcategory, level), reused across users (and workers with sqlite)
+base_lesson_cache = LessonCache(
+    max_entries=int(os.environ.get("BASE_LESSON_CACHE_SIZE", "512")),
+    ttl_seconds=float(os.environ.get("BASE_LESSON_CACHE_TTL", str(24 * 3600))),
+    shared=_create_shared_lesson_cache(),
+    lease_seconds=float(os.environ.get("BASE_LESSON_CACHE_LEASE", "120"))
+)
+metrics.callback(
+    "admissia_base_lesson_cache_requests_total", "Base lesson cache lookups by result",
+    lambda: [({"result": "hit"}, base_lesson_cache.hits), ({"result": "shared_hit"}, base_lesson_cache.shared_hits),
+             ({"result": "miss"}, base_lesson_cache.misses)],
+    kind="counter"
+)
 
 
 class LessonOrchestrator:
@@ -32,7 +68,22 @@ class LessonOrchestrator:
     def __init__(self):
         """Initialize the lesson orchestrator"""
         self.program_loader = AcademicProgramLoader()
-        self.weaviate_service = WeaviateService()
+        self._retrieval_service: Optional[RetrievalBackend] = None
+        self._mistral_service: Optional[MistralService] = None
+    
+    @property
+    def mistral_service(self) -> MistralService:
+        """Mistral service, created on first use"""
+        if self._mistral_service is None:
+            self._mistral_service = MistralService()
+        return self._mistral_service
+    
+    @property
+    def retrieval_service(self) -> RetrievalBackend:
+        """Retrieval backend (RETRIEVAL_BACKEND), opened on first use so cache hits never connect"""
+        if self._retrieval_service is None:
+            self._retrieval_service = create_retrieval_backend(mistral_service=self.mistral_service)
+        return self._retrieval_service
     
     async def create_lesson(self, topic: str, user_context: UserContext) -> LessonResponse:
         """
@@ -40,9 +91,9 @@ class LessonOrchestrator:
         
         This implements the complete workflow:
         1. Map topic to academic program structure
-        2. RAG Retrieval - Semantic search through medical knowledge
-        3. LLM Generation - Use Mistral API for content generation
-        4. Personalized content adaptation
+        2. Base lesson - RAG retrieval + Mistral generation, shared per (topic, level) and cached
+        3. Personalized delta - small Mistral call for weak-concept focus and question plan
+        4. Merge and structure the response
         
         Args:
             topic: Academic topic to create lesson for
@@ -53,6 +104,39 @@ class LessonOrchestrator:
         """
         
         # Step 1: Map topic to academic program structure
+        with span("mapping"):
+            topic_mapping = self.map_topic(topic)
+            
+            # Get related topics for enhanced search context
+            related_topics = self.program_loader.get_related_topics(
+                topic_mapping.category, 
+                topic_mapping.subcategory, 
+                limit=5
+            )
+        
+        # Step 2: Shared base lesson (generated once per topic and level)
+        with span("base_lesson"):
+            lesson_data = await self.get_base_lesson(
+                topic, user_context.current_level, topic_mapping, related_topics
+            )
+        
+        # Step 3: Cheap personalized delta on top of the base lesson
+        if user_context.weak_concepts:
+            with span("personalization"):
+                delta = await self.mistral_service.generate_personalized_delta(
+                    topic, user_context, lesson_data, topic_mapping
+                )
+                lesson_data = self._merge_personalization(lesson_data, delta, user_context)
+        
+        # Step 4: Warm the cache for neighbouring topics (opt-in, background)
+        lesson_prefetcher.schedule(topic_mapping, user_context.current_level, related_topics)
+        
+        # Step 5: Structure response with program mapping
+        with span("structuring"):
+            return self._structure_lesson_response(lesson_data, topic, user_context, topic_mapping)
+    
+    def map_topic(self, topic: str) -> ProgramMapping:
+        """Map a topic to the academic program, with a fallback for unknown topics"""
         topic_mapping = self.program_loader.find_topic_mapping(topic)
         if not topic_mapping:
             # Fallback mapping for unknown topics
@@ -63,27 +147,73 @@ class LessonOrchestrator:
                 semester=1,
                 similarity_score=0.0
             )
-            print(f"⚠️ Using fallback mapping for unknown topic: {topic}")
+            FALLBACKS.inc(kind="topic_mapping")
+            logger.info("⚠️ Using fallback mapping for unknown topic: %s", topic)
+        return topic_mapping
+    
+    @staticmethod
+    def base_lesson_key(topic: str, level: str, topic_mapping: ProgramMapping) -> tuple:
+        """Cache key of the shared base lesson"""
+        return (topic.lower().strip(), topic_mapping.category, topic_mapping.subcategory, level)
+    
+    async def get_base_lesson(self, topic: str, level: str, topic_mapping: ProgramMapping,
+                              related_topics: List[str]) -> Dict:
+        """Get the user-independent base lesson for a topic and level, generating it on a miss"""
         
-        # Get related topics for enhanced search context
-        related_topics = self.program_loader.get_related_topics(
-            topic_mapping.category, 
-            topic_mapping.subcategory, 
-            limit=5
-        )
+        async def generate() -> Dict:
+            # Neutral context: the base lesson must not depend on any single user
+            base_context = UserContext(user_id="base_lesson", current_level=level)
+            
+            with span("retrieval"):
+                relevant_content = await self.retrieval_service.search_medical_knowledge(
+                    topic, base_context, topic_mapping, related_topics
+                )
+            with span("generation"):
+                return await self.retrieval_service.generate_lesson_content(
+                    topic, base_context, relevant_content, topic_mapping, related_topics
+                )
         
-        # Step 2: RAG Retrieval - Program-scoped semantic search
-        relevant_content = await self.weaviate_service.search_medical_knowledge(
-            topic, user_context, topic_mapping, related_topics
+        return await base_lesson_cache.get_or_create(
+            self.base_lesson_key(topic, level, topic_mapping),
+            generate,
+            cacheable=lambda lesson_data: "status" not in lesson_data.get("academic_context", {})
         )
+    
+    def _merge_personalization(self, base_lesson: Dict, delta: Dict, user_context: UserContext) -> Dict:
+        """Merge a personalized delta into a copy of the base lesson"""
+        lesson_data = dict(base_lesson)
         
-        # Step 3: LLM Generation - Use Mistral API for content generation
-        lesson_data = await self.weaviate_service.generate_lesson_content(
-            topic, user_context, relevant_content, topic_mapping, related_topics
-        )
+        focus = delta.get("weak_concept_focus")
+        if isinstance(focus, list):
+            focus = "\n".join(f"• {item}" for item in focus)
+        if focus:
+            lesson_data["lesson_content"] = (
+                f"{base_lesson.get('lesson_content', '')}\n\n**Focus on Your Weak Areas:**\n{focus}"
+            )
         
-        # Step 4: Structure response with program mapping
-        return self._structure_lesson_response(lesson_data, topic, user_context, topic_mapping)
+        # Reorder/select base questions and adjust their difficulty
+        questions_by_id = {q.get("question_id"): q for q in base_lesson.get("questions", [])}
+        planned_questions = []
+        for item in delta.get("question_plan", []) or []:
+            if not isinstance(item, dict):
+                continue
+            question = questions_by_id.pop(item.get("question_id"), None)
+            if question is None:
+                continue
+            question = dict(question)
+            if item.get("difficulty") in ("beginner", "intermediate", "advanced"):
+                question["difficulty"] = item["difficulty"]
+            planned_questions.append(question)
+        if planned_questions:
+            lesson_data["questions"] = planned_questions
+        
+        target_concepts = list(base_lesson.get("target_concepts", []))
+        for concept in user_context.weak_concepts[:2]:
+            if concept not in target_concepts:
+                target_concepts.append(concept)
+        lesson_data["target_concepts"] = target_concepts
+        
+        return lesson_data
     
     def _structure_lesson_response(self, lesson_data: dict, topic: str, 
                                   user_context: UserContext, topic_mapping: ProgramMapping) -> LessonResponse:
@@ -94,16 +224,19 @@ class LessonOrchestrator:
         target_concepts = lesson_data.get("target_concepts", [topic])
         learning_objectives = lesson_data.get("learning_objectives", ["understand", "apply"])
         
-        # Generate unique IDs
-        lesson_id = f"lesson_{abs(hash(topic + user_context.user_id + topic_mapping.category)) % 100000}"
-        exercise_id = f"ex_{abs(hash(topic + user_context.user_id + topic_mapping.subcategory)) % 100000}"
+        # Deterministic IDs: the same inputs give the same lesson ID on every worker and after restarts
+        fingerprint = personalization_fingerprint(user_context, MistralService.PERSONALIZATION_PROMPT_VERSION)
+        lesson_id = make_lesson_id(topic, topic_mapping, fingerprint, MistralService.LESSON_PROMPT_VERSION)
         
-        # Process questions with academic context
+        # Process questions with academic context (IDs derived from the question content)
         questions = []
-        for i, q_data in enumerate(lesson_data.get("questions", [])[:5]):
+        for q_data in lesson_data.get("questions", [])[:5]:
             try:
+                question_id = make_question_id(q_data)
+                if any(q.question_id == question_id for q in questions):
+                    continue  # same content twice
                 question = Question(
-                    question_id=q_data.get("question_id", f"q{i+1}_{topic.replace(' ', '_')}"),
+                    question_id=question_id,
                     text=q_data.get("text", f"Question about {topic} in {topic_mapping.subcategory}?"),
                     category=q_data.get("category", topic_mapping.category),
                     subcategory=q_data.get("subcategory", topic_mapping.subcategory),
@@ -115,8 +248,9 @@ class LessonOrchestrator:
                 )
                 questions.append(question)
             except Exception as e:
-                print(f"Question parsing error: {e}")
+                logger.warning("Question parsing error: %s", e)
                 continue
+        exercise_id = make_exercise_id(lesson_id, [q.question_id for q in questions])
         
         # Build lesson entity with academic program context
         lesson = Lesson(
@@ -144,7 +278,7 @@ class LessonOrchestrator:
             created_at=datetime.datetime.now().isoformat()
         )
         
-        print(f"📋 Created lesson: {topic_mapping.category} > {topic_mapping.subcategory} > {topic}")
+        logger.debug("📋 Created lesson: %s > %s > %s", topic_mapping.category, topic_mapping.subcategory, topic)
         
         return LessonResponse(
             lesson=lesson,
@@ -154,7 +288,12 @@ class LessonOrchestrator:
     
     def close(self):
         """Close connections"""
-        self.weaviate_service.close()
+        if self._retrieval_service is not None:
+            self._retrieval_service.close()
+
+
+# Background warm-up of related topics (enabled with LESSON_PREFETCH_ENABLED=true)
+lesson_prefetcher = TopicPrefetcher(base_lesson_cache, LessonOrchestrator)
 
 
 # =============================================================================
@@ -180,12 +319,39 @@ async def create_adaptive_lesson(topic: str, user_context: UserContext) -> Lesso
         - MISTRAL_API_KEY: For LLM generation
     """
     orchestrator = LessonOrchestrator()
+    lesson_prefetcher.interactive_started()
     try:
         lesson_response = await orchestrator.create_lesson(topic, user_context)
-        return lesson_response
     finally:
+        lesson_prefetcher.interactive_finished()
         orchestrator.close()
 
+    # Register served questions so submitted answers can be graded server-side,
+    # and keep one question per group of near-duplicates
+    try:
+        canonical_ids = await asyncio.to_thread(
+            get_knowledge_service().register_questions, lesson_response.questions,
+            lesson_response.exercise.target_concepts
+        )
+        seen = set()
+        unique_questions = []
+        for question in lesson_response.questions:
+            canonical_id = canonical_ids.get(question.question_id, question.question_id)
+            if canonical_id not in seen:
+                seen.add(canonical_id)
+                unique_questions.append(question)
+        if len(unique_questions) < len(lesson_response.questions):
+            lesson_response.questions = unique_questions
+            lesson_response.exercise.question_ids = [q.question_id for q in unique_questions]
+            lesson_response.exercise.exercise_id = make_exercise_id(
+                lesson_response.lesson.lesson_id, lesson_response.exercise.question_ids
+            )
+            lesson_response.lesson.exercise_id = lesson_response.exercise.exercise_id
+    except Exception as e:
+        logger.warning("⚠️ Could not register questions for knowledge tracing: %s", e)
+
+    return lesson_response
+
 
 # For backward compatibility, export models and program loader
 from api.models.lesson_models import *
@@ -0,0 +1,341 @@
+"""
+Local Vector Store
+In-process NumPy vector store used as an offline retrieval backend (RETRIEVAL_BACKEND=local)
+"""
+
+import os
+import logging
+import re
+import json
+import asyncio
+import fnmatch
+import hashlib
+import threading
+import unicodedata
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from api.models.lesson_models import UserContext, ProgramMapping
+from api.utils.mistral_service import MistralService
+from api.utils.retrieval import RetrievalBackend, build_search_query, format_search_result
+from api.utils.telemetry import span
+from api.utils.lesson_pack import iter_stored_lessons
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Properties of a MedistralDocument that are embedded
+TEXT_FIELDS = ("title", "abstract", "content", "topic", "subcategory", "category")
+
+
+@lru_cache(maxsize=200_000)
+def _feature_hash(feature: str) -> int:
+    """Stable 64-bit hash of a feature (Python's hash() is salted per process)"""
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class HashingVectorizer:
+    """
+    Deterministic feature-hashing embedder
+    Words and word bigrams are hashed into `dim` signed buckets with log term frequency, then L2-normalized
+    """
+
+    def __init__(self, dim: int = 1024):
+        """Initialize with the embedding dimension"""
+        self.dim = dim
+
+    @staticmethod
+    def tokens(text: str) -> List[str]:
+        """Lowercase, accent-free alphanumeric tokens"""
+        normalized = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+        return TOKEN_PATTERN.findall(normalized.lower())
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embed one text"""
+        tokens = self.tokens(text)
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+        hashes = np.fromiter((_feature_hash(feature) for feature in features), dtype=np.uint64, count=len(features))
+        signs = np.where(hashes >> np.uint64(63), 1.0, -1.0)
+        counts = np.bincount((hashes % np.uint64(self.dim)).astype(np.int64), weights=signs, minlength=self.dim)
+
+        magnitudes = np.abs(counts)
+        vector = (np.sign(counts) * (1.0 + np.log(np.maximum(magnitudes, 1.0)))).astype(np.float32)
+        vector[magnitudes == 0] = 0.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_many(self, texts: Iterable[str]) -> np.ndarray:
+        """Embed several texts into a (n, dim) matrix"""
+        vectors = [self.embed(text) for text in texts]
+        return np.vstack(vectors) if vectors else np.zeros((0, self.dim), dtype=np.float32)
+
+
+class LocalVectorStore:
+    """
+    MedistralDocument-shaped records held in NumPy arrays
+
+    - Exact top-k: one matrix-vector product over all (filtered) rows
+    - Approximate top-k: IVF index (spherical k-means), probing the `n_probe` closest lists
+    - Property filters: equality, membership (list value) or wildcard pattern ("*medical*")
+    """
+
+    def __init__(self, vectorizer: Optional[HashingVectorizer] = None, ivf_threshold: int = 5000,
+                 n_probe: int = 8):
+        """
+        Args:
+            vectorizer: Embedder for records and queries
+            ivf_threshold: From this many records, searches in "auto" mode use the IVF index
+            n_probe: Number of IVF lists scanned per query
+        """
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self.ivf_threshold = ivf_threshold
+        self.n_probe = n_probe
+
+        self.records: List[Dict] = []
+        self._vectors = np.zeros((0, self.vectorizer.dim), dtype=np.float32)
+        self._columns: Dict[str, Tuple[np.ndarray, List[Any]]] = {}
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def add(self, records: List[Dict]):
+        """Embed and append records (invalidates the IVF index)"""
+        if not records:
+            return
+        texts = [" ".join(str(record.get(field) or "") for field in TEXT_FIELDS) for record in records]
+        self._vectors = np.vstack([self._vectors, self.vectorizer.embed_many(texts)])
+        self.records.extend(records)
+        self._columns = {}
+        self._centroids = None
+        self._lists = []
+
+    def load_jsonl(self, path: str) -> int:
+        """Add the records of a JSONL corpus (one MedistralDocument per line) and return how many were read"""
+        with open(path, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        self.add(records)
+        return len(records)
+
+    # =========================================================================
+    # IVF INDEX
+    # =========================================================================
+
+    def build_index(self, n_lists: Optional[int] = None, iterations: int = 10, seed: int = 0):
+        """Cluster the vectors into `n_lists` inverted lists (defaults to sqrt of the record count)"""
+        count = len(self.records)
+        if count == 0:
+            return
+        n_lists = min(count, n_lists or max(1, int(np.sqrt(count))))
+
+        # Train on a bounded sample, then assign every vector
+        rng = np.random.default_rng(seed)
+        sample = self._vectors[rng.choice(count, min(count, 64 * n_lists), replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            for list_id in range(n_lists):
+                members = sample[assignments == list_id]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    centroids[list_id] = centroid / norm if norm else centroid
+
+        assignments = np.argmax(self._vectors @ centroids.T, axis=1)
+        self._lists = [np.flatnonzero(assignments == list_id) for list_id in range(n_lists)]
+        self._centroids = centroids
+
+    # =========================================================================
+    # SEARCH
+    # =========================================================================
+
+    def search(self, query: str, k: int = 10, filters: Optional[Dict[str, Any]] = None,
+               mode: str = "auto", n_probe: Optional[int] = None) -> List[Tuple[Dict, float]]:
+        """
+        Top-k records by cosine similarity
+
+        Args:
+            query: Query text
+            k: Number of results
+            filters: Property filters, all of which must match
+            mode: "exact", "ivf" or "auto" (IVF from `ivf_threshold` records)
+            n_probe: Override of the number of IVF lists scanned
+
+        Returns:
+            (record, score) pairs, best first
+        """
+        if not self.records or k <= 0:
+            return []
+        query_vector = self.vectorizer.embed(query)
+        mask = self._filter_mask(filters) if filters else None
+
+        use_ivf = mode == "ivf" or (mode == "auto" and len(self.records) >= self.ivf_threshold)
+        candidates = None
+        if use_ivf:
+            if self._centroids is None:
+                self.build_index()
+            probe = min(len(self._lists), n_probe or self.n_probe)
+            closest_lists = np.argsort(-(self._centroids @ query_vector))[:probe]
+            candidates = np.concatenate([self._lists[list_id] for list_id in closest_lists])
+            if mask is not None:
+                candidates = candidates[mask[candidates]]
+            if len(candidates) < k:
+                # Too few matches in the probed lists: fall back to an exact scan
+                candidates = None
+
+        if candidates is None:
+            candidates = np.flatnonzero(mask) if mask is not None else np.arange(len(self.records))
+        if len(candidates) == 0:
+            return []
+
+        scores = self._vectors[candidates] @ query_vector
+        top = np.argpartition(-scores, k - 1)[:k] if len(candidates) > k else np.arange(len(candidates))
+        top = top[np.argsort(-scores[top])]
+        return [(self.records[candidates[i]], float(scores[i])) for i in top]
+
+    def _column(self, prop: str) -> Tuple[np.ndarray, List[Any]]:
+        """Property values encoded as integer codes plus the distinct values, cached until the next add()"""
+        column = self._columns.get(prop)
+        if column is None:
+            codes_by_value: Dict[Any, int] = {}
+            codes = np.empty(len(self.records), dtype=np.int64)
+            for row, record in enumerate(self.records):
+                value = record.get(prop)
+                # Unhashable values (lists) never match a filter
+                codes[row] = codes_by_value.setdefault(value, len(codes_by_value)) if _hashable(value) else -1
+            column = (codes, list(codes_by_value))
+            self._columns[prop] = column
+        return column
+
+    def _filter_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Boolean mask of the records matching every filter"""
+        mask = np.ones(len(self.records), dtype=bool)
+        for prop, expected in filters.items():
+            codes, values = self._column(prop)
+            if isinstance(expected, str) and ("*" in expected or "?" in expected):
+                pattern = expected.lower()
+                matching = [code for code, v in enumerate(values)
+                            if isinstance(v, str) and fnmatch.fnmatchcase(v.lower(), pattern)]
+            elif isinstance(expected, (list, tuple, set)):
+                matching = [code for code, v in enumerate(values) if v in expected]
+            else:
+                matching = [code for code, v in enumerate(values) if v == expected]
+            mask &= np.isin(codes, matching)
+        return mask
+
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
+        return True
+    except TypeError:
+        return False
+
+
+# =============================================================================
+# RETRIEVAL BACKEND
+# =============================================================================
+
+def seed_corpus(program_file: str = "ressources/program.json", lessons_dir: str = "ressources/data") -> List[Dict]:
+    """Default corpus when no JSONL file exists: the stored lessons (directory or lesson pack) plus one record per program topic"""
+    records = []
+    covered = set()
+    for name, stored in iter_stored_lessons(lessons_dir):
+        lesson = stored.get("lesson", {})
+        if not lesson.get("lesson_content"):
+            continue
+        covered.add(lesson.get("topic", "").lower())
+        records.append({
+            "title": lesson.get("topic", ""),
+            "content": lesson["lesson_content"],
+            "category": lesson.get("category", ""),
+            "subcategory": lesson.get("subcategory", ""),
+            "topic": lesson.get("topic", ""),
+            "difficulty_level": lesson.get("difficulty_level", "intermediate"),
+            "learning_objectives": lesson.get("learning_objectives", []),
+            "semester": lesson.get("semester", 1),
+            "source_file": name,
+            "content_type": "lesson",
+            "medical_domain": "medical education"
+        })
+
+    try:
+        with open(program_file, "r", encoding="utf-8") as f:
+            program = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        program = []
+    for ue in program:
+        for subcategory in ue.get("subcategories", []):
+            for topic in subcategory.get("topics", []):
+                if topic.lower() in covered:
+                    continue
+                records.append({
+                    "title": topic,
+                    "content": f"{ue.get('category', '')} > {subcategory.get('name', '')} > {topic}",
+                    "category": ue.get("category", ""),
+                    "subcategory": subcategory.get("name", ""),
+                    "topic": topic,
+                    "semester": ue.get("semester", 1),
+                    "source_file": os.path.basename(program_file),
+                    "content_type": "program_topic",
+                    "medical_domain": "medical education"
+                })
+    return records
+
+
+_store: Optional[LocalVectorStore] = None
+_store_lock = threading.Lock()
+
+
+def get_local_vector_store() -> LocalVectorStore:
+    """Process-wide store, loaded once from LOCAL_CORPUS_PATH (or seeded from the stored lessons)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            store = LocalVectorStore(
+                vectorizer=HashingVectorizer(int(os.environ.get("LOCAL_VECTOR_DIM", "1024"))),
+                ivf_threshold=int(os.environ.get("LOCAL_VECTOR_IVF_THRESHOLD", "5000")),
+                n_probe=int(os.environ.get("LOCAL_VECTOR_NPROBE", "8"))
+            )
+            corpus_path = os.environ.get("LOCAL_CORPUS_PATH", ".data/corpus.jsonl")
+            if os.path.exists(corpus_path):
+                count = store.load_jsonl(corpus_path)
+                logger.info("📦 Loaded %s documents from %s", count, corpus_path)
+            else:
+                store.add(seed_corpus())
+                logger.info("📦 No corpus at %s, seeded %s documents from stored lessons", corpus_path, len(store))
+            _store = store
+        return _store
+
+
+class LocalRetrievalService(RetrievalBackend):
+    """Offline retrieval backend over the local vector store"""
+
+    def __init__(self, mistral_service: Optional[MistralService] = None,
+                 store: Optional[LocalVectorStore] = None):
+        """Initialize with the shared local store and Mistral service"""
+        self.store = store or get_local_vector_store()
+        self.mistral_service = mistral_service or MistralService()
+
+    async def search_medical_knowledge(self, topic: str, user_context: UserContext,
+                                       topic_mapping: ProgramMapping, related_topics: List[str]) -> List[Dict]:
+        """Top-15 local search, preferring medical-domain documents like the Weaviate backend"""
+        search_query = build_search_query(topic, user_context, topic_mapping, related_topics)
+        logger.debug("🔍 Local search: %s > %s > %s", topic_mapping.category, topic_mapping.subcategory, topic)
+
+        with span("vector_search"):
+            results = await asyncio.to_thread(self.store.search, search_query, 15, {"medical_domain": "*medical*"})
+            if not results:
+                results = await asyncio.to_thread(self.store.search, search_query, 15)
+
+        relevant_docs = [
+            format_search_result(record, score, topic, user_context, topic_mapping)
+            for record, score in results
+        ]
+        logger.debug("📚 Found %d documents for '%s'", len(relevant_docs), topic)
+        return relevant_docs
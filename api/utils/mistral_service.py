@@ -4,11 +4,15 @@ Clean, lightweight lesson content generation using Mistral API
 """
 
 import os
+import logging
 import json
-import aiohttp
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from api.models.lesson_models import UserContext, ProgramMapping
+from api.utils.telemetry import FALLBACKS, span
+from api.utils.usage_tracking import usage_tracker
+
+logger = logging.getLogger(__name__)
 
 class MistralService:
     """
@@ -16,20 +20,28 @@ class MistralService:
     Focuses on technical overviews with key notions
     """
     
-    def __init__(self):
-        """Initialize Mistral service"""
+    LESSON_MAX_TOKENS = 2500
+    PERSONALIZATION_MAX_TOKENS = 300
+    
+    # Bump when a prompt template changes so usage and quality can be compared per version
+    LESSON_PROMPT_VERSION = "lesson-v1"
+    PERSONALIZATION_PROMPT_VERSION = "personalization-v1"
+    
+    def __init__(self, base_url: Optional[str] = None):
+        """Initialize Mistral service (MISTRAL_BASE_URL points it at another compatible server)"""
         self.api_key = os.environ.get("MISTRAL_API_KEY")
         if not self.api_key:
             raise ValueError("MISTRAL_API_KEY environment variable required")
         
-        self.api_url = "https://api.mistral.ai/v1/chat/completions"
-        print("✅ Clean Mistral API service initialized")
+        base_url = base_url or os.environ.get("MISTRAL_BASE_URL", "https://api.mistral.ai/v1")
+        self.api_url = f"{base_url.rstrip('/')}/chat/completions"
+        logger.debug("✅ Clean Mistral API service initialized")
     
     async def generate_lesson_content(self, topic: str, user_context: UserContext, 
                                     relevant_content: List[Dict], topic_mapping: ProgramMapping,
                                     related_topics: List[str]) -> Dict:
         """Generate clean, concise lesson content"""
-        print(f"📝 Generating concise lesson for '{topic}'")
+        logger.debug("📝 Generating concise lesson for '%s'", topic)
         
         # Build content summary
         content_summary = self._build_content_summary(relevant_content)
@@ -39,12 +51,62 @@ class MistralService:
             topic, user_context, content_summary, topic_mapping, related_topics
         )
         
-        # Clean API request
+        try:
+            logger.debug("🔧 Calling Mistral API for %s", topic)
+            generated_content = await self._call_mistral(
+                prompt, self.LESSON_MAX_TOKENS, self.LESSON_PROMPT_VERSION,
+                self._usage_tags(user_context, topic_mapping)
+            )
+            logger.debug("✅ Generated %d characters", len(generated_content))
+            
+            return self._parse_generated_content(generated_content, topic, user_context, topic_mapping)
+                        
+        except Exception as api_error:
+            logger.error("❌ Mistral API error: %s", api_error)
+            return self._create_fallback_content(topic, user_context, topic_mapping)
+    
+    async def generate_personalized_delta(self, topic: str, user_context: UserContext,
+                                        base_lesson: Dict, topic_mapping: ProgramMapping) -> Dict:
+        """
+        Generate the small user-dependent part of a lesson on top of a shared base lesson
+        
+        Returns a weak-concept focus section and a question plan (selection and difficulty)
+        """
+        logger.debug("🎯 Personalizing '%s' for %s", topic, user_context.user_id)
+        
+        prompt = self._build_personalization_prompt(topic, user_context, base_lesson, topic_mapping)
+        
+        try:
+            generated_content = await self._call_mistral(
+                prompt, self.PERSONALIZATION_MAX_TOKENS, self.PERSONALIZATION_PROMPT_VERSION,
+                self._usage_tags(user_context, topic_mapping)
+            )
+            delta = json.loads(generated_content)
+            if not isinstance(delta, dict):
+                raise ValueError("personalization output is not a JSON object")
+            return delta
+        except Exception as api_error:
+            logger.warning("⚠️ Personalization fallback for '%s': %s", topic, api_error)
+            return self._create_fallback_delta(user_context, base_lesson)
+    
+    @staticmethod
+    def _usage_tags(user_context: UserContext, topic_mapping: ProgramMapping) -> Dict[str, str]:
+        """Usage accounting tags of a lesson call"""
+        return {
+            "user_id": user_context.user_id,
+            "category": topic_mapping.category,
+            "subcategory": topic_mapping.subcategory,
+            "topic": topic_mapping.topic
+        }
+    
+    async def _call_mistral(self, prompt: str, max_tokens: int, prompt_version: str = "",
+                            usage_tags: Optional[Dict[str, str]] = None) -> str:
+        """Send a single JSON-mode chat completion request and return the message content"""
         payload = {
             "model": "mistral-small-latest",
             "messages": [{"role": "user", "content": prompt}],
             "temperature": 0.3,
-            "max_tokens": 2500,
+            "max_tokens": max_tokens,
             "response_format": {"type": "json_object"}
         }
         
@@ -53,9 +115,9 @@ class MistralService:
             "Content-Type": "application/json"
         }
         
-        try:
-            print(f"🔧 Calling Mistral API for {topic}")
-            
+        import aiohttp  # deferred to keep cold starts cheap
+
+        with span("mistral"):
             async with aiohttp.ClientSession() as session:
                 async with session.post(
                     self.api_url,
@@ -69,15 +131,14 @@ class MistralService:
                         raise Exception(f"Mistral API error {response.status}: {error_text}")
                     
                     result = await response.json()
-                    generated_content = result['choices'][0]['message']['content']
-                    
-                    print(f"✅ Generated {len(generated_content)} characters")
-                    
-                    return self._parse_generated_content(generated_content, topic, user_context, topic_mapping)
-                        
-        except Exception as api_error:
-            print(f"❌ Mistral API error: {api_error}")
-            return self._create_fallback_content(topic, user_context, topic_mapping)
+        
+        usage = result.get("usage") or {}
+        usage_tracker.record(
+            payload["model"], prompt_version,
+            usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0),
+            metered=bool(usage), **(usage_tags or {})
+        )
+        return result['choices'][0]['message']['content']
     
     def _build_content_summary(self, relevant_content: List[Dict]) -> str:
         """Build simple content summary"""
@@ -166,6 +227,52 @@ Return EXACTLY this JSON format:
 
 Keep it concise, technical, and focused on essential notions. No extra formatting or complex structures."""
     
+    def _build_personalization_prompt(self, topic: str, user_context: UserContext,
+                                      base_lesson: Dict, topic_mapping: ProgramMapping) -> str:
+        """Build the short prompt that adapts a base lesson to one student"""
+        
+        mastery = {
+            concept: round(score, 2)
+            for concept, score in sorted(user_context.concept_mastery.items(), key=lambda item: item[1])[:5]
+        }
+        questions = "\n".join(
+            f"- {q.get('question_id')}: {q.get('text')}"
+            for q in base_lesson.get("questions", [])
+        )
+        
+        return f"""You are a medical education AI. Adapt an existing lesson to one student.
+
+TOPIC: {topic}
+SUBCATEGORY: {topic_mapping.subcategory}
+STUDENT LEVEL: {user_context.current_level}
+WEAK AREAS: {user_context.weak_concepts}
+MASTERY: {json.dumps(mastery)}
+
+LESSON QUESTIONS:
+{questions}
+
+Return EXACTLY this JSON format:
+
+{{
+    "weak_concept_focus": "[2-4 short bullet points linking {topic} to the weak areas]",
+    "question_plan": [{{"question_id": "[id from the list, most useful first]", "difficulty": "beginner|intermediate|advanced"}}]
+}}
+
+Be brief. Do not repeat the lesson."""
+    
+    def _create_fallback_delta(self, user_context: UserContext, base_lesson: Dict) -> Dict:
+        """Deterministic personalization when the API fails"""
+        FALLBACKS.inc(kind="personalization")
+        focus = "\n".join(f"• Review how {concept} relates to this topic" for concept in user_context.weak_concepts[:3])
+        return {
+            "weak_concept_focus": focus,
+            "question_plan": [
+                {"question_id": q.get("question_id"), "difficulty": user_context.current_level}
+                for q in base_lesson.get("questions", [])
+            ],
+            "status": "personalization_fallback"
+        }
+    
     def _parse_generated_content(self, generated_content: str, topic: str, 
                                user_context: UserContext, topic_mapping: ProgramMapping) -> Dict:
         """Parse generated content"""
@@ -182,16 +289,17 @@ Keep it concise, technical, and focused on essential notions. No extra formattin
                     "similarity_score": topic_mapping.similarity_score
                 })
             
-            print(f"✅ Parsed lesson with {len(parsed_content.get('questions', []))} questions")
+            logger.debug("✅ Parsed lesson with %d questions", len(parsed_content.get('questions', [])))
             return parsed_content
             
         except json.JSONDecodeError as e:
-            print(f"⚠️ JSON parsing failed: {e}")
+            logger.warning("⚠️ JSON parsing failed: %s", e)
             return self._create_structured_fallback(topic, user_context, topic_mapping)
     
     def _create_structured_fallback(self, topic: str, user_context: UserContext, 
                                   topic_mapping: ProgramMapping) -> Dict:
         """Create structured fallback content"""
+        FALLBACKS.inc(kind="lesson_parse")
         return {
             "lesson_content": f"**{topic}**\n\n**Definition:**\nA fundamental concept in {topic_mapping.subcategory}\n\n**Key Notions:**\n• Core mechanisms\n• Clinical applications\n• Related pathways\n\n**Clinical Relevance:**\nImportant for understanding {topic_mapping.subcategory} principles",
             
@@ -236,6 +344,7 @@ Keep it concise, technical, and focused on essential notions. No extra formattin
     def _create_fallback_content(self, topic: str, user_context: UserContext, 
                                topic_mapping: ProgramMapping) -> Dict:
         """Simple fallback when API fails"""
+        FALLBACKS.inc(kind="lesson_api")
         return {
             "lesson_content": f"**{topic}**\n\nBasic overview of {topic} in {topic_mapping.subcategory}.\n\n**Key Notions:**\n• Fundamental concepts\n• Clinical applications\n• Related mechanisms",
             "target_concepts": [topic],
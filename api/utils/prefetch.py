@@ -0,0 +1,159 @@
+"""
+Related Topic Prefetcher
+Speculatively warms the base lesson cache for neighbouring topics after a lesson is served
+"""
+
+import os
+import logging
+import time
+import asyncio
+import contextvars
+from collections import deque
+from typing import Callable, List, Optional
+
+from api.models.lesson_models import ProgramMapping
+from api.utils.lesson_cache import LessonCache
+from api.utils.usage_tracking import tag_usage
+
+logger = logging.getLogger(__name__)
+
+
+class TopicPrefetcher:
+    """
+    Opt-in background prefetcher for related topics
+
+    - Runs below interactive work: waits until no interactive lesson request is in flight
+    - Global budget: at most `budget_per_hour` prefetches and `max_pending` queued topics
+    - Deduplicates against the cache, in-flight generations and its own queue
+    """
+
+    def __init__(self, cache: LessonCache, orchestrator_factory: Callable,
+                 enabled: Optional[bool] = None, topics_per_lesson: Optional[int] = None,
+                 budget_per_hour: Optional[int] = None, max_pending: int = 32):
+        """Initialize the prefetcher from arguments or environment variables"""
+        if enabled is None:
+            enabled = os.environ.get("LESSON_PREFETCH_ENABLED", "false").lower() in ("1", "true", "yes")
+        self.enabled = enabled
+        self.topics_per_lesson = topics_per_lesson if topics_per_lesson is not None else \
+            int(os.environ.get("LESSON_PREFETCH_TOPICS", "2"))
+        self.budget_per_hour = budget_per_hour if budget_per_hour is not None else \
+            int(os.environ.get("LESSON_PREFETCH_BUDGET_PER_HOUR", "60"))
+        self.max_pending = max_pending
+
+        self.cache = cache
+        self.orchestrator_factory = orchestrator_factory
+
+        self._queue: deque = deque()
+        self._queued_keys = set()
+        self._spent_at: deque = deque()
+        self._interactive_requests = 0
+        self._idle: Optional[asyncio.Event] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        self.completed = 0
+        self.skipped = 0
+
+    # =========================================================================
+    # INTERACTIVE PRIORITY
+    # =========================================================================
+
+    def interactive_started(self):
+        """Mark the start of an interactive lesson request"""
+        self._interactive_requests += 1
+        if self._idle is not None:
+            self._idle.clear()
+
+    def interactive_finished(self):
+        """Mark the end of an interactive lesson request"""
+        self._interactive_requests = max(0, self._interactive_requests - 1)
+        if self._interactive_requests == 0 and self._idle is not None:
+            self._idle.set()
+
+    # =========================================================================
+    # SCHEDULING
+    # =========================================================================
+
+    def schedule(self, topic_mapping: ProgramMapping, level: str, related_topics: List[str]):
+        """Queue base lesson warm-up for the next related topics of a served lesson"""
+        if not self.enabled or self.topics_per_lesson <= 0:
+            return
+
+        candidates = [t for t in related_topics if t.lower().strip() != topic_mapping.topic.lower().strip()]
+        for related_topic in candidates[:self.topics_per_lesson]:
+            mapping = ProgramMapping(
+                topic=related_topic,
+                category=topic_mapping.category,
+                subcategory=topic_mapping.subcategory,
+                semester=topic_mapping.semester,
+                similarity_score=1.0
+            )
+            key = self.orchestrator_factory.base_lesson_key(related_topic, level, mapping)
+
+            if key in self._queued_keys or self.cache.contains(key) or self.cache.is_in_flight(key):
+                self.skipped += 1
+                continue
+            if len(self._queue) >= self.max_pending:
+                self.skipped += 1
+                continue
+
+            self._queue.append((key, related_topic, level, mapping, related_topics))
+            self._queued_keys.add(key)
+
+        if self._queue:
+            self._ensure_worker()
+            self._wakeup.set()
+
+    def _ensure_worker(self):
+        """Start the background worker on the running event loop if needed"""
+        loop = asyncio.get_running_loop()
+        if self._worker is not None and not self._worker.done() and self._worker.get_loop() is loop:
+            return
+
+        self._idle = asyncio.Event()
+        if self._interactive_requests == 0:
+            self._idle.set()
+        self._wakeup = asyncio.Event()
+        # Not the context of the request that triggered it: its request ID and usage tags would stick
+        self._worker = loop.create_task(self._run(), context=contextvars.Context())
+
+    def _consume_budget(self) -> bool:
+        """Take one unit from the hourly prefetch budget"""
+        now = time.monotonic()
+        while self._spent_at and now - self._spent_at[0] > 3600:
+            self._spent_at.popleft()
+        if len(self._spent_at) >= self.budget_per_hour:
+            return False
+        self._spent_at.append(now)
+        return True
+
+    async def _run(self):
+        """Process queued prefetches one at a time, only while interactive traffic is idle"""
+        tag_usage(endpoint="prefetch", user_id="")
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            await self._idle.wait()
+
+            key, topic, level, mapping, related_topics = self._queue.popleft()
+            self._queued_keys.discard(key)
+
+            if self.cache.contains(key) or self.cache.is_in_flight(key):
+                self.skipped += 1
+                continue
+            if not self._consume_budget():
+                self.skipped += 1
+                continue
+
+            orchestrator = self.orchestrator_factory()
+            try:
+                logger.debug("🔮 Prefetching base lesson: %s > %s", mapping.subcategory, topic)
+                await orchestrator.get_base_lesson(topic, level, mapping, related_topics)
+                self.completed += 1
+            except Exception as e:
+                logger.warning("⚠️ Prefetch failed for '%s': %s", topic, e)
+            finally:
+                orchestrator.close()
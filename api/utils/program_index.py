@@ -0,0 +1,441 @@
+"""
+Compiled Academic Program Index
+Immutable snapshot of program.json (mappings, hierarchy and match indexes) cached on disk by content hash
+"""
+
+import io
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from bisect import bisect_right
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from api.models.lesson_models import ProgramMapping
+
+logger = logging.getLogger(__name__)
+
+# Bump when the snapshot layout changes so stale files are rebuilt
+SNAPSHOT_VERSION = 1
+
+# Similarity given to topics that contain the search term or are contained in it
+CONTAINMENT_SCORE = 0.8
+
+
+def _normalize(text: str) -> str:
+    return text.lower().strip()
+
+
+class ProgramIndex:
+    """
+    Read-only program index shared by every request
+
+    Topics are stored column-wise (names, category/subcategory codes, semesters)
+    and only turned into ProgramMapping objects for lookup results. Fuzzy
+    matching bounds SequenceMatcher.ratio() by the character-multiset overlap
+    of each topic (its quick_ratio), computed for all topics at once, so only
+    the few topics that can still win are compared in full.
+    """
+
+    def __init__(self, digest: str, topics: List[str], categories: List[str], subcategories: List[str],
+                 category_codes: np.ndarray, subcategory_codes: np.ndarray, semesters: np.ndarray,
+                 alphabet: str, char_counts: np.ndarray, embeddings: Optional[np.ndarray] = None):
+        """Assemble an index from its columns (use build() or from_bytes())"""
+        self.digest = digest
+        self.topics = topics
+        self.categories = categories
+        self.subcategories = subcategories
+        self.category_codes = category_codes
+        self.subcategory_codes = subcategory_codes
+        self.semesters = semesters
+        self.alphabet = alphabet
+        self.char_counts = char_counts
+        self.embeddings = embeddings
+
+        # Derived lookups, cheap to rebuild from the columns
+        self._normalized = [_normalize(topic) for topic in topics]
+        self._lengths = np.array([len(topic) for topic in self._normalized], dtype=np.int32)
+        self._columns = {char: position for position, char in enumerate(alphabet)}
+        self._joined = "\n".join(self._normalized)
+        self._starts = np.cumsum([0] + [len(topic) + 1 for topic in self._normalized[:-1]]).tolist()
+
+        self._exact: Dict[str, int] = {}
+        self._by_subcategory: Dict[Tuple[int, int], List[int]] = {}
+        self._subcategories_by_category: Dict[int, List[str]] = {}
+        for position, topic in enumerate(self._normalized):
+            self._exact.setdefault(topic, position)
+            category, subcategory = int(category_codes[position]), int(subcategory_codes[position])
+            self._by_subcategory.setdefault((category, subcategory), []).append(position)
+            names = self._subcategories_by_category.setdefault(category, [])
+            if subcategories[subcategory] not in names:
+                names.append(subcategories[subcategory])
+        self._category_codes = {name: code for code, name in enumerate(categories)}
+        self._subcategory_codes = {name: code for code, name in enumerate(subcategories)}
+
+    def __len__(self) -> int:
+        return len(self.topics)
+
+    # =========================================================================
+    # BUILD AND SERIALIZATION
+    # =========================================================================
+
+    @classmethod
+    def build(cls, program_data: List[Dict], digest: str = "", with_embeddings: bool = False) -> "ProgramIndex":
+        """Compile the index from parsed program.json data"""
+        topics, category_codes, subcategory_codes, semesters = [], [], [], []
+        categories: Dict[str, int] = {}
+        subcategories: Dict[str, int] = {}
+
+        for ue in program_data:
+            category = ue.get("category", "Unknown")
+            semester = ue.get("semester", 1)
+            for subcategory_data in ue.get("subcategories", []):
+                subcategory = subcategory_data.get("name", "Unknown")
+                for topic in subcategory_data.get("topics", []):
+                    topics.append(topic)
+                    category_codes.append(categories.setdefault(category, len(categories)))
+                    subcategory_codes.append(subcategories.setdefault(subcategory, len(subcategories)))
+                    semesters.append(semester)
+
+        normalized = [_normalize(topic) for topic in topics]
+        alphabet = "".join(sorted(set("".join(normalized))))
+        columns = {char: position for position, char in enumerate(alphabet)}
+        char_counts = np.zeros((len(topics), len(alphabet)), dtype=np.uint16)
+        for row, topic in enumerate(normalized):
+            for char in topic:
+                char_counts[row, columns[char]] += 1
+
+        embeddings = None
+        if with_embeddings and topics:
+            from api.utils.local_vector_store import HashingVectorizer
+
+            vectorizer = HashingVectorizer(dim=int(os.environ.get("LOCAL_VECTOR_DIM", "1024")))
+            names = {code: name for name, code in subcategories.items()}
+            embeddings = vectorizer.embed_many(
+                f"{topic} {names[code]}" for topic, code in zip(topics, subcategory_codes)
+            )
+
+        return cls(
+            digest=digest,
+            topics=topics,
+            categories=list(categories),
+            subcategories=list(subcategories),
+            category_codes=np.array(category_codes, dtype=np.int32),
+            subcategory_codes=np.array(subcategory_codes, dtype=np.int32),
+            semesters=np.array(semesters, dtype=np.int16),
+            alphabet=alphabet,
+            char_counts=char_counts,
+            embeddings=embeddings
+        )
+
+    def to_bytes(self) -> bytes:
+        """Uncompressed .npz: string tables as one JSON blob plus the numeric columns"""
+        header = json.dumps({
+            "version": SNAPSHOT_VERSION,
+            "digest": self.digest,
+            "topics": self.topics,
+            "categories": self.categories,
+            "subcategories": self.subcategories,
+            "alphabet": self.alphabet
+        }, ensure_ascii=False).encode("utf-8")
+        arrays = {
+            "header": np.frombuffer(header, dtype=np.uint8),
+            "category_codes": self.category_codes,
+            "subcategory_codes": self.subcategory_codes,
+            "semesters": self.semesters,
+            "char_counts": self.char_counts
+        }
+        if self.embeddings is not None:
+            arrays["embeddings"] = self.embeddings
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ProgramIndex":
+        """Load a snapshot written by to_bytes()"""
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            header = json.loads(arrays["header"].tobytes().decode("utf-8"))
+            if header.get("version") != SNAPSHOT_VERSION:
+                raise ValueError(f"snapshot version {header.get('version')} != {SNAPSHOT_VERSION}")
+            return cls(
+                digest=header["digest"],
+                topics=header["topics"],
+                categories=header["categories"],
+                subcategories=header["subcategories"],
+                category_codes=arrays["category_codes"],
+                subcategory_codes=arrays["subcategory_codes"],
+                semesters=arrays["semesters"],
+                alphabet=header["alphabet"],
+                char_counts=arrays["char_counts"],
+                embeddings=arrays["embeddings"] if "embeddings" in arrays.files else None
+            )
+
+    # =========================================================================
+    # LOOKUPS
+    # =========================================================================
+
+    def mapping(self, position: int, similarity_score: float = 0.0) -> ProgramMapping:
+        """ProgramMapping for one topic"""
+        return ProgramMapping(
+            topic=self.topics[position],
+            category=self.categories[self.category_codes[position]],
+            subcategory=self.subcategories[self.subcategory_codes[position]],
+            semester=int(self.semesters[position]),
+            similarity_score=similarity_score
+        )
+
+    def mappings(self) -> List[ProgramMapping]:
+        """All topics as ProgramMapping objects, in program order"""
+        return [self.mapping(position) for position in range(len(self.topics))]
+
+    def _contained(self, search: str) -> np.ndarray:
+        """Mask of topics containing the search term or contained in it"""
+        mask = np.zeros(len(self.topics), dtype=bool)
+        # Search term inside a topic: scan the newline-joined topics with str.find
+        if search and "\n" not in search:
+            start = self._joined.find(search)
+            while start != -1:
+                mask[bisect_right(self._starts, start) - 1] = True
+                start = self._joined.find(search, start + 1)
+        elif not search:
+            mask[:] = True
+        # Topic inside the search term: only topics no longer than it can be
+        for position in np.flatnonzero(self._lengths <= len(search)):
+            if self._normalized[position] in search:
+                mask[position] = True
+        return mask
+
+    def best_match(self, search_topic: str, threshold: float = 0.6) -> Optional[Tuple[int, float]]:
+        """
+        (position, similarity) of the best matching topic, as the linear scan of
+        AcademicProgramLoader used to pick it: highest similarity, first in program order on ties
+        """
+        if not self.topics:
+            return None
+        search = _normalize(search_topic)
+
+        exact = self._exact.get(search)
+        if exact is not None:
+            return exact, 1.0
+
+        # Upper bound of SequenceMatcher.ratio() for every topic
+        query_counts = np.zeros(len(self.alphabet), dtype=np.uint16)
+        for char in search:
+            column = self._columns.get(char)
+            if column is not None:
+                query_counts[column] += 1
+        overlap = np.minimum(self.char_counts, query_counts).sum(axis=1)
+        totals = self._lengths + len(search)
+        bounds = np.where(totals > 0, 2.0 * overlap / np.maximum(totals, 1), 1.0)
+
+        contained = self._contained(search)
+        bounds = np.where(contained, np.maximum(bounds, CONTAINMENT_SCORE), bounds)
+
+        candidates = np.flatnonzero(bounds >= threshold)
+        order = candidates[np.lexsort((candidates, -bounds[candidates]))]
+
+        best_position, best_score = -1, 0.0
+        for position in order.tolist():
+            bound = bounds[position]
+            if bound < best_score:
+                break
+            if bound == best_score and position > best_position:
+                continue
+            if contained[position] and bound <= CONTAINMENT_SCORE:
+                score = CONTAINMENT_SCORE
+            else:
+                score = SequenceMatcher(None, search, self._normalized[position]).ratio()
+                if contained[position]:
+                    score = max(score, CONTAINMENT_SCORE)
+            if score >= threshold and (score > best_score or (score == best_score and position < best_position)):
+                best_position, best_score = position, score
+
+        return (best_position, best_score) if best_position >= 0 else None
+
+    def related_topics(self, category: str, subcategory: str, limit: int = 5) -> List[str]:
+        """First `limit` topics of a subcategory, in program order"""
+        key = (self._category_codes.get(category, -1), self._subcategory_codes.get(subcategory, -1))
+        return [self.topics[position] for position in self._by_subcategory.get(key, [])[:limit]]
+
+    def subcategories_of(self, category: str) -> List[str]:
+        """Subcategories of a category, in program order"""
+        return list(self._subcategories_by_category.get(self._category_codes.get(category, -1), []))
+
+    def similar_topics(self, text: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """Nearest topics by embedding (needs PROGRAM_INDEX_EMBEDDINGS=1)"""
+        if self.embeddings is None or not len(self.topics):
+            return []
+        from api.utils.local_vector_store import HashingVectorizer
+
+        query = HashingVectorizer(dim=self.embeddings.shape[1]).embed(text)
+        scores = self.embeddings @ query
+        top = np.argsort(-scores, kind="stable")[:limit]
+        return [(self.topics[position], float(scores[position])) for position in top]
+
+
+# =============================================================================
+# SNAPSHOT CACHE AND HOT RELOAD
+# =============================================================================
+
+def _snapshot_dir() -> str:
+    return os.environ.get("PROGRAM_INDEX_DIR", ".data/program_index")
+
+
+def _write_snapshot(index: ProgramIndex, path: str, keep: int = 8):
+    """Atomic write, keeping the `keep` most recent snapshots"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(index.to_bytes())
+    os.replace(temp_path, path)
+
+    snapshots = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith(".npz")),
+        key=lambda entry: entry.stat().st_mtime, reverse=True
+    )
+    for entry in snapshots[keep:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def load_program_index(program_file: str, strict: bool = False) -> ProgramIndex:
+    """
+    Index for the current content of program_file: read from the snapshot keyed
+    by its SHA-256 when present, otherwise compiled from the JSON and saved
+
+    A missing or unparsable file gives an empty index, or raises ValueError when strict.
+    """
+    try:
+        with open(program_file, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        if strict:
+            raise ValueError(f"Program file {program_file} not found")
+        logger.warning("⚠️ Program file %s not found, using default structure", program_file)
+        return ProgramIndex.build([])
+
+    digest = hashlib.sha256(raw).hexdigest()
+    with_embeddings = os.environ.get("PROGRAM_INDEX_EMBEDDINGS", "0") == "1"
+    suffix = "-emb" if with_embeddings else ""
+    snapshot_path = os.path.join(_snapshot_dir(), f"{digest[:32]}{suffix}.npz")
+
+    try:
+        with open(snapshot_path, "rb") as f:
+            index = ProgramIndex.from_bytes(f.read())
+        if index.digest == digest:
+            return index
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning("⚠️ Ignoring unreadable program snapshot %s: %s", snapshot_path, e)
+
+    try:
+        program_data = json.loads(raw.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        if strict:
+            raise ValueError(f"Error parsing program file {program_file}: {e}")
+        logger.warning("⚠️ Error parsing program file: %s", e)
+        return ProgramIndex.build([], digest)
+
+    started = time.perf_counter()
+    index = ProgramIndex.build(program_data, digest, with_embeddings)
+    try:
+        _write_snapshot(index, snapshot_path)
+    except OSError as e:
+        logger.warning("⚠️ Could not write program snapshot: %s", e)
+    logger.info("📚 Compiled program index: %s topics in %.0f ms", len(index), (time.perf_counter() - started) * 1000)
+    return index
+
+
+class ProgramIndexRegistry:
+    """
+    Current index per program file, swapped atomically when the file changes
+
+    A daemon thread polls the modification time and size of every loaded
+    program file (PROGRAM_WATCH_INTERVAL seconds, 0 disables it) and replaces
+    the index reference once the new content is compiled; readers always see
+    either the old or the new index, never a partial one.
+    """
+
+    def __init__(self, watch_interval: Optional[float] = None):
+        """Initialize with the polling interval"""
+        self.watch_interval = watch_interval if watch_interval is not None else \
+            float(os.environ.get("PROGRAM_WATCH_INTERVAL", "2"))
+        self._indexes: Dict[str, ProgramIndex] = {}
+        self._stats: Dict[str, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self.reloads = 0
+
+    @staticmethod
+    def _stat(path: str) -> Tuple[float, int]:
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime, stat.st_size
+        except OSError:
+            return 0.0, -1
+
+    def get(self, program_file: str) -> ProgramIndex:
+        """Current index of a program file, loaded on first use"""
+        path = os.path.abspath(program_file)
+        index = self._indexes.get(path)
+        if index is not None:
+            return index
+        with self._lock:
+            if path not in self._indexes:
+                self._stats[path] = self._stat(path)
+                self._indexes[path] = load_program_index(path)
+                self._ensure_watcher()
+            return self._indexes[path]
+
+    def refresh(self, program_file: str) -> bool:
+        """
+        Reload a program file if its content changed; True when a new index was swapped in
+
+        A missing, partially written or invalid file keeps the current index: the
+        next change of the file (e.g. the end of the save) triggers another reload.
+        """
+        path = os.path.abspath(program_file)
+        stat = self._stat(path)
+        if stat == self._stats.get(path):
+            return False
+        self._stats[path] = stat
+        try:
+            index = load_program_index(path, strict=path in self._indexes)
+        except ValueError as e:
+            logger.error("❌ Keeping the current program index: %s", e)
+            return False
+        current = self._indexes.get(path)
+        if current is not None and current.digest == index.digest:
+            return False
+        self._indexes[path] = index
+        self.reloads += 1
+        logger.info("🔄 Program index reloaded: %s (%s topics)", os.path.basename(path), len(index))
+        return True
+
+    def _ensure_watcher(self):
+        if self._watcher is None and self.watch_interval > 0:
+            self._watcher = threading.Thread(target=self._watch, name="program-index-watch", daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.watch_interval)
+            for path in list(self._indexes):
+                try:
+                    self.refresh(path)
+                except Exception as e:
+                    logger.error("❌ Program index reload failed for %s: %s", path, e)
+
+
+# Global registry
+program_indexes = ProgramIndexRegistry()
@@ -1,10 +1,13 @@
 import json
 from enum import Enum
-from openai.types.chat.chat_completion_message_param import ChatCompletionMessageParam
 from pydantic import BaseModel
 import base64
-from typing import List, Optional, Any
+from typing import TYPE_CHECKING, List, Optional, Any
 from .attachment import ClientAttachment
+from .attachment_pipeline import attachment_pipeline
+
+if TYPE_CHECKING:  # openai is slow to import and only needed for the type
+    from openai.types.chat.chat_completion_message_param import ChatCompletionMessageParam
 
 class ToolInvocationState(str, Enum):
     CALL = 'call'
@@ -25,61 +28,58 @@ class ClientMessage(BaseModel):
     experimental_attachments: Optional[List[ClientAttachment]] = None
     toolInvocations: Optional[List[ToolInvocation]] = None
 
-def convert_to_openai_messages(messages: List[ClientMessage]) -> List[ChatCompletionMessageParam]:
+def convert_to_openai_messages(messages: List[ClientMessage]) -> List["ChatCompletionMessageParam"]:
     openai_messages = []
 
     for message in messages:
-        parts = []
-        tool_calls = []
-
-        parts.append({
-            'type': 'text',
-            'text': message.content
-        })
-
-        if (message.experimental_attachments):
-            for attachment in message.experimental_attachments:
-                if (attachment.contentType.startswith('image')):
-                    parts.append({
-                        'type': 'image_url',
-                        'image_url': {
-                            'url': attachment.url
-                        }
-                    })
-
-                elif (attachment.contentType.startswith('text')):
-                    parts.append({
-                        'type': 'text',
-                        'text': attachment.url
-                    })
-
-        if(message.toolInvocations):
-            for toolInvocation in message.toolInvocations:
-                tool_calls.append({
-                    "id": toolInvocation.toolCallId,
-                    "type": "function",
-                    "function": {
-                        "name": toolInvocation.toolName,
-                        "arguments": json.dumps(toolInvocation.args)
-                    }
-                })
-
-        tool_calls_dict = {"tool_calls": tool_calls} if tool_calls else {"tool_calls": None}
-
-        openai_messages.append({
-            "role": message.role,
-            "content": parts,
-            **tool_calls_dict,
-        })
-
-        if(message.toolInvocations):
-            for toolInvocation in message.toolInvocations:
-                tool_message = {
-                    "role": "tool",
-                    "tool_call_id": toolInvocation.toolCallId,
-                    "content": json.dumps(toolInvocation.result),
+        openai_messages.extend(convert_message(message))
+
+    return openai_messages
+
+def convert_message(message: ClientMessage) -> List["ChatCompletionMessageParam"]:
+    """Convert one client message into its provider message and tool result messages"""
+    openai_messages = []
+    parts = []
+    tool_calls = []
+
+    parts.append({
+        'type': 'text',
+        'text': message.content
+    })
+
+    if (message.experimental_attachments):
+        for attachment in message.experimental_attachments:
+            part = attachment_pipeline.to_part(attachment)
+            if part is not None:
+                parts.append(part)
+
+    if(message.toolInvocations):
+        for toolInvocation in message.toolInvocations:
+            tool_calls.append({
+                "id": toolInvocation.toolCallId,
+                "type": "function",
+                "function": {
+                    "name": toolInvocation.toolName,
+                    "arguments": json.dumps(toolInvocation.args)
                 }
+            })
+
+    tool_calls_dict = {"tool_calls": tool_calls} if tool_calls else {"tool_calls": None}
+
+    openai_messages.append({
+        "role": message.role,
+        "content": parts,
+        **tool_calls_dict,
+    })
+
+    if(message.toolInvocations):
+        for toolInvocation in message.toolInvocations:
+            tool_message = {
+                "role": "tool",
+                "tool_call_id": toolInvocation.toolCallId,
+                "content": json.dumps(toolInvocation.result),
+            }
 
-                openai_messages.append(tool_message)
+            openai_messages.append(tool_message)
 
     return openai_messages
@@ -0,0 +1,199 @@
+"""
+Near-duplicate Question Detection
+MinHash signatures over normalized stem and option text, indexed with banded LSH buckets in SQLite
+"""
+
+import os
+import re
+import sqlite3
+import hashlib
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from api.utils.ids import normalize_text
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Words that flip what a stem asks for ("Which is NOT ...", "... EXCEPT", "Quelle proposition est fausse ?")
+NEGATION_TOKENS = frozenset({
+    "not", "except", "false", "incorrect", "untrue", "wrong", "never", "least",
+    "pas", "sauf", "faux", "fausse", "inexact", "inexacte", "incorrecte"
+})
+
+# 16 bands of 8 rows: pairs above ~0.7 Jaccard almost always share a bucket, pairs below ~0.4 rarely do
+BANDS = 16
+ROWS = 8
+NUM_PERM = BANDS * ROWS
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+@lru_cache(maxsize=200_000)
+def _shingle_hash(shingle: str) -> int:
+    """Stable 32-bit hash of a shingle"""
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def question_shingles(text: str, options: Iterable[str]) -> Set[str]:
+    """Word bigrams of the stem and words of the options (option order does not matter)"""
+    stem = TOKEN_PATTERN.findall(normalize_text(text))
+    shingles = {f"s:{a} {b}" for a, b in zip(stem, stem[1:])} or {f"s:{word}" for word in stem}
+    for option in options:
+        words = TOKEN_PATTERN.findall(normalize_text(option))
+        shingles.update(f"o:{a} {b}" for a, b in zip(words, words[1:]))
+        shingles.update(f"o:{word}" for word in words)
+    return shingles
+
+
+def question_guard(text: str, answer: str) -> str:
+    """
+    Exact part of a question's identity: whether the stem is negated, and the correct option text
+
+    Near-duplicates must share it, so a negated variant or one with another answer is never merged.
+    """
+    negated = bool(NEGATION_TOKENS.intersection(TOKEN_PATTERN.findall(normalize_text(text))))
+    key = f"{'neg' if negated else 'pos'}\n{normalize_text(answer)}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class MinHasher:
+    """MinHash over 32-bit shingle hashes with NUM_PERM universal hash permutations"""
+
+    def __init__(self, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE_PRIME, NUM_PERM, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, NUM_PERM, dtype=np.uint64)
+
+    def signature(self, shingles: Set[str]) -> np.ndarray:
+        """uint32 signature of NUM_PERM minimums (all ones for an empty set)"""
+        if not shingles:
+            return np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint32)
+        hashes = np.fromiter((_shingle_hash(shingle) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+        permuted = (hashes[:, None] * self.a + self.b) % MERSENNE_PRIME
+        return permuted.min(axis=0).astype(np.uint32)
+
+    @staticmethod
+    def band_keys(signature: np.ndarray, guard: str = "") -> List[int]:
+        """One signed 64-bit bucket key per band (SQLite INTEGER), only shared by questions with the same guard"""
+        return [
+            int.from_bytes(hashlib.blake2b(guard.encode("ascii") + band.tobytes(), digest_size=8).digest(),
+                           "little", signed=True)
+            for band in signature.reshape(BANDS, ROWS)
+        ]
+
+    @staticmethod
+    def similarity(first: np.ndarray, second: np.ndarray) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return float(np.count_nonzero(first == second)) / NUM_PERM
+
+
+class QuestionDeduplicator:
+    """
+    Links near-duplicate questions to one canonical question ID
+
+    - Only canonical questions are indexed, so the index grows with unique questions
+    - A candidate must have the same guard (negation and correct option text), share at
+      least one LSH band and reach `threshold` estimated Jaccard similarity
+    - Uses the caller's SQLite connection and transaction (the knowledge tracing database)
+    """
+
+    def __init__(self, conn: sqlite3.Connection, threshold: Optional[float] = None):
+        """Create the signature and bucket tables if needed"""
+        self.conn = conn
+        self.threshold = threshold if threshold is not None else \
+            float(os.environ.get("QUESTION_DEDUPE_THRESHOLD", "0.8"))
+        self.hasher = MinHasher()
+        with self.conn:
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(question_signatures)")}
+            if columns and "guard" not in columns:
+                # Index built before guards: its aliases may merge opposite questions, rebuild it from scratch
+                self.conn.executescript("""
+                    DROP TABLE question_aliases;
+                    DROP TABLE question_signatures;
+                    DROP TABLE question_lsh_buckets;
+                """)
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS question_aliases (
+                    question_id TEXT PRIMARY KEY,
+                    canonical_id TEXT NOT NULL,
+                    similarity REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_question_aliases_canonical ON question_aliases(canonical_id);
+                CREATE TABLE IF NOT EXISTS question_signatures (
+                    question_id TEXT PRIMARY KEY,
+                    signature BLOB NOT NULL,
+                    guard TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS question_lsh_buckets (
+                    band INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    question_id TEXT NOT NULL,
+                    PRIMARY KEY (band, bucket, question_id)
+                ) WITHOUT ROWID;
+            """)
+
+    def canonicalize(self, question_id: str, text: str, options: Iterable[str], answer: str = "") -> str:
+        """
+        Canonical ID of a question, indexing it as a new canonical question when nothing is close enough
+
+        Args:
+            answer: Text of the correct option
+        """
+        row = self.conn.execute(
+            "SELECT canonical_id FROM question_aliases WHERE question_id = ?", (question_id,)
+        ).fetchone()
+        if row is not None:
+            return row[0]
+
+        guard = question_guard(text, answer)
+        signature = self.hasher.signature(question_shingles(text, options))
+        keys = self.hasher.band_keys(signature, guard)
+        canonical_id, similarity = self._best_candidate(signature, keys, guard)
+
+        if canonical_id is None:
+            canonical_id, similarity = question_id, 1.0
+            self.conn.execute(
+                "INSERT OR REPLACE INTO question_signatures (question_id, signature, guard) VALUES (?, ?, ?)",
+                (question_id, signature.tobytes(), guard)
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO question_lsh_buckets (band, bucket, question_id) VALUES (?, ?, ?)",
+                [(band, key, question_id) for band, key in enumerate(keys)]
+            )
+        self.conn.execute(
+            "INSERT OR REPLACE INTO question_aliases (question_id, canonical_id, similarity) VALUES (?, ?, ?)",
+            (question_id, canonical_id, similarity)
+        )
+        return canonical_id
+
+    def _best_candidate(self, signature: np.ndarray, keys: List[int], guard: str):
+        """Most similar indexed canonical question above the threshold, as (ID, similarity) or (None, 0)"""
+        clauses = " OR ".join("(band = ? AND bucket = ?)" for _ in keys)
+        params = [value for band, key in enumerate(keys) for value in (band, key)]
+        candidates = [row[0] for row in self.conn.execute(
+            f"SELECT DISTINCT question_id FROM question_lsh_buckets WHERE {clauses}", params
+        )]
+        if not candidates:
+            return None, 0.0
+
+        placeholders = ",".join("?" for _ in candidates)
+        best_id, best_similarity = None, 0.0
+        for candidate_id, blob in self.conn.execute(
+            f"SELECT question_id, signature FROM question_signatures WHERE question_id IN ({placeholders}) AND guard = ?",
+            candidates + [guard]
+        ):
+            similarity = self.hasher.similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+            if similarity >= self.threshold and (similarity, candidate_id) > (best_similarity, best_id or ""):
+                best_id, best_similarity = candidate_id, similarity
+        return best_id, best_similarity
+
+    def canonical_ids(self, question_ids: List[str]) -> Dict[str, str]:
+        """Canonical IDs of known questions (unknown IDs are left out)"""
+        if not question_ids:
+            return {}
+        placeholders = ",".join("?" for _ in question_ids)
+        return dict(self.conn.execute(
+            f"SELECT question_id, canonical_id FROM question_aliases WHERE question_id IN ({placeholders})",
+            question_ids
+        ).fetchall())
@@ -0,0 +1,88 @@
+"""
+Retrieval Backends
+Common interface of the RAG retrieval step - Weaviate Cloud or a local in-process vector store
+"""
+
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from api.models.lesson_models import UserContext, ProgramMapping
+from api.utils.mistral_service import MistralService
+
+
+class RetrievalBackend(ABC):
+    """
+    Retrieval backend for medical content
+    Search is backend-specific, generation always goes through MistralService
+    """
+
+    mistral_service: MistralService
+
+    @abstractmethod
+    async def search_medical_knowledge(self, topic: str, user_context: UserContext,
+                                       topic_mapping: ProgramMapping, related_topics: List[str]) -> List[Dict]:
+        """Return the documents relevant to a topic, best first"""
+
+    async def generate_lesson_content(self, topic: str, user_context: UserContext,
+                                      relevant_content: List[Dict], topic_mapping: ProgramMapping,
+                                      related_topics: List[str]) -> Dict:
+        """Generate lesson content using MistralService"""
+        return await self.mistral_service.generate_lesson_content(
+            topic, user_context, relevant_content, topic_mapping, related_topics
+        )
+
+    def close(self):
+        """Release backend resources"""
+
+
+def build_search_query(topic: str, user_context: UserContext, topic_mapping: ProgramMapping,
+                       related_topics: List[str]) -> str:
+    """Search query enriched with the academic context"""
+    search_terms = [
+        topic,
+        topic_mapping.topic,
+        topic_mapping.category,
+        topic_mapping.subcategory,
+        "medical education",
+        "anatomy", "physiology", "medicine",
+        *user_context.weak_concepts,
+        *related_topics
+    ]
+    return " ".join(search_terms)
+
+
+def format_search_result(properties: Dict, score: float, topic: str, user_context: UserContext,
+                         topic_mapping: ProgramMapping) -> Dict:
+    """Document dict passed to lesson generation, identical for every backend"""
+    return {
+        "title": properties.get("title", ""),
+        "content": properties.get("content", ""),
+        "abstract": properties.get("abstract", ""),
+        "source_file": properties.get("source_file", ""),
+        "content_type": properties.get("content_type", ""),
+        "medical_domain": properties.get("medical_domain", ""),
+        "content_category": properties.get("content_category", ""),
+        "mistral_domain": properties.get("mistral_domain", ""),
+        "mistral_concepts": properties.get("mistral_concepts", []),
+        "difficulty_level": properties.get("difficulty_level", user_context.current_level),
+        "learning_objectives": properties.get("learning_objectives", []),
+        "score": score,
+        "category": topic_mapping.category,
+        "subcategory": topic_mapping.subcategory,
+        "topic": topic,
+        "semester": topic_mapping.semester,
+        "academic_context": f"{topic_mapping.category} > {topic_mapping.subcategory}"
+    }
+
+
+def create_retrieval_backend(mistral_service: Optional[MistralService] = None) -> RetrievalBackend:
+    """Build the backend selected by RETRIEVAL_BACKEND (weaviate or local)"""
+    backend = os.environ.get("RETRIEVAL_BACKEND", "weaviate").lower()
+    if backend == "local":
+        from api.utils.local_vector_store import LocalRetrievalService
+        return LocalRetrievalService(mistral_service=mistral_service)
+    if backend != "weaviate":
+        raise ValueError(f"Unknown RETRIEVAL_BACKEND: {backend}")
+    from api.utils.weaviate_service import WeaviateService
+    return WeaviateService(mistral_service=mistral_service)
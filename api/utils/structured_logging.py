@@ -0,0 +1,168 @@
+"""
+Structured Logging
+Queue-based logging with request correlation, per-module levels and sampling of debug events
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+import contextvars
+import logging.handlers
+from typing import Dict, Optional
+
+# Attributes of every LogRecord; anything else was passed through `extra=` and is emitted as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+_request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def get_request_id() -> str:
+    """Correlation ID of the current request ("-" outside requests)"""
+    return _request_id.get()
+
+
+def bind_request_id(request_id: str):
+    """Attribute later records of the current context (e.g. a background job) to a request"""
+    _request_id.set(request_id)
+
+
+class RequestContextFilter(logging.Filter):
+    """Adds the current request ID to every record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Keeps only a fraction of DEBUG records; higher levels always pass"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or self.rate >= 1.0 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, request ID, message and extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage()
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with the request ID and extra fields appended"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s [%(request_id)s] %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+        if extra:
+            line += " " + " ".join(f"{key}={value}" for key, value in extra.items())
+        return line
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    """Parse 'api.utils.mistral_service=DEBUG,api.utils.academic_program=WARNING'"""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level: Optional[str] = None, module_levels: Optional[str] = None,
+                      debug_sample_rate: Optional[float] = None, log_format: Optional[str] = None):
+    """
+    Route the `api` loggers through a queue to a background thread (idempotent)
+
+    Environment variables:
+        LOG_LEVEL: Base level of the `api` loggers (default INFO)
+        LOG_LEVELS: Per-module overrides, e.g. "api.utils.mistral_service=DEBUG"
+        LOG_DEBUG_SAMPLE_RATE: Fraction of DEBUG records kept (default 0.1)
+        LOG_FORMAT: "json" (default) or "text"
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    level = level or os.environ.get("LOG_LEVEL", "INFO")
+    module_levels = module_levels if module_levels is not None else os.environ.get("LOG_LEVELS", "")
+    debug_sample_rate = debug_sample_rate if debug_sample_rate is not None else \
+        float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+    log_format = (log_format or os.environ.get("LOG_FORMAT", "json")).lower()
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+
+    # Request-path threads only enqueue; formatting and writing happen on the listener thread
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    queue_handler.addFilter(DebugSamplingFilter(debug_sample_rate))
+
+    api_logger = logging.getLogger("api")
+    api_logger.setLevel(level.upper())
+    api_logger.addHandler(queue_handler)
+    api_logger.propagate = False
+    for name, module_level in _parse_levels(module_levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+class RequestContextMiddleware:
+    """ASGI middleware: assigns a request ID (or reuses x-request-id), logs the request and echoes the ID"""
+
+    def __init__(self, app):
+        self.app = app
+        self.logger = logging.getLogger("api.requests")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers", [])).get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming[:64] or uuid.uuid4().hex[:16]
+        _request_id.set(request_id)
+        start = time.perf_counter()
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+                self.logger.info("request", extra={
+                    "method": scope.get("method"),
+                    "path": scope.get("path"),
+                    "status": message["status"],
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 1)
+                })
+            await send(message)
+
+        await self.app(scope, receive, send_with_request_id)
@@ -0,0 +1,247 @@
+"""
+Telemetry
+Request-scoped stage timings (Server-Timing header) and in-process Prometheus metrics
+"""
+
+import re
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+# =============================================================================
+# METRICS
+# =============================================================================
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[position] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = _format_labels(self.labels, key)
+                for bound, count in zip(self.buckets, series):
+                    bucket_labels = _format_labels(self.labels, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+                bucket_labels = _format_labels(self.labels, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {series[-2]}")
+                lines.append(f"{self.name}_count{labels} {series[-2]}")
+                lines.append(f"{self.name}_sum{labels} {series[-1]}")
+        return lines
+
+
+class CallbackMetric:
+    """Counter or gauge read from existing state at scrape time"""
+
+    def __init__(self, name: str, documentation: str, kind: str,
+                 callback: Callable[[], Iterable[Tuple[Dict[str, str], float]]]):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self.callback():
+            names = tuple(labels)
+            lines.append(f"{self.name}{_format_labels(names, tuple(labels[n] for n in names))} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-local metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def callback(self, name: str, documentation: str, callback: Callable, kind: str = "gauge") -> CallbackMetric:
+        return self._register(CallbackMetric(name, documentation, kind, callback))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                lines.append(f"# {metric.name} unavailable: {e}")
+        return "\n".join(lines) + "\n"
+
+
+# Global registry and the metrics shared across modules
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    "admissia_stage_duration_seconds", "Duration of lesson pipeline stages and external calls", ("stage",)
+)
+HTTP_SECONDS = metrics.histogram(
+    "admissia_http_request_duration_seconds", "HTTP request duration until response headers", ("method", "route", "status")
+)
+FALLBACKS = metrics.counter("admissia_fallbacks_total", "Degraded responses by kind", ("kind",))
+LLM_TOKENS = metrics.counter("admissia_llm_tokens_total", "LLM tokens by model and type", ("model", "type"))
+
+
+# =============================================================================
+# REQUEST TIMINGS
+# =============================================================================
+
+class RequestTimings:
+    """Stage durations of one request, rendered as a Server-Timing header"""
+
+    def __init__(self):
+        self.entries: List[Tuple[str, float]] = []
+        self.closed = False
+
+    def add(self, name: str, duration: float):
+        if not self.closed:
+            self.entries.append((name, duration))
+
+    def header(self) -> str:
+        """Server-Timing value; repeated stages are summed"""
+        totals: Dict[str, float] = {}
+        for name, duration in self.entries:
+            totals[name] = totals.get(name, 0.0) + duration
+        return ", ".join(
+            f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)};dur={duration * 1000:.1f}" for name, duration in totals.items()
+        )
+
+
+_request_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def start_request_timings() -> RequestTimings:
+    """Collect the spans of the current request (and the tasks it spawns)"""
+    timings = RequestTimings()
+    _request_timings.set(timings)
+    return timings
+
+
+@contextmanager
+def span(name: str):
+    """Time a block: observed in the stage histogram and added to the request's Server-Timing"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_SECONDS.observe(duration, stage=name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.add(name, duration)
+        logger.debug("span", extra={"stage": name, "duration_ms": round(duration * 1000, 1)})
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware: collects the spans of each HTTP request, adds them as a
+    Server-Timing header and records the request duration histogram
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = start_request_timings()
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - start
+                timings.add("total", total)
+                timings.closed = True
+
+                endpoint = scope.get("endpoint")
+                HTTP_SECONDS.observe(
+                    total,
+                    method=scope.get("method", ""),
+                    route=getattr(endpoint, "__name__", "unmatched"),
+                    status=message["status"]
+                )
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.header().encode("latin-1")))
+                headers.append((b"timing-allow-origin", b"*"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
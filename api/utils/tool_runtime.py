@@ -0,0 +1,137 @@
+"""
+Async Tool Runtime
+Runs chat tool calls concurrently with per-tool timeouts and a TTL result cache
+"""
+
+import json
+import logging
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ToolSpec:
+    """Registration of a single async tool"""
+
+    def __init__(self, name: str, func: Callable[..., Awaitable[Any]], timeout: float = 10.0,
+                 cache_ttl: float = 0.0, cache_key: Optional[Callable[..., Hashable]] = None):
+        """
+        Args:
+            name: Tool name as advertised to the model
+            func: Coroutine function called with the tool arguments
+            timeout: Seconds before the call is abandoned
+            cache_ttl: Seconds a result stays cached (0 disables caching)
+            cache_key: Builds the cache key from the tool arguments (defaults to the arguments)
+        """
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.cache_key = cache_key
+
+
+class ToolRuntime:
+    """
+    Executes the tool calls of a chat turn concurrently
+    Results are cached with a TTL and identical concurrent calls share one execution
+    """
+
+    def __init__(self, tools: List[ToolSpec], max_cache_entries: int = 1024):
+        """Initialize the runtime with its registered tools"""
+        self.tools: Dict[str, ToolSpec] = {tool.name: tool for tool in tools}
+        self.max_cache_entries = max_cache_entries
+        self._cache: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+    async def run_all(self, tool_calls: List[Dict]) -> List[Any]:
+        """
+        Run every tool call of a turn concurrently
+
+        Args:
+            tool_calls: Dicts with "name" and JSON-encoded "arguments"
+
+        Returns:
+            Results in the same order as the calls
+        """
+        return await asyncio.gather(*[
+            self.run(tool_call["name"], tool_call["arguments"]) for tool_call in tool_calls
+        ])
+
+    async def run(self, name: str, arguments: str) -> Any:
+        """Run one tool call, returning an error object instead of raising"""
+        tool = self.tools.get(name)
+        if tool is None:
+            return {"error": f"Unknown tool: {name}"}
+
+        try:
+            args = json.loads(arguments) if arguments else {}
+        except json.JSONDecodeError as e:
+            return {"error": f"Invalid tool arguments: {e}"}
+
+        if tool.cache_ttl <= 0:
+            return await self._execute(tool, args)
+
+        try:
+            key = (name, tool.cache_key(**args) if tool.cache_key else json.dumps(args, sort_keys=True))
+        except (TypeError, ValueError) as e:
+            return {"error": f"Invalid tool arguments: {e}"}
+
+        while True:
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                break
+            # asyncio.wait neither cancels the shared call nor raises when the leader was cancelled
+            await asyncio.wait({in_flight})
+            if not in_flight.cancelled():
+                return in_flight.result()
+            # The leader's stream was cancelled (client disconnect): run the call again
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await self._execute(tool, args)
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+        if result is not None and not (isinstance(result, dict) and "error" in result):
+            self._cache_set(key, result, tool.cache_ttl)
+        future.set_result(result)
+        return result
+
+    async def _execute(self, tool: ToolSpec, args: Dict) -> Any:
+        """Call the tool under its timeout"""
+        try:
+            return await asyncio.wait_for(tool.func(**args), timeout=tool.timeout)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Tool %s timed out after %ss", tool.name, tool.timeout)
+            return {"error": f"Tool {tool.name} timed out"}
+        except Exception as e:
+            logger.error("❌ Tool %s failed: %s", tool.name, e)
+            return {"error": f"Tool {tool.name} failed: {e}"}
+
+    def _cache_get(self, key: Hashable) -> Optional[Any]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return value
+
+    def _cache_set(self, key: Hashable, value: Any, ttl: float):
+        self._cache[key] = (time.monotonic() + ttl, value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_cache_entries:
+            self._cache.popitem(last=False)
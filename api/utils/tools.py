@@ -1,20 +1,54 @@
-import requests
+import asyncio
+import logging
 
-def get_current_weather(latitude, longitude):
+logger = logging.getLogger(__name__)
+
+WEATHER_TIMEOUT_SECONDS = 5
+
+async def get_current_weather(latitude, longitude):
     # Format the URL with proper parameter substitution
     url = f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}&current=temperature_2m&hourly=temperature_2m&daily=sunrise,sunset&timezone=auto"
 
-    try:
-        # Make the API call
-        response = requests.get(url)
+    import aiohttp  # deferred: only needed once the tool is actually called
 
-        # Raise an exception for bad status codes
-        response.raise_for_status()
+    try:
+        # Make the API call without blocking the event loop
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=WEATHER_TIMEOUT_SECONDS)) as response:
+                # Raise an exception for bad status codes
+                response.raise_for_status()
 
-        # Return the JSON response
-        return response.json()
+                # Return the JSON response
+                return await response.json()
 
-    except requests.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         # Handle any errors that occur during the request
-        print(f"Error fetching weather data: {e}")
+        logger.error("Error fetching weather data: %s", e)
         return None
+
+def weather_cache_key(latitude, longitude):
+    # Nearby coordinates (~1 km) share the same cached forecast
+    return (round(float(latitude), 2), round(float(longitude), 2))
+
+# Tool schemas advertised to the chat model
+TOOL_DEFINITIONS = [{
+    "type": "function",
+    "function": {
+        "name": "get_current_weather",
+        "description": "Get the current weather at a location",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "latitude": {
+                    "type": "number",
+                    "description": "The latitude of the location",
+                },
+                "longitude": {
+                    "type": "number",
+                    "description": "The longitude of the location",
+                },
+            },
+            "required": ["latitude", "longitude"],
+        },
+    },
+}]
@@ -0,0 +1,245 @@
+"""
+LLM Usage Accounting
+Token counters per day, endpoint, topic, prompt version, model and user, batched into SQLite
+"""
+
+import os
+import json
+import time
+import atexit
+import sqlite3
+import logging
+import threading
+import contextvars
+from typing import Dict, List, Optional, Tuple
+
+from api.utils.telemetry import LLM_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# Dimensions of an aggregated usage row, in primary key order
+DIMENSIONS = ("day", "endpoint", "category", "subcategory", "topic", "prompt_version", "model", "user_id")
+
+# USD per million (prompt, completion) tokens; USAGE_PRICES='{"model": [prompt, completion]}' overrides
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "mistral-small-latest": (0.2, 0.6),
+    "mistral-large-latest": (2.0, 6.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6)
+}
+
+# Tags of the current request (endpoint, user_id, ...), inherited by the tasks it spawns
+_usage_tags: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar("usage_tags", default={})
+
+
+def tag_usage(**tags: str):
+    """Attach tags to every LLM call made later in the current context"""
+    _usage_tags.set({**_usage_tags.get(), **{name: str(value) for name, value in tags.items()}})
+
+
+class UsageTracker:
+    """
+    In-memory usage counters flushed to SQLite in batches
+
+    Recording is a dict update under a lock; a background thread writes the
+    accumulated deltas every USAGE_FLUSH_INTERVAL seconds, or sooner once
+    USAGE_FLUSH_MAX_KEYS distinct rows are pending.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, flush_interval: Optional[float] = None,
+                 max_pending_keys: Optional[int] = None):
+        """Open (or create) the usage database; the flush thread starts on first record"""
+        self.db_path = db_path or os.environ.get("USAGE_DB_PATH", ".data/usage.db")
+        self.flush_interval = flush_interval or float(os.environ.get("USAGE_FLUSH_INTERVAL", "30"))
+        self.max_pending_keys = max_pending_keys or int(os.environ.get("USAGE_FLUSH_MAX_KEYS", "500"))
+        self.prices = {**MODEL_PRICES, **{
+            model: tuple(price) for model, price in json.loads(os.environ.get("USAGE_PRICES", "{}")).items()
+        }}
+
+        self._pending: Dict[Tuple[str, ...], List[int]] = {}
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.db_path != ":memory:":
+                os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS llm_usage (
+                        {", ".join(f"{name} TEXT NOT NULL" for name in DIMENSIONS)},
+                        calls INTEGER NOT NULL,
+                        prompt_tokens INTEGER NOT NULL,
+                        completion_tokens INTEGER NOT NULL,
+                        unmetered_calls INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY ({", ".join(DIMENSIONS)})
+                    )
+                """)
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(llm_usage)")}
+                if "unmetered_calls" not in columns:
+                    conn.execute("ALTER TABLE llm_usage ADD COLUMN unmetered_calls INTEGER NOT NULL DEFAULT 0")
+            self._conn = conn
+        return self._conn
+
+    # =========================================================================
+    # RECORDING
+    # =========================================================================
+
+    def record(self, model: str, prompt_version: str, prompt_tokens: int, completion_tokens: int,
+               metered: bool = True, **tags: str):
+        """
+        Count one LLM call; explicit tags override those of the current context
+
+        `metered=False` marks token counts that were not reported by the provider
+        (local estimates or missing usage), so reports can flag them.
+        """
+        prompt_tokens, completion_tokens = int(prompt_tokens or 0), int(completion_tokens or 0)
+        LLM_TOKENS.inc(prompt_tokens, model=model, type="prompt")
+        LLM_TOKENS.inc(completion_tokens, model=model, type="completion")
+
+        values = {
+            **_usage_tags.get(),
+            **{name: str(value) for name, value in tags.items() if value is not None},
+            "day": time.strftime("%Y-%m-%d", time.gmtime()),
+            "model": model,
+            "prompt_version": prompt_version
+        }
+        key = tuple(values.get(name, "") for name in DIMENSIONS)
+
+        with self._lock:
+            counters = self._pending.setdefault(key, [0, 0, 0, 0])
+            counters[0] += 1
+            counters[1] += prompt_tokens
+            counters[2] += completion_tokens
+            counters[3] += 0 if metered else 1
+            pending_keys = len(self._pending)
+
+        self._ensure_flusher()
+        if pending_keys >= self.max_pending_keys:
+            self._wakeup.set()
+
+    def _ensure_flusher(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._flush_loop, name="usage-flush", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("❌ Usage flush failed: %s", e)
+
+    def flush(self) -> int:
+        """Write pending counters to SQLite and return the number of rows touched"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        columns = ", ".join(DIMENSIONS)
+        placeholders = ", ".join("?" for _ in range(len(DIMENSIONS) + 4))
+        try:
+            with self._db_lock:
+                conn = self._connection()
+                with conn:
+                    conn.executemany(
+                        f"INSERT INTO llm_usage ({columns}, calls, prompt_tokens, completion_tokens, unmetered_calls) "
+                        f"VALUES ({placeholders}) ON CONFLICT({columns}) DO UPDATE SET "
+                        "calls = calls + excluded.calls, "
+                        "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                        "completion_tokens = completion_tokens + excluded.completion_tokens, "
+                        "unmetered_calls = unmetered_calls + excluded.unmetered_calls",
+                        [key + tuple(counters) for key, counters in pending.items()]
+                    )
+        except Exception:
+            # Put the deltas back so the next flush retries them
+            with self._lock:
+                for key, counters in pending.items():
+                    current = self._pending.setdefault(key, [0, 0, 0, 0])
+                    for position, value in enumerate(counters):
+                        current[position] += value
+            raise
+        return len(pending)
+
+    # =========================================================================
+    # REPORTING
+    # =========================================================================
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """Estimated USD cost (0 for models without a price)"""
+        prompt_price, completion_price = self.prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+    def report(self, group_by: List[str], since: Optional[str] = None, until: Optional[str] = None,
+               limit: int = 50) -> List[Dict]:
+        """
+        Usage totals grouped by dimensions, most expensive first
+
+        Rows with `unmetered_calls` > 0 include token counts the provider did not
+        report (estimated or zero), so their cost is approximate.
+
+        Args:
+            group_by: Subset of DIMENSIONS
+            since, until: Inclusive UTC days (YYYY-MM-DD)
+            limit: Maximum number of rows
+        """
+        unknown = [name for name in group_by if name not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown usage dimensions: {unknown} (expected {list(DIMENSIONS)})")
+        self.flush()
+
+        # Cost depends on the model, so aggregate per model first and merge afterwards
+        columns = list(dict.fromkeys(group_by + ["model"]))
+        conditions, params = [], []
+        if since:
+            conditions.append("day >= ?")
+            params.append(since)
+        if until:
+            conditions.append("day <= ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._db_lock:
+            rows = self._connection().execute(
+                f"SELECT {', '.join(columns)}, SUM(calls), SUM(prompt_tokens), SUM(completion_tokens), "
+                f"SUM(unmetered_calls) "
+                f"FROM llm_usage {where} GROUP BY {', '.join(columns)}",
+                params
+            ).fetchall()
+
+        totals: Dict[Tuple, Dict] = {}
+        for row in rows:
+            dimensions = dict(zip(columns, row[:len(columns)]))
+            calls, prompt_tokens, completion_tokens, unmetered_calls = row[len(columns):]
+            key = tuple(dimensions[name] for name in group_by)
+            entry = totals.setdefault(key, {
+                **{name: dimensions[name] for name in group_by},
+                "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "unmetered_calls": 0, "cost_usd": 0.0
+            })
+            entry["calls"] += calls
+            entry["unmetered_calls"] += unmetered_calls
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["cost_usd"] += self.cost(dimensions["model"], prompt_tokens, completion_tokens)
+
+        report = sorted(totals.values(), key=lambda e: (e["cost_usd"], e["prompt_tokens"] + e["completion_tokens"]),
+                        reverse=True)
+        for entry in report:
+            entry["total_tokens"] = entry["prompt_tokens"] + entry["completion_tokens"]
+            entry["cost_usd"] = round(entry["cost_usd"], 6)
+        return report[:limit]
+
+
+# Global tracker
+usage_tracker = UsageTracker()
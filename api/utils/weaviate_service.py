@@ -4,7 +4,8 @@ Handles Weaviate connection and search - uses MistralService for generation
 """
 
 import os
-from typing import List, Dict
+import logging
+from typing import List, Dict, Optional
 
 import weaviate
 from weaviate.classes.init import Auth
@@ -12,20 +13,31 @@ from weaviate.classes.query import MetadataQuery
 
 from api.models.lesson_models import UserContext, ProgramMapping
 from api.utils.mistral_service import MistralService
+from api.utils.retrieval import RetrievalBackend, build_search_query, format_search_result
+from api.utils.telemetry import span
 
-class WeaviateService:
+logger = logging.getLogger(__name__)
+
+class WeaviateService(RetrievalBackend):
     """
     Weaviate-based RAG service for medical content retrieval
     Uses dedicated MistralService for content generation
     """
     
-    def __init__(self):
+    def __init__(self, mistral_service: Optional[MistralService] = None):
         """Initialize Weaviate client connection and Mistral service"""
         
         self.client = self._connect_to_weaviate()
-        self.mistral_service = MistralService()
+        self._mistral_service = mistral_service
         self._ensure_medical_schema()
     
+    @property
+    def mistral_service(self) -> MistralService:
+        """Mistral service, created on first use (ingestion never generates)"""
+        if self._mistral_service is None:
+            self._mistral_service = MistralService()
+        return self._mistral_service
+    
     def _connect_to_weaviate(self):
         import weaviate  # Add this line to be safe
 
@@ -38,13 +50,13 @@ class WeaviateService:
                 "Missing Weaviate credentials. Please set WEAVIATE_URL and WEAVIATE_API_KEY environment variables."
             )
         
-        print(f"🔗 Connecting to Weaviate: {weaviate_url}")
-        print(f"📦 Weaviate version: {weaviate.__version__}")
+        logger.debug("🔗 Connecting to Weaviate: %s", weaviate_url)
+        logger.debug("📦 Weaviate version: %s", weaviate.__version__)
         
         try:
             # Method 1: Try the standard v4 cloud connection
             if hasattr(weaviate, 'connect_to_weaviate_cloud'):
-                print("🔄 Trying connect_to_weaviate_cloud...")
+                logger.debug("🔄 Trying connect_to_weaviate_cloud...")
                 try:
                     from weaviate.classes.init import Auth
                     client = weaviate.connect_to_weaviate_cloud(
@@ -52,14 +64,14 @@ class WeaviateService:
                         auth_credentials=Auth.api_key(weaviate_api_key)
                     )
                     if client.is_ready():
-                        print("✅ Connected using connect_to_weaviate_cloud")
+                        logger.debug("✅ Connected using connect_to_weaviate_cloud")
                         return client
                 except Exception as e:
-                    print(f"❌ connect_to_weaviate_cloud failed: {e}")
+                    logger.warning("❌ connect_to_weaviate_cloud failed: %s", e)
             
             # Method 2: Try WeaviateClient direct instantiation (v4.4.0 style)
             if hasattr(weaviate, 'WeaviateClient'):
-                print("🔄 Trying WeaviateClient...")
+                logger.debug("🔄 Trying WeaviateClient...")
                 try:
                     from weaviate.classes.init import Auth
                     client = weaviate.WeaviateClient(
@@ -69,13 +81,13 @@ class WeaviateService:
                         )
                     )
                     client.connect()
-                    print("✅ Connected using WeaviateClient")
+                    logger.debug("✅ Connected using WeaviateClient")
                     return client
                 except Exception as e:
-                    print(f"❌ WeaviateClient failed: {e}")
+                    logger.warning("❌ WeaviateClient failed: %s", e)
             
             # Method 3: Try weaviate.connect with URL (newer v4)
-            print("🔄 Trying weaviate.connect...")
+            logger.debug("🔄 Trying weaviate.connect...")
             try:
                 client = weaviate.connect(
                     connection_params={
@@ -83,13 +95,13 @@ class WeaviateService:
                         "auth_credentials": {"api_key": weaviate_api_key}
                     }
                 )
-                print("✅ Connected using weaviate.connect")
+                logger.debug("✅ Connected using weaviate.connect")
                 return client
             except Exception as e:
-                print(f"❌ weaviate.connect failed: {e}")
+                logger.warning("❌ weaviate.connect failed: %s", e)
             
             # Method 4: Try importing connection helpers differently
-            print("🔄 Trying alternative v4 import...")
+            logger.debug("🔄 Trying alternative v4 import...")
             try:
                 import weaviate
                 from weaviate.auth import AuthApiKey
@@ -107,15 +119,15 @@ class WeaviateService:
                         auth_client_secret=AuthApiKey(weaviate_api_key)
                     )
                 
-                print("✅ Connected using alternative method")
+                logger.debug("✅ Connected using alternative method")
                 return client
             except Exception as e:
-                print(f"❌ Alternative method failed: {e}")
+                logger.warning("❌ Alternative method failed: %s", e)
                 
             raise ConnectionError("All Weaviate v4 connection methods failed")
             
         except Exception as e:
-            print(f"❌ Critical connection error: {e}")
+            logger.error("❌ Critical connection error: %s", e)
             raise ConnectionError(f"Weaviate connection failed: {e}")
     
     def _ensure_medical_schema(self):
@@ -174,17 +186,32 @@ class WeaviateService:
                                 name="semester",
                                 data_type=weaviate.classes.config.DataType.INT,
                                 description="Academic semester (1 or 2)"
+                            ),
+                            weaviate.classes.config.Property(
+                                name="source_file",
+                                data_type=weaviate.classes.config.DataType.TEXT,
+                                description="Corpus file the chunk was ingested from"
+                            ),
+                            weaviate.classes.config.Property(
+                                name="content_type",
+                                data_type=weaviate.classes.config.DataType.TEXT,
+                                description="lesson or reference"
+                            ),
+                            weaviate.classes.config.Property(
+                                name="medical_domain",
+                                data_type=weaviate.classes.config.DataType.TEXT,
+                                description="Domain used by the search filter"
                             )
                         ]
                     )
-                    print("✅ Created MedistralDocument collection for search")
+                    logger.info("✅ Created MedistralDocument collection for search")
                 except Exception as create_error:
-                    print(f"Could not create collection: {create_error}")
+                    logger.warning("Could not create collection: %s", create_error)
             else:
-                print("✅ MedistralDocument collection exists")
+                logger.debug("✅ MedistralDocument collection exists")
                 
         except Exception as e:
-            print(f"Warning: Could not verify/create schema: {e}")
+            logger.warning("Warning: Could not verify/create schema: %s", e)
     
     async def search_medical_knowledge(self, topic: str, user_context: UserContext, 
                                      topic_mapping: ProgramMapping, related_topics: List[str]) -> List[Dict]:
@@ -193,74 +220,42 @@ class WeaviateService:
             collection = self.client.collections.get("MedistralDocument")
             
             # Build enhanced search query with academic context
-            search_terms = [
-                topic,
-                topic_mapping.topic,
-                topic_mapping.category,
-                topic_mapping.subcategory,
-                "medical education",
-                "anatomy", "physiology", "medicine",
-                *user_context.weak_concepts,
-                *related_topics
-            ]
-            
-            search_query = " ".join(search_terms)
+            search_query = build_search_query(topic, user_context, topic_mapping, related_topics)
             
-            print(f"🔍 Semantic search: {topic_mapping.category} > {topic_mapping.subcategory} > {topic}")
+            logger.debug("🔍 Semantic search: %s > %s > %s", topic_mapping.category, topic_mapping.subcategory, topic)
             
             # Try search with optional filter, fallback without filter
-            try:
-                response = collection.query.near_text(
-                    query=search_query,
-                    limit=15,
-                    return_metadata=MetadataQuery(score=True),
-                    filters=weaviate.classes.query.Filter.by_property("medical_domain").like("*medical*")
-                )
-            except Exception:
-                response = collection.query.near_text(
-                    query=search_query,
-                    limit=15,
-                    return_metadata=MetadataQuery(score=True)
-                )
+            with span("weaviate"):
+                try:
+                    response = collection.query.near_text(
+                        query=search_query,
+                        limit=15,
+                        return_metadata=MetadataQuery(score=True),
+                        filters=weaviate.classes.query.Filter.by_property("medical_domain").like("*medical*")
+                    )
+                except Exception:
+                    response = collection.query.near_text(
+                        query=search_query,
+                        limit=15,
+                        return_metadata=MetadataQuery(score=True)
+                    )
             
             # Extract relevant content
             relevant_docs = []
             for obj in response.objects:
-                relevant_docs.append({
-                    "title": obj.properties.get("title", ""),
-                    "content": obj.properties.get("content", ""), 
-                    "abstract": obj.properties.get("abstract", ""),
-                    "source_file": obj.properties.get("source_file", ""),
-                    "content_type": obj.properties.get("content_type", ""),
-                    "medical_domain": obj.properties.get("medical_domain", ""),
-                    "content_category": obj.properties.get("content_category", ""),
-                    "mistral_domain": obj.properties.get("mistral_domain", ""),
-                    "mistral_concepts": obj.properties.get("mistral_concepts", []),
-                    "difficulty_level": obj.properties.get("difficulty_level", user_context.current_level),
-                    "learning_objectives": obj.properties.get("learning_objectives", []),
-                    "score": obj.metadata.score if obj.metadata else 0,
-                    "category": topic_mapping.category,
-                    "subcategory": topic_mapping.subcategory,
-                    "topic": topic,
-                    "semester": topic_mapping.semester,
-                    "academic_context": f"{topic_mapping.category} > {topic_mapping.subcategory}"
-                })
+                relevant_docs.append(format_search_result(
+                    obj.properties,
+                    obj.metadata.score if obj.metadata else 0,
+                    topic, user_context, topic_mapping
+                ))
             
-            print(f"📚 Found {len(relevant_docs)} documents for '{topic}'")
+            logger.debug("📚 Found %d documents for '%s'", len(relevant_docs), topic)
             return relevant_docs
             
         except Exception as e:
-            print(f"❌ Search error: {e}")
+            logger.error("❌ Search error: %s", e)
             return []
     
-    async def generate_lesson_content(self, topic: str, user_context: UserContext, 
-                                    relevant_content: List[Dict], topic_mapping: ProgramMapping,
-                                    related_topics: List[str]) -> Dict:
-        """Generate lesson content using MistralService"""
-        return await self.mistral_service.generate_lesson_content(
-            topic, user_context, relevant_content, topic_mapping, related_topics
-        )
-    
     def close(self):
         """Close Weaviate client connection"""
         if self.client:
@@ -273,6 +268,6 @@ class WeaviateService:
                 elif hasattr(self.client, '__exit__'):
                     self.client.__exit__(None, None, None)
                 else:
-                    print("ℹ️ No close method needed for this client")
+                    logger.debug("ℹ️ No close method needed for this client")
             except Exception as e:
-                print(f"ℹ️ Client close warning: {e}")
\ No newline at end of file
+                logger.debug("ℹ️ Client close warning: %s", e)
\ No newline at end of file
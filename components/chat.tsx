@@ -6,10 +6,16 @@ import { Overview } from "@/components/overview";
 import { useScrollToBottom } from "@/hooks/use-scroll-to-bottom";
 import { ToolInvocation } from "ai";
 import { useChat } from "ai/react";
+import { useRef, useState } from "react";
 import { toast } from "sonner";
 
 export function Chat() {
   const chatId = "001";
+  // One server-held session per conversation instead of one per request
+  const [sessionId] = useState(() => crypto.randomUUID().replace(/-/g, ""));
+  // IDs of the messages the server session holds, once a reply has completed
+  const syncedIds = useRef<string[] | null>(null);
+  const pendingIds = useRef<string[]>([]);
 
   const {
     messages,
@@ -18,11 +24,36 @@ export function Chat() {
     input,
     setInput,
     append,
+    reload,
     isLoading,
     stop,
   } = useChat({
     maxSteps: 4,
+    experimental_prepareRequestBody: ({ messages, requestBody }) => {
+      const synced = syncedIds.current;
+      // Unknown until this request completes (a stop or an error leaves the session behind)
+      syncedIds.current = null;
+      pendingIds.current = messages.map((message) => message.id);
+
+      const isFollowUp =
+        synced !== null &&
+        messages.length === synced.length + 1 &&
+        synced.every((id, index) => messages[index].id === id);
+      return isFollowUp
+        ? { ...requestBody, session_id: sessionId, message: messages[messages.length - 1] }
+        : { ...requestBody, session_id: sessionId, messages };
+    },
+    onFinish: (message) => {
+      syncedIds.current = pendingIds.current.includes(message.id)
+        ? pendingIds.current
+        : [...pendingIds.current, message.id];
+    },
     onError: (error) => {
+      if (error.message.includes("Chat session not found")) {
+        // The session expired: the retry sends the full history
+        reload();
+        return;
+      }
       if (error.message.includes("Too many requests")) {
         toast.error(
           "You are sending too many messages. Please try again later.",
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for CPU-bound Hot Paths
+Times the request-path helpers on real and synthetic (10x, 100x) curricula and gates regressions against a baseline
+
+Timings are compared relative to a calibration workload timed in the same process, so the baseline
+holds on machines of different speeds, and a slowdown must exceed the tolerance plus the measured noise
+and show again on re-measurement before it fails the gate.
+
+Examples:
+    python scripts/benchmark.py --save-baseline            # record benchmarks/baseline.json
+    python scripts/benchmark.py --tolerance 0.25           # exit 1 if any benchmark is >25% slower
+    python scripts/benchmark.py --filter topic_mapping     # run a subset
+"""
+
+import io
+import os
+import re
+import sys
+import copy
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+from typing import Callable, Dict, List, Tuple
+
+# Add parent directory to path so we can import api module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Services check for credentials at construction time; benchmarks never call the APIs
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+
+from api.models.lesson_models import UserContext, ProgramMapping
+from api.utils.academic_program import AcademicProgramLoader
+from api.utils.lesson_pack import iter_stored_lessons
+from api.utils.mistral_service import MistralService
+from api.utils.lesson_service import LessonOrchestrator
+from api.utils.prompt import ClientMessage, convert_to_openai_messages
+
+# Tracked in git so the gate also runs on CI and fresh clones
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+CURRICULUM_SCALES = (1, 10, 100)
+
+
+# =============================================================================
+# FIXTURES
+# =============================================================================
+
+def synthetic_program(program: List[Dict], scale: int) -> List[Dict]:
+    """Curriculum `scale` times larger: every UE is repeated with renamed subcategories and topics"""
+    if scale == 1:
+        return program
+    expanded = []
+    for copy_index in range(scale):
+        suffix = "" if copy_index == 0 else f" {copy_index}"
+        for ue in program:
+            expanded.append({
+                **ue,
+                "category": f"{ue['category']}{suffix}",
+                "subcategories": [
+                    {"name": f"{sub['name']}{suffix}", "topics": [f"{topic}{suffix}" for topic in sub.get("topics", [])]}
+                    for sub in ue.get("subcategories", [])
+                ]
+            })
+    return expanded
+
+
+def load_lesson_fixtures(lessons_dir: str = "ressources/data") -> List[Dict]:
+    """Stored lessons (directory or lesson pack) converted back to the JSON shape returned by Mistral"""
+    fixtures = []
+    for _, stored in iter_stored_lessons(lessons_dir):
+        lesson = stored.get("lesson", {})
+        fixtures.append({
+            "lesson_content": lesson.get("lesson_content", ""),
+            "target_concepts": stored.get("exercise", {}).get("target_concepts", [lesson.get("topic", "")]),
+            "questions": stored.get("questions", []),
+            "learning_objectives": lesson.get("learning_objectives", []),
+            "academic_context": {
+                "category": lesson.get("category", ""),
+                "subcategory": lesson.get("subcategory", ""),
+                "semester": lesson.get("semester", 1),
+                "related_topics": [],
+                "content_type": "technical_overview"
+            }
+        })
+    if not fixtures:
+        raise RuntimeError(f"No lesson fixtures found in {lessons_dir}")
+    return fixtures
+
+
+def chat_fixture(turns: int = 20) -> List[ClientMessage]:
+    """Conversation with text attachments and tool invocations"""
+    messages = []
+    for turn in range(turns):
+        messages.append(ClientMessage(
+            role="user",
+            content=f"Question {turn}: explain the cardiac cycle and its pressure curves in detail. " * 4,
+            experimental_attachments=[{
+                "name": f"notes_{turn}.txt",
+                "contentType": "text/plain",
+                "url": "data:text/plain;base64,UHJlc3N1cmUtdm9sdW1lIGxvb3AgZGF0YQ=="
+            }] if turn % 5 == 0 else None
+        ))
+        messages.append(ClientMessage(
+            role="assistant",
+            content="The cardiac cycle has a systolic and a diastolic phase. " * 10,
+            toolInvocations=[{
+                "state": "result",
+                "toolCallId": f"call_{turn}",
+                "toolName": "get_current_weather",
+                "args": {"latitude": 48.85, "longitude": 2.35},
+                "result": {"current": {"temperature_2m": 18.2}}
+            }] if turn % 4 == 0 else None
+        ))
+    return messages
+
+
+# =============================================================================
+# BENCHMARKS
+# =============================================================================
+
+def calibration_workload():
+    """Fixed pure-Python mix (sorting, dicts, string building, JSON) whose time tracks the machine's speed"""
+    data = [(i * 7919) % 1009 for i in range(2000)]
+    ordered = sorted(data)
+    index = {value: position for position, value in enumerate(ordered)}
+    text = " ".join(str(value) for value in data[:500]).lower().split()
+    return len(json.dumps({"index": index, "text": text}))
+
+
+def build_benchmarks(program_file: str) -> Dict[str, Callable[[], object]]:
+    """Benchmark name -> zero-argument callable"""
+    with open(program_file, "r", encoding="utf-8") as f:
+        program = json.load(f)
+
+    benchmarks: Dict[str, Callable[[], object]] = {}
+    temp_dir = tempfile.mkdtemp(prefix="admissia-bench-")
+    # Synthetic curricula would otherwise leave their program index snapshots in .data/
+    os.environ["PROGRAM_INDEX_DIR"] = os.path.join(temp_dir, "program_index")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        mistral = MistralService()
+        orchestrator = LessonOrchestrator()
+
+        for scale in CURRICULUM_SCALES:
+            path = os.path.join(temp_dir, f"program_{scale}x.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(synthetic_program(program, scale), f)
+            loader = AcademicProgramLoader(path)
+            mappings = loader.topic_mappings
+            middle = mappings[len(mappings) // 2]
+
+            benchmarks[f"find_topic_mapping_exact_{scale}x"] = lambda loader=loader, topic=middle.topic: \
+                loader.find_topic_mapping(topic)
+            benchmarks[f"find_topic_mapping_fuzzy_{scale}x"] = lambda loader=loader: \
+                loader.find_topic_mapping("cardiovascular physiology")
+            benchmarks[f"get_related_topics_{scale}x"] = lambda loader=loader, m=middle: \
+                loader.get_related_topics(m.category, m.subcategory)
+
+    fixtures = load_lesson_fixtures()
+    generated = [json.dumps(fixture) for fixture in fixtures]
+    mapping = ProgramMapping(topic="The Atom", category="UE 1 - Biochemistry",
+                             subcategory="General Chemistry", semester=1, similarity_score=1.0)
+    user_context = UserContext(user_id="benchmark_user", weak_concepts=["orbitals", "electronegativity"])
+    relevant_content = [
+        {"title": f"Document {i}", "content": fixture["lesson_content"]} for i, fixture in enumerate(fixtures[:5])
+    ]
+    related_topics = ["Covalent Bonds and Non-Covalent Bonds", "Molecular Orbitals", "Thermodynamics"]
+
+    def build_prompt():
+        summary = mistral._build_content_summary(relevant_content)
+        return mistral._build_clean_prompt("The Atom", user_context, summary, mapping, related_topics)
+
+    def parse_generated():
+        for content in generated:
+            mistral._parse_generated_content(content, "The Atom", user_context, mapping)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        lesson_responses = [
+            orchestrator._structure_lesson_response(copy.deepcopy(fixture), "The Atom", user_context, mapping)
+            for fixture in fixtures
+        ]
+
+    def structure_responses():
+        for fixture in fixtures:
+            orchestrator._structure_lesson_response(fixture, "The Atom", user_context, mapping)
+
+    benchmarks["build_clean_prompt"] = build_prompt
+    benchmarks["parse_generated_content"] = parse_generated
+    benchmarks["structure_lesson_response"] = structure_responses
+
+    # Importing the app prints its startup messages
+    with contextlib.redirect_stdout(io.StringIO()):
+        from api.index import format_lesson_response
+
+    benchmarks["format_lesson_response"] = lambda: [format_lesson_response(r) for r in lesson_responses]
+
+    chat_messages = chat_fixture()
+    benchmarks["convert_to_openai_messages"] = lambda: convert_to_openai_messages(chat_messages)
+
+    return benchmarks
+
+
+def measure(func: Callable[[], object], min_time: float, repeats: int) -> Dict:
+    """Best per-call time in microseconds over `repeats` runs of an auto-calibrated loop"""
+    func()  # warm caches and lazy imports
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 5 or loops >= 1_000_000:
+            break
+        loops *= 10
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        timings.append((time.perf_counter() - start) / loops * 1e6)
+    timings.sort()
+    best, median = timings[0], timings[len(timings) // 2]
+    return {
+        "best_us": round(best, 3),
+        "median_us": round(median, 3),
+        "noise": round(median / best - 1, 3) if best else 0.0,
+        "loops": loops
+    }
+
+
+def normalize(result: Dict, calibration_us: float) -> Dict:
+    """Add the time relative to the calibration workload"""
+    result["relative"] = round(result["best_us"] / calibration_us, 6)
+    return result
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[Tuple[str, float]]:
+    """
+    Benchmarks slower than the baseline by more than `tolerance` plus their noise (name, ratio)
+
+    Relative timings are compared when both sides have them, absolute ones otherwise.
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        key = "relative" if "relative" in result and "relative" in reference else "best_us"
+        ratio = result[key] / reference[key] if reference[key] else 1.0
+        result["vs_baseline"] = round(ratio, 3)
+        allowed = 1 + tolerance + result.get("noise", 0.0) + reference.get("noise", 0.0)
+        if ratio > allowed:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks with regression gates")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name matches this regex")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Target seconds per repeat")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--confirm", type=int, default=2,
+                        help="Re-measurements of an apparent regression before it fails the gate")
+    parser.add_argument("--program-file", default="ressources/program.json")
+    parser.add_argument("--output", help="Also write the results JSON here")
+    parser.add_argument("--allow-missing-baseline", action="store_true",
+                        help="Exit 0 instead of 1 when there is no baseline to compare against")
+    args = parser.parse_args(argv)
+
+    benchmarks = build_benchmarks(args.program_file)
+    pattern = re.compile(args.filter)
+
+    # Timed before and after the benchmarks: the faster run is the machine's speed
+    calibration = measure(calibration_workload, args.min_time, args.repeats)
+    results = {}
+    for name, func in benchmarks.items():
+        if not pattern.search(name):
+            continue
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[name] = measure(func, args.min_time, args.repeats)
+        print(f"⏱️  {name:<40} {results[name]['best_us']:>12.1f} µs", file=sys.stderr)
+    calibration_after = measure(calibration_workload, args.min_time, args.repeats)
+    if calibration_after["best_us"] < calibration["best_us"]:
+        calibration = calibration_after
+    calibration_us = calibration["best_us"]
+    print(f"⏱️  {'calibration':<40} {calibration_us:>12.1f} µs", file=sys.stderr)
+    for result in results.values():
+        normalize(result, calibration_us)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+    regressions = compare(results, baseline, args.tolerance)
+
+    # A regression has to show again: keep the fastest of the re-measurements
+    for attempt in range(args.confirm):
+        if not regressions or args.save_baseline:
+            break
+        for name, ratio in regressions:
+            print(f"🔁 {name} at {ratio:.2f}x the baseline, measuring again", file=sys.stderr)
+            with contextlib.redirect_stdout(io.StringIO()):
+                retry = normalize(measure(benchmarks[name], args.min_time, args.repeats), calibration_us)
+            if retry["best_us"] < results[name]["best_us"]:
+                results[name] = retry
+        regressions = compare(results, baseline, args.tolerance)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "tolerance": args.tolerance,
+        "calibration_us": calibration_us,
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({**report, "results": {**baseline, **results}}, f, indent=2)
+        print(f"✅ Baseline saved to {args.baseline}", file=sys.stderr)
+        return 0
+
+    if not baseline:
+        print(f"❌ No baseline at {args.baseline}: the regression gate cannot run. "
+              f"Record one with --save-baseline and commit it", file=sys.stderr)
+        return 0 if args.allow_missing_baseline else 1
+    missing = [name for name in results if name not in baseline]
+    if missing:
+        print(f"⚠️ {len(missing)} benchmarks have no baseline and are not gated: {', '.join(missing)}", file=sys.stderr)
+    for name, ratio in regressions:
+        print(f"❌ {name} regressed: {ratio:.2f}x the baseline", file=sys.stderr)
+    if regressions:
+        return 1
+    print(f"✅ No regression beyond {args.tolerance:.0%}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Static Lesson Site Export
+Pre-renders the stored lesson collection into content-hashed JSON and HTML files for static hosting
+
+Layout of the output directory:
+    manifest.json                      topic -> hashed files, rewritten only when something changed (no-cache)
+    index.html                         program tree following program.json (no-cache)
+    program.<hash>.json                program tree with links to the lesson files (immutable)
+    lessons/<slug>.<hash>.json         stored lesson, same bytes as GET /api/lessons/stored/... (immutable)
+    lessons/<slug>.<hash>.html         rendered lesson page (immutable)
+
+Examples:
+    python scripts/export_static_site.py                              # from the lesson pack or ressources/data
+    python scripts/export_static_site.py --source ressources/data --output .data/site --prune
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Add parent directory to path so we can import api module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import Environment
+
+from api.utils.lesson_pack import encode_lesson, iter_stored_lessons, topic_key
+
+MANIFEST_VERSION = 1
+
+LESSON_PAGE = """\
+<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{{ lesson.topic }} - Admiss.ia</title>
+<style>body{font-family:system-ui,sans-serif;max-width:52rem;margin:2rem auto;padding:0 1rem;line-height:1.6}
+.context{color:#555}.question{border-top:1px solid #ddd;padding-top:1rem}</style>
+</head>
+<body>
+<nav><a href="../index.html">Program</a> &rsaquo; {{ lesson.category }} &rsaquo; {{ lesson.subcategory }}</nav>
+<h1>{{ lesson.topic }}</h1>
+<p class="context">Semester {{ lesson.semester }} &middot; {{ lesson.difficulty_level }}</p>
+{% if lesson.learning_objectives %}
+<h2>Learning objectives</h2>
+<ul>
+{% for objective in lesson.learning_objectives %}
+<li>{{ objective }}</li>
+{% endfor %}
+</ul>
+{% endif %}
+<article>{{ content_html|safe }}</article>
+{% if questions %}
+<h2>Questions</h2>
+{% for question in questions %}
+<section class="question">
+<p><strong>{{ loop.index }}.</strong> {{ question.text }}</p>
+<ol type="A">
+{% for option in question.options %}
+<li>{{ option.text }}</li>
+{% endfor %}
+</ol>
+<details><summary>Answer</summary>
+<p><strong>{{ question.correct_answer|upper }}</strong> &mdash; {{ question.explanation }}</p>
+</details>
+</section>
+{% endfor %}
+{% endif %}
+<p><a href="{{ json_file }}">JSON</a></p>
+</body>
+</html>
+"""
+
+INDEX_PAGE = """\
+<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Admiss.ia - Lessons</title>
+<style>body{font-family:system-ui,sans-serif;max-width:52rem;margin:2rem auto;padding:0 1rem;line-height:1.6}
+.missing{color:#999}</style>
+</head>
+<body>
+<h1>Lessons</h1>
+{% for ue in program %}
+<h2>{{ ue.category }} <small>(semester {{ ue.semester }})</small></h2>
+{% for subcategory in ue.subcategories %}
+<h3>{{ subcategory.name }}</h3>
+<ul>
+{% for topic in subcategory.topics %}
+{% if topic.lesson %}
+<li><a href="{{ topic.lesson.html }}">{{ topic.topic }}</a></li>
+{% else %}
+<li class="missing">{{ topic.topic }}</li>
+{% endif %}
+{% endfor %}
+</ul>
+{% endfor %}
+{% endfor %}
+<p><a href="{{ program_file }}">Program tree (JSON)</a></p>
+</body>
+</html>
+"""
+
+# A template change re-renders every page
+TEMPLATE_VERSION = hashlib.sha256((LESSON_PAGE + INDEX_PAGE).encode("utf-8")).hexdigest()[:16]
+
+
+@lru_cache(maxsize=None)
+def get_template(source: str):
+    """Compiled template, built once"""
+    return Environment(autoescape=True, trim_blocks=True, lstrip_blocks=True).from_string(source)
+
+
+@lru_cache(maxsize=1)
+def get_markdown():
+    """Markdown renderer for lesson content (raw HTML in the content is escaped)"""
+    from markdown_it import MarkdownIt
+    return MarkdownIt("commonmark", {"html": False}).enable("table")
+
+
+def slugify(topic: str) -> str:
+    """File-name friendly form of a topic"""
+    return re.sub(r"[^a-z0-9]+", "-", topic.lower()).strip("-")[:80] or "lesson"
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def write_if_changed(path: str, data: bytes) -> bool:
+    """Atomically write a file unless it already holds these bytes"""
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def latest_lessons(source: str) -> Dict[str, Dict]:
+    """Latest stored lesson of each topic, keyed by normalized topic"""
+    lessons: Dict[str, Dict] = {}
+    for _, stored in iter_stored_lessons(source):
+        key = topic_key(stored.get("lesson", {}).get("topic", ""))
+        if not key:
+            continue
+        generated_at = stored.get("generation_metadata", {}).get("generated_at", "")
+        current = lessons.get(key)
+        if current is None or generated_at >= current.get("generation_metadata", {}).get("generated_at", ""):
+            lessons[key] = stored
+    return lessons
+
+
+def render_lesson(stored: Dict, output_dir: str) -> Dict:
+    """Write the JSON and HTML files of a lesson; returns its manifest entry"""
+    lesson = stored.get("lesson", {})
+    data = encode_lesson(stored)
+    slug = slugify(lesson.get("topic", ""))
+
+    json_file = f"lessons/{slug}.{content_hash(data)}.json"
+    write_if_changed(os.path.join(output_dir, json_file), data)
+
+    html = get_template(LESSON_PAGE).render(
+        lesson=lesson,
+        questions=stored.get("questions", []),
+        content_html=get_markdown().render(lesson.get("lesson_content", "")),
+        json_file=os.path.basename(json_file)
+    ).encode("utf-8")
+    html_file = f"lessons/{slug}.{content_hash(html)}.html"
+    write_if_changed(os.path.join(output_dir, html_file), html)
+
+    return {
+        "topic": lesson.get("topic", ""),
+        "lesson_id": lesson.get("lesson_id", ""),
+        "category": lesson.get("category", ""),
+        "subcategory": lesson.get("subcategory", ""),
+        "source_sha": hashlib.sha256(data).hexdigest(),
+        "template": TEMPLATE_VERSION,
+        "json": json_file,
+        "html": html_file,
+        "bytes": len(data)
+    }
+
+
+def program_tree(program: List[Dict], entries: Dict[str, Dict]) -> List[Dict]:
+    """program.json with each topic linked to its lesson files (None when no lesson is stored)"""
+    tree = []
+    for ue in program:
+        subcategories = []
+        for subcategory in ue.get("subcategories", []):
+            topics = []
+            for topic in subcategory.get("topics", []):
+                entry = entries.get(topic_key(topic))
+                topics.append({
+                    "topic": topic,
+                    "lesson": {"lesson_id": entry["lesson_id"], "json": entry["json"], "html": entry["html"]}
+                    if entry else None
+                })
+            subcategories.append({"name": subcategory.get("name", ""), "topics": topics})
+        tree.append({"semester": ue.get("semester", 1), "category": ue.get("category", ""), "subcategories": subcategories})
+    return tree
+
+
+def export_site(source: str, output_dir: str, program_file: str, prune: bool = False) -> Dict[str, int]:
+    """Render changed lessons, then the program tree, index and manifest; returns counts"""
+    manifest_path = os.path.join(output_dir, "manifest.json")
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            previous = json.load(f).get("lessons", {})
+    except (OSError, json.JSONDecodeError):
+        previous = {}
+
+    entries: Dict[str, Dict] = {}
+    rendered = unchanged = 0
+    for key, stored in latest_lessons(source).items():
+        source_sha = hashlib.sha256(encode_lesson(stored)).hexdigest()
+        cached = previous.get(key)
+        if cached and cached.get("source_sha") == source_sha and cached.get("template") == TEMPLATE_VERSION \
+                and all(os.path.exists(os.path.join(output_dir, cached[kind])) for kind in ("json", "html")):
+            entries[key] = cached
+            unchanged += 1
+            continue
+        entries[key] = render_lesson(stored, output_dir)
+        rendered += 1
+        print(f"📝 Rendered: {entries[key]['html']}")
+
+    with open(program_file, "r", encoding="utf-8") as f:
+        tree = program_tree(json.load(f), entries)
+    tree_data = json.dumps(tree, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    program_path = f"program.{content_hash(tree_data)}.json"
+    write_if_changed(os.path.join(output_dir, program_path), tree_data)
+    write_if_changed(
+        os.path.join(output_dir, "index.html"),
+        get_template(INDEX_PAGE).render(program=tree, program_file=program_path).encode("utf-8")
+    )
+
+    files = sorted([program_path] + [entry[kind] for entry in entries.values() for kind in ("json", "html")])
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "build": content_hash("\n".join(files).encode("utf-8")),
+        "program": program_path,
+        "lessons": dict(sorted(entries.items())),
+        "files": files
+    }
+    write_if_changed(manifest_path, json.dumps(manifest, indent=2, ensure_ascii=False).encode("utf-8"))
+
+    removed = prune_files(output_dir, set(files)) if prune else 0
+    return {"lessons": len(entries), "rendered": rendered, "unchanged": unchanged, "removed": removed}
+
+
+def prune_files(output_dir: str, keep: set) -> int:
+    """Delete hashed files that the manifest no longer references"""
+    removed = 0
+    candidates: List[Tuple[str, str]] = [("", name) for name in os.listdir(output_dir) if name.startswith("program.")]
+    lessons_dir = os.path.join(output_dir, "lessons")
+    if os.path.isdir(lessons_dir):
+        candidates += [("lessons/", name) for name in os.listdir(lessons_dir)]
+    for prefix, name in candidates:
+        if f"{prefix}{name}" not in keep:
+            os.remove(os.path.join(output_dir, prefix, name))
+            removed += 1
+    return removed
+
+
+def default_source() -> str:
+    """The lesson pack when one exists, else the lesson JSON directory"""
+    pack_path = os.environ.get("LESSON_PACK_PATH", ".data/lessons.pack")
+    return pack_path if os.path.exists(pack_path) else "ressources/data"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export stored lessons as a static site")
+    parser.add_argument("--source", default=None, help="Lesson pack or lesson JSON directory")
+    parser.add_argument("--output", default=os.environ.get("STATIC_SITE_DIR", ".data/site"))
+    parser.add_argument("--program", default="ressources/program.json")
+    parser.add_argument("--prune", action="store_true", help="Delete files from previous builds that are no longer referenced")
+    args = parser.parse_args(argv)
+
+    source = args.source or default_source()
+    if not os.path.exists(source):
+        print(f"❌ No lessons at {source}", file=sys.stderr)
+        return 1
+
+    counts = export_site(source, args.output, args.program, args.prune)
+    print(f"✅ {counts['lessons']} lessons from {source} in {args.output}: {counts['rendered']} rendered, "
+          f"{counts['unchanged']} unchanged, {counts['removed']} stale files removed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -20,6 +20,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from dotenv import load_dotenv
 from api.utils.lesson_service import create_adaptive_lesson, UserContext, AcademicProgramLoader
+from api.utils.lesson_pack import LessonPack
 
 class LessonCollectionGenerator:
     """
@@ -35,6 +36,10 @@ class LessonCollectionGenerator:
         self.generated_count = 0
         self.failed_count = 0
         self.failed_topics = []
+
+        # Also append each lesson to the lesson pack when LESSON_PACK_PATH is set
+        pack_path = os.environ.get("LESSON_PACK_PATH")
+        self.lesson_pack = LessonPack(pack_path) if pack_path else None
         
         # Create output directory
         self._setup_output_directory()
@@ -167,6 +172,8 @@ class LessonCollectionGenerator:
         try:
             with open(file_path, 'w', encoding='utf-8') as f:
                 json.dump(lesson_data, f, indent=2, ensure_ascii=False)
+            if self.lesson_pack is not None:
+                self.lesson_pack.append([lesson_data])
             
             print(f"💾 Saved: {os.path.relpath(file_path)}")
             return file_path
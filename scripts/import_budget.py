@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Cold-start Import Budget
+Profiles `import api.index` with -X importtime in fresh interpreters and fails when the budget is exceeded
+
+Examples:
+    python scripts/import_budget.py                          # report and check the default budget
+    python scripts/import_budget.py --budget-ms 600 --top 30
+    python scripts/import_budget.py --forbid openai,aiohttp,weaviate,numpy,PIL --json
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy clients that must only be imported when first used
+DEFAULT_FORBIDDEN = "openai,aiohttp,weaviate,numpy,PIL,api.utils.lesson_service"
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def profile_imports(module: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self_us, cumulative_us, depth) for every module imported by `import <module>`"""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def summarize(runs: List[List[Tuple[str, int, int, int]]], module: str) -> Dict:
+    """Per-module minimum over runs (import time is noisy), grouped by top-level package"""
+    best: Dict[str, Dict] = {}
+    for entries in runs:
+        for name, self_us, cumulative_us, depth in entries:
+            current = best.get(name)
+            if current is None or cumulative_us < current["cumulative_us"]:
+                best[name] = {"self_us": self_us, "cumulative_us": cumulative_us, "depth": depth}
+
+    packages: Dict[str, int] = {}
+    for name, entry in best.items():
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + entry["self_us"]
+
+    return {
+        "module": module,
+        "total_ms": round(best.get(module, {"cumulative_us": 0})["cumulative_us"] / 1000, 1),
+        "modules": best,
+        "packages_ms": {
+            package: round(us / 1000, 1) for package, us in sorted(packages.items(), key=lambda p: -p[1])
+        }
+    }
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Cold-start import time report and budget check")
+    parser.add_argument("--module", default="api.index")
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("IMPORT_BUDGET_MS", "800")),
+                        help="Maximum cumulative import time of --module")
+    parser.add_argument("--forbid", default=DEFAULT_FORBIDDEN,
+                        help="Comma-separated modules that must not be imported at cold start")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to profile (minimum is kept)")
+    parser.add_argument("--top", type=int, default=15, help="Packages to list")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args(argv)
+
+    report = summarize([profile_imports(args.module) for _ in range(args.runs)], args.module)
+    forbidden = [name.strip() for name in args.forbid.split(",") if name.strip()]
+    violations = [name for name in forbidden if name in report["modules"]]
+
+    if args.json:
+        print(json.dumps({**report, "budget_ms": args.budget_ms, "forbidden_imported": violations}, indent=2))
+    else:
+        print(f"⏱️  import {args.module}: {report['total_ms']:.1f} ms (budget {args.budget_ms:.0f} ms)")
+        for package, ms in list(report["packages_ms"].items())[:args.top]:
+            print(f"    {package:<30} {ms:>8.1f} ms")
+
+    status = 0
+    for name in violations:
+        print(f"❌ {name} is imported at cold start, import it on first use instead", file=sys.stderr)
+        status = 1
+    if report["total_ms"] > args.budget_ms:
+        print(f"❌ Cold-start imports take {report['total_ms']:.1f} ms, over the {args.budget_ms:.0f} ms budget",
+              file=sys.stderr)
+        status = 1
+    if status == 0:
+        print("✅ Import budget respected", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
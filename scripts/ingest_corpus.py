@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""
+Knowledge Base Ingestion
+Streams a corpus directory (text, Markdown, JSONL) into MedistralDocument chunks tagged with the academic program
+
+- Documents are read block by block and cut into overlapping chunks, so corpus size is not bounded by memory
+- Each chunk is tagged with category, subcategory, topic and semester by the program matcher
+- Chunks already ingested with the same content and tags are skipped (content hash in the ingest state database)
+- Chunks a re-ingested file no longer produces are deleted from the target
+- Writes go through the Weaviate batch API (or the local JSONL corpus) with bounded concurrency and retries
+
+Examples:
+    python scripts/ingest_corpus.py corpus/                          # into Weaviate (WEAVIATE_URL, WEAVIATE_API_KEY)
+    python scripts/ingest_corpus.py corpus/ --target jsonl           # into LOCAL_CORPUS_PATH for RETRIEVAL_BACKEND=local
+    python scripts/ingest_corpus.py corpus/ --chunk-chars 1500 --overlap 200 --batch-size 100 --concurrency 4
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import argparse
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Add parent directory to path so we can import api module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+from api.models.lesson_models import ProgramMapping
+from api.utils.program_index import ProgramIndex
+
+TEXT_EXTENSIONS = {".txt", ".md", ".markdown"}
+JSONL_EXTENSIONS = {".jsonl"}
+HEADING_PATTERN = re.compile(r"^#{1,6}\s+(.+?)\s*#*\s*$", re.MULTILINE)
+READ_BLOCK_CHARS = 64 * 1024
+
+# Namespace of the deterministic object UUIDs (re-ingesting a chunk overwrites the same object)
+CHUNK_NAMESPACE = uuid.UUID("6f1c1d2e-3b1a-5c3e-9a57-4d2b8e0f7a11")
+
+
+# =============================================================================
+# READING AND CHUNKING
+# =============================================================================
+
+def iter_corpus_files(root: str) -> Iterator[str]:
+    """Supported files under root, depth first in name order"""
+    if os.path.isfile(root):
+        yield root
+        return
+    for entry in sorted(os.scandir(root), key=lambda entry: entry.name):
+        if entry.name.startswith("."):
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_corpus_files(entry.path)
+        elif os.path.splitext(entry.name)[1].lower() in TEXT_EXTENSIONS | JSONL_EXTENSIONS:
+            yield entry.path
+
+
+def read_blocks(path: str) -> Iterator[str]:
+    """File content in blocks of READ_BLOCK_CHARS characters"""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            block = f.read(READ_BLOCK_CHARS)
+            if not block:
+                return
+            yield block
+
+
+def _cut_position(text: str, limit: int) -> int:
+    """Last paragraph, sentence or word boundary before limit (limit itself when there is none)"""
+    floor = limit // 2
+    for separator in ("\n\n", "\n", ". ", " "):
+        position = text.rfind(separator, floor, limit)
+        if position != -1:
+            return position + len(separator)
+    return limit
+
+
+def chunk_stream(blocks: Iterable[str], chunk_chars: int, overlap: int) -> Iterator[str]:
+    """Overlapping chunks of at most chunk_chars characters, cut at natural boundaries"""
+    buffer = ""
+    fresh = 0  # characters in buffer not yet emitted in a chunk
+    for block in blocks:
+        buffer += block
+        fresh += len(block)
+        while len(buffer) >= chunk_chars:
+            cut = _cut_position(buffer, chunk_chars)
+            chunk = buffer[:cut].strip()
+            if chunk:
+                yield chunk
+            # Restart the next chunk `overlap` characters back, on a word boundary
+            start = max(cut - overlap, 0)
+            if start:
+                space = buffer.find(" ", start, cut)
+                start = space + 1 if space != -1 else start
+            buffer = buffer[start:]
+            fresh = len(buffer) - (cut - start)
+    if fresh > 0 and buffer.strip():
+        yield buffer.strip()
+
+
+def iter_documents(path: str, source: str, chunk_chars: int, overlap: int) -> Iterator[Dict]:
+    """Chunk records of one corpus file (title, content, optional explicit tags, source)"""
+    if os.path.splitext(path)[1].lower() in JSONL_EXTENSIONS:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    yield {"error": f"{source}:{line_number}: invalid JSON"}
+                    continue
+                content = str(record.get("content") or "")
+                title = str(record.get("title") or "")
+                tags = {key: record[key] for key in ("category", "subcategory", "topic", "semester", "difficulty")
+                        if record.get(key)}
+                # Keyed by the record's own ID, else its content: not its line, which shifts on every insert above it
+                record_key = record.get("id") or hashlib.sha256(f"{title}\n{content}".encode("utf-8")).hexdigest()[:16]
+                for index, chunk in enumerate(chunk_stream([content], chunk_chars, overlap)):
+                    yield {"title": title, "heading": title, "content": chunk, "tags": tags,
+                           "source_file": f"{source}:{record_key}", "chunk_index": index}
+        return
+
+    title = os.path.splitext(os.path.basename(path))[0].replace("_", " ")
+    heading = title
+    for index, chunk in enumerate(chunk_stream(read_blocks(path), chunk_chars, overlap)):
+        headings = HEADING_PATTERN.findall(chunk)
+        chunk_heading = headings[0] if headings and chunk.lstrip().startswith("#") else heading
+        if index == 0 and headings:
+            title = headings[0]
+        yield {"title": title, "heading": chunk_heading, "content": chunk, "tags": {},
+               "source_file": source, "chunk_index": index}
+        if headings:
+            heading = headings[-1]
+
+
+# =============================================================================
+# PROGRAM TAGGING
+# =============================================================================
+
+class ProgramTagger:
+    """Tags chunks with the academic program: heading and title by fuzzy match, else content by embedding"""
+
+    def __init__(self, program_file: str, threshold: float = 0.75, min_similarity: float = 0.15):
+        with open(program_file, "r", encoding="utf-8") as f:
+            self.index = ProgramIndex.build(json.load(f), with_embeddings=True)
+        self.threshold = threshold
+        self.min_similarity = min_similarity
+        self._positions = {topic: position for position, topic in enumerate(self.index.topics)}
+
+    def tag(self, document: Dict) -> Optional[ProgramMapping]:
+        """Program mapping of a chunk, or None when nothing is close enough"""
+        explicit = document["tags"].get("topic")
+        for text in filter(None, (explicit, document["heading"], document["title"])):
+            match = self.index.best_match(text, self.threshold)
+            if match is not None:
+                return self.index.mapping(*match)
+        for topic, score in self.index.similar_topics(f"{document['heading']} {document['content'][:4000]}", limit=1):
+            if score >= self.min_similarity:
+                return self.index.mapping(self._positions[topic], round(score, 4))
+        return None
+
+    def properties(self, document: Dict) -> Dict:
+        """MedistralDocument properties of a chunk (explicit JSONL tags win over the matcher)"""
+        mapping = self.tag(document)
+        tags = document["tags"]
+        return {
+            "title": document["heading"] or document["title"],
+            "content": document["content"],
+            "category": tags.get("category") or (mapping.category if mapping else ""),
+            "subcategory": tags.get("subcategory") or (mapping.subcategory if mapping else ""),
+            "topic": tags.get("topic") or (mapping.topic if mapping else ""),
+            "semester": int(tags.get("semester") or (mapping.semester if mapping else 0)),
+            "difficulty": tags.get("difficulty") or "intermediate",
+            "source_file": document["source_file"],
+            "content_type": "reference",
+            "medical_domain": "medical education"
+        }
+
+
+def chunk_hash(properties: Dict) -> str:
+    """Content hash of a chunk and its tags"""
+    canonical = json.dumps(properties, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# =============================================================================
+# INGEST STATE
+# =============================================================================
+
+class IngestState:
+    """Hashes of the chunks written to a target, with the source file and the last run that produced them"""
+
+    def __init__(self, db_path: str, target: str):
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.target = target
+        self.run_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingested_chunks (
+                    target TEXT NOT NULL,
+                    chunk_hash TEXT NOT NULL,
+                    source_file TEXT NOT NULL,
+                    ingested_at REAL NOT NULL,
+                    PRIMARY KEY (target, chunk_hash)
+                ) WITHOUT ROWID
+            """)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(ingested_chunks)")}
+            if "run_id" not in columns:
+                self._conn.execute("ALTER TABLE ingested_chunks ADD COLUMN run_id TEXT NOT NULL DEFAULT ''")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_ingested_chunks_source ON ingested_chunks(target, source_file)"
+            )
+
+    def known(self, hashes: List[str]) -> set:
+        """Subset of hashes already ingested, marked as produced by this run"""
+        if not hashes:
+            return set()
+        placeholders = ",".join("?" for _ in hashes)
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                f"SELECT chunk_hash FROM ingested_chunks WHERE target = ? AND chunk_hash IN ({placeholders})",
+                [self.target, *hashes]
+            ).fetchall()
+            self._conn.execute(
+                f"UPDATE ingested_chunks SET run_id = ? WHERE target = ? AND chunk_hash IN ({placeholders})",
+                [self.run_id, self.target, *hashes]
+            )
+        return {row[0] for row in rows}
+
+    def mark(self, chunks: List[Tuple[str, Dict]]):
+        """Record successfully written chunks"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO ingested_chunks (target, chunk_hash, source_file, ingested_at, run_id) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(self.target, digest, properties["source_file"], now, self.run_id) for digest, properties in chunks]
+            )
+
+    def stale(self, source: str) -> List[str]:
+        """Hashes of a corpus file's chunks (JSONL records included) that this run did not produce"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_hash FROM ingested_chunks WHERE target = ? AND run_id != ? "
+                "AND (source_file = ? OR substr(source_file, 1, length(?) + 1) = ? || ':')",
+                (self.target, self.run_id, source, source, source)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def forget(self, hashes: List[str]):
+        """Drop deleted chunks"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM ingested_chunks WHERE target = ? AND chunk_hash = ?",
+                [(self.target, digest) for digest in hashes]
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+# =============================================================================
+# SINKS
+# =============================================================================
+
+class WeaviateSink:
+    """insert_many batches into MedistralDocument with deterministic UUIDs and retries of failed objects"""
+
+    def __init__(self, retries: int = 3, backoff: float = 1.0):
+        from api.utils.weaviate_service import WeaviateService
+
+        self.service = WeaviateService()  # connects and creates the collection if needed
+        self.collection = self.service.client.collections.get("MedistralDocument")
+        self.retries = retries
+        self.backoff = backoff
+
+    def write(self, chunks: List[Tuple[str, Dict]]) -> Tuple[List[Tuple[str, Dict]], List[str]]:
+        """Write a batch; returns (written chunks, error messages of the chunks that failed every attempt)"""
+        from weaviate.classes.data import DataObject
+
+        pending = list(chunks)
+        written: List[Tuple[str, Dict]] = []
+        errors: List[str] = []
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                result = self.collection.data.insert_many([
+                    DataObject(properties=properties, uuid=uuid.uuid5(CHUNK_NAMESPACE, digest))
+                    for digest, properties in pending
+                ])
+            except Exception as e:  # whole batch rejected (network, rate limit, timeout)
+                errors = [f"{properties['source_file']}: {e}" for _, properties in pending]
+                continue
+            failed = result.errors or {}
+            written.extend(chunk for position, chunk in enumerate(pending) if position not in failed)
+            errors = [f"{pending[position][1]['source_file']}: {error.message}" for position, error in failed.items()]
+            pending = [pending[position] for position in sorted(failed)]
+            if not pending:
+                break
+        return written, errors if pending else []
+
+    def delete(self, hashes: List[str], batch_size: int = 100):
+        """Delete the objects of stale chunks"""
+        from weaviate.classes.query import Filter
+
+        for start in range(0, len(hashes), batch_size):
+            self.collection.data.delete_many(where=Filter.by_id().contains_any(
+                [uuid.uuid5(CHUNK_NAMESPACE, digest) for digest in hashes[start:start + batch_size]]
+            ))
+
+    def close(self):
+        self.service.close()
+
+
+class JsonlSink:
+    """Appends chunks to the local corpus read by RETRIEVAL_BACKEND=local"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, chunks: List[Tuple[str, Dict]]) -> Tuple[List[Tuple[str, Dict]], List[str]]:
+        lines = "".join(json.dumps(properties, ensure_ascii=False) + "\n" for _, properties in chunks)
+        with self._lock:
+            self._file.write(lines)
+            self._file.flush()
+        return chunks, []
+
+    def delete(self, hashes: List[str]):
+        """Rewrite the corpus without the lines of stale chunks (streamed, replaced atomically)"""
+        stale = set(hashes)
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            self._file.close()
+            with open(self.path, "r", encoding="utf-8") as source, open(tmp_path, "w", encoding="utf-8") as target:
+                for line in source:
+                    try:
+                        if chunk_hash(json.loads(line)) in stale:
+                            continue
+                    except json.JSONDecodeError:
+                        pass  # not ours to judge, keep it
+                    target.write(line)
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        self._file.close()
+
+
+# =============================================================================
+# PIPELINE
+# =============================================================================
+
+class IngestStats:
+    """Counters and throughput of one run"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.files = self.chunks = self.skipped = self.duplicates = self.written = self.failed = self.deleted = 0
+        self.bytes = 0
+        self.errors: List[str] = []
+
+    def report(self) -> Dict:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {
+            "files": self.files, "chunks": self.chunks, "skipped_unchanged": self.skipped,
+            "duplicates": self.duplicates, "written": self.written, "failed": self.failed,
+            "deleted_stale": self.deleted, "elapsed_s": round(elapsed, 2),
+            "chunks_per_s": round(self.chunks / elapsed, 1), "written_per_s": round(self.written / elapsed, 1),
+            "mb_per_s": round(self.bytes / elapsed / 1e6, 3), "errors": self.errors[:20]
+        }
+
+
+def ingest(root: str, sink, state: IngestState, tagger: ProgramTagger, chunk_chars: int, overlap: int,
+           batch_size: int, concurrency: int, progress_every: float = 5.0) -> IngestStats:
+    """Stream the corpus into the sink, with at most `concurrency` batches in flight"""
+    stats = IngestStats()
+    in_flight: Dict[Future, List[Tuple[str, Dict]]] = {}
+    sources = set()
+    incomplete = set()  # corpus files with a failed chunk, whose old chunks must stay
+    last_progress = time.perf_counter()
+
+    def collect(futures):
+        for future in futures:
+            chunks = in_flight.pop(future)
+            try:
+                written, errors = future.result()
+            except Exception as e:
+                written, errors = [], [str(e)] * len(chunks)
+            state.mark(written)
+            stats.written += len(written)
+            stats.failed += len(chunks) - len(written)
+            stats.errors.extend(errors[:5])
+            if len(written) < len(chunks):
+                written_hashes = {digest for digest, _ in written}
+                for digest, properties in chunks:
+                    if digest not in written_hashes:
+                        # JSONL records are tagged "<file>:<record key>"
+                        source_file = properties["source_file"]
+                        incomplete.update(source for source in sources
+                                          if source_file == source or source_file.startswith(f"{source}:"))
+
+    def submit(batch: List[Tuple[str, Dict]]):
+        known = state.known([digest for digest, _ in batch])
+        fresh = [chunk for chunk in batch if chunk[0] not in known]
+        stats.skipped += len(batch) - len(fresh)
+        if not fresh:
+            return
+        # Backpressure: never hold more than `concurrency` batches in memory
+        while len(in_flight) >= concurrency:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+        in_flight[executor.submit(sink.write, fresh)] = fresh
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        batch: List[Tuple[str, Dict]] = []
+        seen_in_batch = set()
+        for path in iter_corpus_files(root):
+            stats.files += 1
+            source = os.path.relpath(path, root) if os.path.isdir(root) else os.path.basename(path)
+            sources.add(source)
+            for document in iter_documents(path, source, chunk_chars, overlap):
+                if "error" in document:
+                    stats.failed += 1
+                    stats.errors.append(document["error"])
+                    incomplete.add(source)
+                    continue
+                properties = tagger.properties(document)
+                digest = chunk_hash(properties)
+                stats.chunks += 1
+                stats.bytes += len(document["content"].encode("utf-8"))
+                if digest in seen_in_batch:
+                    stats.duplicates += 1
+                    continue
+                seen_in_batch.add(digest)
+                batch.append((digest, properties))
+                if len(batch) >= batch_size:
+                    submit(batch)
+                    batch, seen_in_batch = [], set()
+
+                if time.perf_counter() - last_progress >= progress_every:
+                    last_progress = time.perf_counter()
+                    report = stats.report()
+                    print(f"⏳ {report['chunks']} chunks ({report['chunks_per_s']}/s), {report['written']} written, "
+                          f"{report['skipped_unchanged']} unchanged, {report['failed']} failed", file=sys.stderr)
+        if batch:
+            submit(batch)
+        collect(list(in_flight))
+
+    # Delete the chunks edited files no longer produce, unless part of the file failed this run.
+    # One delete for the whole run: the JSONL sink rewrites its file on every call
+    stale = [digest for source in sorted(sources - incomplete) for digest in state.stale(source)]
+    if stale:
+        try:
+            sink.delete(stale)
+        except Exception as e:
+            stats.errors.append(f"Could not delete {len(stale)} stale chunks: {e}")
+        else:
+            state.forget(stale)
+            stats.deleted += len(stale)
+    return stats
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Ingest a corpus directory into the MedistralDocument knowledge base")
+    parser.add_argument("corpus", help="Directory (or file) of .txt, .md and .jsonl documents")
+    parser.add_argument("--target", choices=["weaviate", "jsonl"],
+                        default="jsonl" if os.environ.get("RETRIEVAL_BACKEND", "weaviate").lower() == "local" else "weaviate")
+    parser.add_argument("--jsonl-path", default=os.environ.get("LOCAL_CORPUS_PATH", ".data/corpus.jsonl"))
+    parser.add_argument("--program", default="ressources/program.json")
+    parser.add_argument("--state-db", default=os.environ.get("INGEST_STATE_DB_PATH", ".data/ingest_state.db"))
+    parser.add_argument("--chunk-chars", type=int, default=1500)
+    parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4, help="Batches written in parallel")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Print the final report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.overlap >= args.chunk_chars // 2:
+        print("❌ --overlap must be less than half of --chunk-chars", file=sys.stderr)
+        return 2
+    if not os.path.exists(args.corpus):
+        print(f"❌ No corpus at {args.corpus}", file=sys.stderr)
+        return 2
+
+    load_dotenv(".env.local")
+    tagger = ProgramTagger(args.program)
+    state = IngestState(args.state_db, f"jsonl:{os.path.abspath(args.jsonl_path)}" if args.target == "jsonl"
+                        else f"weaviate:{os.environ.get('WEAVIATE_URL', '')}")
+    sink = JsonlSink(args.jsonl_path) if args.target == "jsonl" else WeaviateSink(retries=args.retries)
+
+    try:
+        stats = ingest(args.corpus, sink, state, tagger, args.chunk_chars, args.overlap,
+                       args.batch_size, args.concurrency)
+    finally:
+        sink.close()
+        state.close()
+
+    report = stats.report()
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print(f"✅ {report['files']} files, {report['chunks']} chunks in {report['elapsed_s']} s "
+              f"({report['chunks_per_s']} chunks/s, {report['mb_per_s']} MB/s)")
+        print(f"   written {report['written']}, unchanged {report['skipped_unchanged']}, "
+              f"duplicates {report['duplicates']}, deleted stale {report['deleted_stale']}, failed {report['failed']}")
+        for error in report["errors"]:
+            print(f"   ❌ {error}", file=sys.stderr)
+    return 1 if stats.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
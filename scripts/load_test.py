@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+End-to-end Load Test
+Drives the lesson and chat endpoints with Zipf topic popularity and reports latency percentiles as JSON
+
+By default the app is started with local stand-ins: the in-process vector store (RETRIEVAL_BACKEND=local)
+and scripts/mock_mistral_server.py. Use --base-url to target an already running server instead.
+
+Examples:
+    python scripts/load_test.py --concurrency 32 --duration 30
+    python scripts/load_test.py --rate 50 --duration 60 --mix create=3,topic=1,chat=1 --output run.json
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import random
+import asyncio
+import argparse
+import subprocess
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from urllib.parse import quote
+
+import aiohttp
+from aiohttp import web
+
+# Add parent directory to path so we can import the mock server
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.mock_mistral_server import MockMistralServer, ServerConfig
+
+ENDPOINTS = ("create", "topic", "chat")
+
+
+def load_topics(program_file: str) -> List[Dict]:
+    """All program topics with their category and subcategory"""
+    with open(program_file, "r", encoding="utf-8") as f:
+        program = json.load(f)
+    return [
+        {"topic": topic, "category": ue.get("category", ""), "subcategory": subcategory.get("name", "")}
+        for ue in program
+        for subcategory in ue.get("subcategories", [])
+        for topic in subcategory.get("topics", [])
+    ]
+
+
+class ZipfSampler:
+    """Samples items with probability proportional to 1 / rank^s (rank order shuffled by seed)"""
+
+    def __init__(self, items: List, s: float, rng: random.Random):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.weights = [1.0 / (rank ** s) for rank in range(1, len(self.items) + 1)]
+        self.rng = rng
+
+    def sample(self):
+        return self.rng.choices(self.items, weights=self.weights)[0]
+
+
+class LoadTest:
+    """Closed-loop (fixed concurrency) or open-loop (Poisson arrivals) load generator"""
+
+    def __init__(self, base_url: str, topics: List[Dict], args: argparse.Namespace):
+        self.base_url = base_url.rstrip("/")
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.topics = ZipfSampler(topics, args.zipf_s, self.rng)
+        self.mix = parse_mix(args.mix)
+
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.status_codes: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.measure_from = 0.0
+
+    # =========================================================================
+    # REQUESTS
+    # =========================================================================
+
+    def _pick_endpoint(self) -> str:
+        names = list(self.mix)
+        return self.rng.choices(names, weights=[self.mix[name] for name in names])[0]
+
+    async def _request(self, session: aiohttp.ClientSession, endpoint: str) -> str:
+        """Send one request and return its outcome (status code or exception name)"""
+        entry = self.topics.sample()
+        user_id = f"load_user_{self.rng.randrange(self.args.users)}"
+
+        if endpoint == "create":
+            payload = {
+                "topic": entry["topic"],
+                "user_context": {
+                    "user_id": user_id,
+                    "current_level": self.rng.choice(["beginner", "intermediate", "advanced"]),
+                    "weak_concepts": [self.topics.sample()["topic"]] if self.rng.random() < 0.5 else []
+                }
+            }
+            async with session.post(f"{self.base_url}/api/lessons/create", json=payload) as response:
+                await response.read()
+                return str(response.status)
+
+        if endpoint == "topic":
+            async with session.get(f"{self.base_url}/api/lessons/{quote(entry['topic'], safe='')}") as response:
+                await response.read()
+                return str(response.status)
+
+        payload = {"messages": [{"role": "user", "content": f"Explain {entry['topic']} briefly"}]}
+        async with session.post(f"{self.base_url}/api/chat", json=payload) as response:
+            body = await response.text()
+            if response.status == 200 and any(line.startswith("3:") for line in body.splitlines()):
+                return "stream_error"
+            return str(response.status)
+
+    async def _timed(self, session: aiohttp.ClientSession, endpoint: str, scheduled_at: float):
+        """Run a request and record latency from its scheduled start (no coordinated omission)"""
+        try:
+            outcome = await self._request(session, endpoint)
+        except Exception as e:
+            outcome = type(e).__name__
+        finished_at = time.perf_counter()
+        if scheduled_at < self.measure_from:
+            return
+
+        self.latencies[endpoint].append((finished_at - scheduled_at) * 1000)
+        self.status_codes[endpoint][outcome] += 1
+        if outcome != "200":
+            self.errors[endpoint] += 1
+
+    # =========================================================================
+    # ARRIVAL MODELS
+    # =========================================================================
+
+    async def run(self) -> Dict:
+        start = time.perf_counter()
+        self.measure_from = start + self.args.warmup
+        deadline = self.measure_from + self.args.duration
+
+        connector = aiohttp.TCPConnector(limit=0)
+        timeout = aiohttp.ClientTimeout(total=self.args.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            if self.args.rate:
+                await self._open_loop(session, deadline)
+            else:
+                await self._closed_loop(session, deadline)
+
+        return self.report(deadline - self.measure_from)
+
+    async def _closed_loop(self, session: aiohttp.ClientSession, deadline: float):
+        """`concurrency` virtual users, each sending its next request when the previous one completes"""
+        async def user():
+            while time.perf_counter() < deadline:
+                await self._timed(session, self._pick_endpoint(), time.perf_counter())
+
+        await asyncio.gather(*(user() for _ in range(self.args.concurrency)))
+
+    async def _open_loop(self, session: aiohttp.ClientSession, deadline: float):
+        """Poisson arrivals at `rate` requests per second, independent of response times"""
+        in_flight = asyncio.Semaphore(self.args.max_in_flight)
+        tasks = set()
+        next_arrival = time.perf_counter()
+
+        async def fire(endpoint: str, scheduled_at: float):
+            async with in_flight:
+                await self._timed(session, endpoint, scheduled_at)
+
+        while next_arrival < deadline:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(fire(self._pick_endpoint(), next_arrival))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            next_arrival += self.rng.expovariate(self.args.rate)
+
+        await asyncio.gather(*tasks)
+
+    # =========================================================================
+    # REPORT
+    # =========================================================================
+
+    def report(self, duration: float) -> Dict:
+        endpoints = {}
+        for endpoint in self.mix:
+            samples = sorted(self.latencies[endpoint])
+            count = len(samples)
+            endpoints[endpoint] = {
+                "requests": count,
+                "errors": self.errors[endpoint],
+                "error_rate": round(self.errors[endpoint] / count, 4) if count else 0.0,
+                "throughput_rps": round(count / duration, 2),
+                "status_codes": dict(self.status_codes[endpoint]),
+                "latency_ms": latency_summary(samples)
+            }
+
+        total = sum(e["requests"] for e in endpoints.values())
+        errors = sum(e["errors"] for e in endpoints.values())
+        return {
+            "config": {
+                "mode": "open" if self.args.rate else "closed",
+                "rate": self.args.rate,
+                "concurrency": self.args.concurrency,
+                "duration_s": self.args.duration,
+                "warmup_s": self.args.warmup,
+                "mix": self.mix,
+                "zipf_s": self.args.zipf_s,
+                "users": self.args.users,
+                "seed": self.args.seed
+            },
+            "totals": {
+                "requests": total,
+                "errors": errors,
+                "error_rate": round(errors / total, 4) if total else 0.0,
+                "throughput_rps": round(total / duration, 2),
+                "latency_ms": latency_summary(sorted(l for e in self.mix for l in self.latencies[e]))
+            },
+            "endpoints": endpoints
+        }
+
+
+def latency_summary(samples: List[float]) -> Dict:
+    """Nearest-rank percentiles of sorted latency samples"""
+    if not samples:
+        return {}
+
+    def percentile(p: float) -> float:
+        return round(samples[min(len(samples) - 1, max(0, int(round(p * len(samples))) - 1))], 2)
+
+    return {
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "mean": round(sum(samples) / len(samples), 2),
+        "max": round(samples[-1], 2)
+    }
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse 'create=2,topic=1,chat=1' into endpoint weights"""
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}', expected one of {ENDPOINTS}")
+        weights[name] = float(weight or 1)
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+
+# =============================================================================
+# LOCAL STAND-INS
+# =============================================================================
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_mock_mistral(args: argparse.Namespace) -> Tuple[web.AppRunner, str]:
+    """Run the Mistral stand-in on this event loop"""
+    config = ServerConfig(
+        latency_distribution=args.mock_latency_distribution,
+        latency_ms=args.mock_latency_ms,
+        tokens_per_second=args.mock_tokens_per_second,
+        rate_429=args.mock_rate_429,
+        rate_5xx=args.mock_rate_5xx,
+        rate_malformed=args.mock_rate_malformed,
+        seed=args.seed
+    )
+    runner = web.AppRunner(MockMistralServer(config).app())
+    await runner.setup()
+    port = free_port()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner, f"http://127.0.0.1:{port}/v1"
+
+
+async def start_app(mistral_url: str, args: argparse.Namespace) -> Tuple[subprocess.Popen, str]:
+    """Start the API with uvicorn, wired to the local stand-ins, and wait until it is healthy"""
+    port = free_port()
+    env = {
+        **os.environ,
+        "RETRIEVAL_BACKEND": "local",
+        "MISTRAL_BASE_URL": mistral_url,
+        "MISTRAL_API_KEY": os.environ.get("MISTRAL_API_KEY", "load-test"),
+        "CHAT_PROVIDER": "mistral",
+        "PYTHONPATH": os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.index:app", "--port", str(port), "--workers", str(args.workers),
+         "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL if args.quiet_app else None, stderr=None
+    )
+    base_url = f"http://127.0.0.1:{port}"
+
+    async with aiohttp.ClientSession() as session:
+        for _ in range(300):
+            if process.poll() is not None:
+                raise RuntimeError(f"API server exited with code {process.returncode}")
+            try:
+                async with session.get(f"{base_url}/api/health") as response:
+                    if response.status == 200:
+                        return process, base_url
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API server did not become healthy")
+
+
+async def main(args: argparse.Namespace) -> Dict:
+    topics = load_topics(args.program_file)
+    runner = process = None
+    try:
+        base_url = args.base_url
+        if not base_url:
+            runner, mistral_url = await start_mock_mistral(args)
+            process, base_url = await start_app(mistral_url, args)
+            print(f"🧪 Started API at {base_url} with mock Mistral at {mistral_url}", file=sys.stderr)
+
+        print(f"🚀 Load test against {base_url} ({len(topics)} topics)", file=sys.stderr)
+        return await LoadTest(base_url, topics, args).run()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        if runner is not None:
+            await runner.cleanup()
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="End-to-end load test with latency percentiles")
+    parser.add_argument("--base-url", help="Target a running server instead of starting one with local stand-ins")
+    parser.add_argument("--duration", type=float, default=30, help="Measured duration in seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds excluded from the results")
+    parser.add_argument("--concurrency", type=int, default=16, help="Closed loop: number of virtual users")
+    parser.add_argument("--rate", type=float, default=0, help="Open loop: Poisson arrivals per second")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Open loop: cap on outstanding requests")
+    parser.add_argument("--mix", default="create=2,topic=1,chat=1", help="Endpoint weights")
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="Topic popularity exponent")
+    parser.add_argument("--users", type=int, default=200, help="Distinct user IDs")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--program-file", default="ressources/program.json")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--workers", type=int, default=1, help="Uvicorn workers when starting the app")
+    parser.add_argument("--quiet-app", action="store_true", help="Hide the started app's stdout")
+    parser.add_argument("--mock-latency-distribution", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--mock-latency-ms", type=float, default=300)
+    parser.add_argument("--mock-tokens-per-second", type=float, default=0)
+    parser.add_argument("--mock-rate-429", type=float, default=0)
+    parser.add_argument("--mock-rate-5xx", type=float, default=0)
+    parser.add_argument("--mock-rate-malformed", type=float, default=0)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args(sys.argv[1:])
+    report = asyncio.run(main(arguments))
+    output = json.dumps(report, indent=2)
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"✅ Report written to {arguments.output}", file=sys.stderr)
+    else:
+        print(output)
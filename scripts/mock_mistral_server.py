@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Local Mistral Stand-in Server
+Serves /v1/chat/completions with schema-valid lesson JSON and configurable latency and failures
+
+Point the backend at it with MISTRAL_BASE_URL=http://127.0.0.1:8088/v1 (any MISTRAL_API_KEY works).
+Behaviour can be changed at runtime: POST /_config with any of the options below, GET /_stats for counters.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from dataclasses import dataclass, asdict, fields
+from typing import Dict, List
+
+from aiohttp import web
+
+
+@dataclass
+class ServerConfig:
+    """Latency and failure injection settings"""
+    latency_distribution: str = "fixed"    # fixed | uniform | lognormal
+    latency_ms: float = 0.0                # fixed value, uniform upper bound or lognormal median
+    latency_sigma: float = 0.5             # lognormal shape
+    tokens_per_second: float = 0.0         # 0 = whole completion at once
+    rate_429: float = 0.0                  # fraction of requests rejected with 429
+    rate_5xx: float = 0.0                  # fraction of requests failing with 503
+    rate_malformed: float = 0.0            # fraction of JSON-mode completions returning invalid JSON
+    seed: int = 0
+
+
+class MockMistralServer:
+    """Stateless Mistral-compatible chat completions endpoint with fault injection"""
+
+    def __init__(self, config: ServerConfig):
+        """Initialize with a config and a seeded random generator"""
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.stats = {"requests": 0, "streamed": 0, "rate_limited": 0, "server_errors": 0, "malformed": 0}
+
+    def app(self) -> web.Application:
+        """aiohttp application with the API and control routes"""
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        app.router.add_post("/_config", self.update_config)
+        app.router.add_get("/_stats", self.get_stats)
+        return app
+
+    # =========================================================================
+    # CONTROL ROUTES
+    # =========================================================================
+
+    async def update_config(self, request: web.Request) -> web.Response:
+        """Change injection settings without restarting"""
+        updates = await request.json()
+        known = {f.name for f in fields(ServerConfig)}
+        unknown = set(updates) - known
+        if unknown:
+            return web.json_response({"error": f"unknown options: {sorted(unknown)}"}, status=400)
+        for name, value in updates.items():
+            setattr(self.config, name, value)
+        if "seed" in updates:
+            self.random.seed(self.config.seed)
+        return web.json_response(asdict(self.config))
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({**self.stats, "config": asdict(self.config)})
+
+    # =========================================================================
+    # CHAT COMPLETIONS
+    # =========================================================================
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        """Mistral /v1/chat/completions: non-streaming, streaming and response_format JSON"""
+        self.stats["requests"] += 1
+        payload = await request.json()
+
+        await asyncio.sleep(self._sample_latency())
+
+        roll = self.random.random()
+        if roll < self.config.rate_429:
+            self.stats["rate_limited"] += 1
+            return web.json_response({"message": "Requests rate limit exceeded"}, status=429,
+                                     headers={"Retry-After": "1"})
+        if roll < self.config.rate_429 + self.config.rate_5xx:
+            self.stats["server_errors"] += 1
+            return web.json_response({"message": "Service unavailable"}, status=503)
+
+        messages = payload.get("messages", [])
+        prompt = _message_text(messages[-1]) if messages else ""
+        json_mode = (payload.get("response_format") or {}).get("type") == "json_object"
+
+        if json_mode:
+            content = json.dumps(build_completion_json(prompt))
+            if self.random.random() < self.config.rate_malformed:
+                self.stats["malformed"] += 1
+                content = content[:max(1, len(content) // 2)]
+        else:
+            content = f"Mock answer to: {prompt[:200]}"
+
+        model = payload.get("model", "mistral-small-latest")
+        usage = {
+            "prompt_tokens": sum(_token_count(_message_text(m)) for m in messages),
+            "completion_tokens": _token_count(content)
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if payload.get("stream"):
+            self.stats["streamed"] += 1
+            return await self._stream(request, content, model, usage)
+
+        if self.config.tokens_per_second > 0:
+            await asyncio.sleep(usage["completion_tokens"] / self.config.tokens_per_second)
+        return web.json_response({
+            "id": uuid.uuid4().hex,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        })
+
+    async def _stream(self, request: web.Request, content: str, model: str, usage: Dict) -> web.StreamResponse:
+        """Server-sent event chunks paced at tokens_per_second"""
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+
+        completion_id = uuid.uuid4().hex
+        delay = 1.0 / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0.0
+
+        def chunk(delta: Dict, finish_reason=None, **extra) -> bytes:
+            body = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra
+            }
+            return f"data: {json.dumps(body)}\n\n".encode("utf-8")
+
+        await response.write(chunk({"role": "assistant", "content": ""}))
+        for token in re.findall(r"\S+\s*", content):
+            if delay:
+                await asyncio.sleep(delay)
+            await response.write(chunk({"content": token}))
+        await response.write(chunk({}, finish_reason="stop", usage=usage))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    def _sample_latency(self) -> float:
+        """Time to first byte in seconds"""
+        config = self.config
+        if config.latency_ms <= 0:
+            return 0.0
+        if config.latency_distribution == "uniform":
+            return self.random.uniform(0, config.latency_ms) / 1000
+        if config.latency_distribution == "lognormal":
+            return self.random.lognormvariate(0, config.latency_sigma) * config.latency_ms / 1000
+        return config.latency_ms / 1000
+
+
+# =============================================================================
+# RESPONSE CONTENT
+# =============================================================================
+
+def _message_text(message: Dict) -> str:
+    content = message.get("content")
+    if isinstance(content, str):
+        return content
+    return " ".join(part.get("text", "") for part in content or [] if part.get("type") == "text")
+
+
+def _token_count(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _prompt_field(prompt: str, name: str, default: str) -> str:
+    """Value of a 'NAME: value' line of the MistralService prompts"""
+    match = re.search(rf"^{name}:\s*(.+)$", prompt, re.MULTILINE)
+    return match.group(1).strip() if match else default
+
+
+def build_completion_json(prompt: str) -> Dict:
+    """Schema-valid answer for the lesson or personalization prompt of MistralService"""
+    topic = _prompt_field(prompt, "TOPIC", "Medical topic")
+    level = _prompt_field(prompt, "STUDENT LEVEL", "intermediate")
+
+    if "question_plan" in prompt:
+        question_ids = re.findall(r"^- (\S+?):", prompt, re.MULTILINE)
+        return {
+            "weak_concept_focus": f"• Link the weak areas to {topic}\n• Revisit the core mechanism of {topic}",
+            "question_plan": [{"question_id": qid, "difficulty": level} for qid in question_ids]
+        }
+
+    category = _prompt_field(prompt, "CATEGORY", "General")
+    subcategory = _prompt_field(prompt, "SUBCATEGORY", "General")
+    slug = topic.replace(" ", "_").lower()
+
+    def question(index: int, text: str, correct: str) -> Dict:
+        return {
+            "question_id": f"q{index}_{slug}",
+            "text": text,
+            "category": category,
+            "subcategory": subcategory,
+            "topic": topic,
+            "difficulty": level,
+            "options": [{"id": option, "text": f"Option {option.upper()}"} for option in "abcd"],
+            "correct_answer": correct,
+            "explanation": f"Mock explanation for {topic}."
+        }
+
+    return {
+        "lesson_content": (
+            f"**{topic}**\n\n**Definition:**\nMock definition of {topic} in {subcategory}.\n\n"
+            f"**Key Notions:**\n• Notion 1\n• Notion 2\n• Notion 3\n\n"
+            f"**Clinical Relevance:**\nMock clinical relevance."
+        ),
+        "target_concepts": [topic, "fundamentals", "clinical_application"],
+        "questions": [
+            question(1, f"What is the primary mechanism of {topic}?", "c"),
+            question(2, f"In clinical practice, {topic} is most important for:", "b")
+        ],
+        "learning_objectives": [f"Define {topic}", "Identify key mechanisms", "Apply to clinical scenarios"],
+        "academic_context": {
+            "category": category,
+            "subcategory": subcategory,
+            "semester": 1,
+            "related_topics": [],
+            "content_type": "technical_overview"
+        }
+    }
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    defaults = ServerConfig()
+    parser = argparse.ArgumentParser(description="Local Mistral-compatible stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("MOCK_MISTRAL_PORT", "8088")))
+    parser.add_argument("--latency-distribution", choices=["fixed", "uniform", "lognormal"],
+                        default=defaults.latency_distribution)
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--latency-sigma", type=float, default=defaults.latency_sigma)
+    parser.add_argument("--tokens-per-second", type=float, default=defaults.tokens_per_second)
+    parser.add_argument("--rate-429", type=float, default=defaults.rate_429)
+    parser.add_argument("--rate-5xx", type=float, default=defaults.rate_5xx)
+    parser.add_argument("--rate-malformed", type=float, default=defaults.rate_malformed)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> None:
+    args = parse_args(argv)
+    config = ServerConfig(**{f.name: getattr(args, f.name) for f in fields(ServerConfig)})
+    print(f"🧪 Mock Mistral server on http://{args.host}:{args.port}/v1 ({asdict(config)})")
+    web.run_app(MockMistralServer(config).app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Lesson Pack Tool
+Builds, appends to, compacts and scans the packed lesson store (api/utils/lesson_pack.py)
+
+Examples:
+    python scripts/pack_lessons.py build ressources/data_old ressources/data --dictionary
+    python scripts/pack_lessons.py append ressources/data
+    python scripts/pack_lessons.py compact --retrain-dictionary
+    python scripts/pack_lessons.py get --topic "Amino Acids"
+    python scripts/pack_lessons.py scan
+    python scripts/pack_lessons.py stats
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Dict, List
+
+# Add parent directory to path so we can import api module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.utils.lesson_pack import LessonPack, default_codec, encode_lesson, iter_stored_lessons, train_dictionary
+
+
+def load_sources(sources: List[str]) -> List[Dict]:
+    """Stored lessons of each source in order, oldest generation first within a source"""
+    lessons = []
+    for source in sources:
+        found = [stored for _, stored in iter_stored_lessons(source)]
+        found.sort(key=lambda stored: stored.get("generation_metadata", {}).get("generated_at", ""))
+        print(f"📂 {source}: {len(found)} lessons", file=sys.stderr)
+        lessons.extend(found)
+    return lessons
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Packed lesson store tool")
+    parser.add_argument("--pack", default=os.environ.get("LESSON_PACK_PATH", ".data/lessons.pack"))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Create a pack from lesson directories (later sources supersede earlier ones)")
+    build.add_argument("sources", nargs="+")
+    build.add_argument("--codec", choices=["zstd", "zlib"], default=None)
+    build.add_argument("--dictionary", action="store_true", help="Train a compression dictionary on the lessons")
+
+    append = commands.add_parser("append", help="Append lessons from directories or another pack")
+    append.add_argument("sources", nargs="+")
+
+    compact = commands.add_parser("compact", help="Drop superseded versions")
+    compact.add_argument("--retrain-dictionary", action="store_true")
+    compact.add_argument("--codec", choices=["zstd", "zlib"], default=None)
+
+    get = commands.add_parser("get", help="Print one stored lesson")
+    get.add_argument("--id")
+    get.add_argument("--topic")
+
+    scan = commands.add_parser("scan", help="Decode every live lesson and report throughput")
+    scan.add_argument("--all", action="store_true", help="Include superseded versions")
+    scan.add_argument("--jsonl", action="store_true", help="Print each lesson as a JSON line")
+
+    commands.add_parser("stats", help="Record counts and sizes")
+    args = parser.parse_args(argv)
+
+    pack = LessonPack(args.pack)
+
+    if args.command == "build":
+        lessons = load_sources(args.sources)
+        codec = args.codec or default_codec()
+        dictionary = train_dictionary([encode_lesson(stored) for stored in lessons], codec) if args.dictionary else b""
+        pack.create(codec, dictionary)
+        pack.append(lessons)
+        print(json.dumps(pack.stats(), indent=2))
+    elif args.command == "append":
+        entries = pack.append(load_sources(args.sources))
+        print(f"✅ Appended {len(entries)} lessons to {pack.path}", file=sys.stderr)
+    elif args.command == "compact":
+        print(json.dumps(pack.compact(args.retrain_dictionary, args.codec), indent=2))
+    elif args.command == "get":
+        if not args.id and not args.topic:
+            print("❌ Pass --id or --topic", file=sys.stderr)
+            return 2
+        data = pack.get_bytes(args.id, args.topic)
+        if data is None:
+            print("❌ Lesson not found", file=sys.stderr)
+            return 1
+        print(json.dumps(json.loads(data), indent=2, ensure_ascii=False))
+    elif args.command == "scan":
+        start = time.perf_counter()
+        count = size = 0
+        for _, data in pack.iter_bytes(include_superseded=args.all):
+            stored = json.loads(data)
+            count += 1
+            size += len(data)
+            if args.jsonl:
+                print(json.dumps(stored, ensure_ascii=False))
+        elapsed = time.perf_counter() - start
+        print(f"🔎 Scanned {count} lessons ({size / 1024:.1f} KB of JSON) in {elapsed * 1000:.1f} ms", file=sys.stderr)
+    else:
+        print(json.dumps(pack.stats(), indent=2))
+
+    pack.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+LLM Usage Report
+Prints token usage and estimated cost from the usage database, grouped by any dimensions
+
+Examples:
+    python scripts/usage_report.py                                   # per endpoint, all time
+    python scripts/usage_report.py --group-by topic,prompt_version --since 2026-10-01
+    python scripts/usage_report.py --group-by user_id --limit 10 --json
+"""
+
+import os
+import sys
+import json
+import argparse
+from typing import Dict, List
+
+# Add parent directory to path so we can import api module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.utils.usage_tracking import DIMENSIONS, UsageTracker
+
+
+def format_table(rows: List[Dict], group_by: List[str]) -> str:
+    """Fixed-width table with a totals line"""
+    columns = group_by + ["calls", "unmetered_calls", "prompt_tokens", "completion_tokens", "cost_usd"]
+    cells = [[str(row[column]) for column in columns] for row in rows]
+    cells.append(["TOTAL"] + [""] * (len(group_by) - 1) + [
+        str(sum(row[column] for row in rows))
+        for column in ("calls", "unmetered_calls", "prompt_tokens", "completion_tokens")
+    ] + [f"{sum(row['cost_usd'] for row in rows):.6f}"])
+    widths = [max(len(column), *(len(line[i]) for line in cells)) for i, column in enumerate(columns)]
+
+    def render(values: List[str]) -> str:
+        return "  ".join(
+            value.ljust(width) if i < len(group_by) else value.rjust(width)
+            for i, (value, width) in enumerate(zip(values, widths))
+        )
+
+    lines = [render(columns), render(["-" * width for width in widths])]
+    lines.extend(render(line) for line in cells)
+    return "\n".join(lines)
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="LLM token usage and cost report")
+    parser.add_argument("--db", default=os.environ.get("USAGE_DB_PATH", ".data/usage.db"))
+    parser.add_argument("--group-by", default="endpoint", help=f"Comma-separated subset of {','.join(DIMENSIONS)}")
+    parser.add_argument("--since", help="First UTC day (YYYY-MM-DD)")
+    parser.add_argument("--until", help="Last UTC day (YYYY-MM-DD)")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="Print the rows as JSON")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ No usage database at {args.db}", file=sys.stderr)
+        return 1
+
+    group_by = [name.strip() for name in args.group_by.split(",") if name.strip()]
+    try:
+        rows = UsageTracker(db_path=args.db).report(group_by, args.since, args.until, args.limit)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+    if args.json:
+        print(json.dumps(rows, indent=2, ensure_ascii=False))
+    elif rows:
+        print(format_table(rows, group_by))
+        unmetered = sum(row["unmetered_calls"] for row in rows)
+        if unmetered:
+            print(f"⚠️ Unmetered calls: {unmetered} (token counts estimated or missing), "
+                  f"so the cost of their rows is approximate", file=sys.stderr)
+    else:
+        print("ℹ️ No usage recorded for this period", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
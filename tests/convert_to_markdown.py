@@ -2,48 +2,34 @@
 """
 Convert JSON test outputs to Markdown format
 Converts lesson generation test results to readable markdown files for documentation
+
+Only inputs whose content changed since the last export are rendered (the hashes
+live in the export manifest next to the markdown files), across a process pool.
 """
 
-import json
 import os
+import sys
 import glob
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional
 
-def load_json_file(file_path: str) -> dict:
-    """Load JSON data from file"""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"❌ Error loading {file_path}: {e}")
-        return None
+from jinja2 import Environment
 
-def format_lesson_to_markdown(data: dict, source_file: str) -> str:
-    """Convert lesson data to markdown format"""
-    
-    lesson = data.get('lesson', {})
-    exercise = data.get('exercise', {})
-    questions = data.get('questions', [])
-    
-    # Extract key information
-    topic = lesson.get('topic', 'Unknown Topic')
-    category = lesson.get('category', 'Unknown Category')
-    subcategory = lesson.get('subcategory', 'Unknown Subcategory')
-    semester = lesson.get('semester', 'Unknown')
-    content = lesson.get('lesson_content', '')
-    objectives = lesson.get('learning_objectives', [])
-    difficulty = lesson.get('difficulty_level', 'Unknown')
-    lesson_id = lesson.get('lesson_id', 'Unknown')
-    created_at = lesson.get('created_at', 'Unknown')
-    
-    # Generate markdown content
-    md_content = f"""# 📚 Generated Lesson: {topic}
-
-> **Academic Program Context:** {category} > {subcategory}  
-> **Semester:** {semester} | **Difficulty:** {difficulty}  
-> **Generated:** {created_at}  
-> **Source:** {source_file}
+MANIFEST_FILE = ".export_manifest.json"
+
+LESSON_TEMPLATE = """\
+# 📚 Generated Lesson: {{ topic }}
+
+> **Academic Program Context:** {{ category }} > {{ subcategory }}  
+> **Semester:** {{ semester }} | **Difficulty:** {{ difficulty }}  
+> **Generated:** {{ created_at }}  
+> **Source:** {{ source_file }}
 
 ---
 
@@ -51,153 +37,93 @@ def format_lesson_to_markdown(data: dict, source_file: str) -> str:
 
 | Field | Value |
 |-------|-------|
-| **Lesson ID** | `{lesson_id}` |
-| **Topic** | {topic} |
-| **Category** | {category} |
-| **Subcategory** | {subcategory} |
-| **Semester** | {semester} |
-| **Difficulty** | {difficulty} |
-| **Content Length** | {len(content)} characters |
-| **Questions Generated** | {len(questions)} |
-| **Learning Objectives** | {len(objectives)} |
+| **Lesson ID** | `{{ lesson_id }}` |
+| **Topic** | {{ topic }} |
+| **Category** | {{ category }} |
+| **Subcategory** | {{ subcategory }} |
+| **Semester** | {{ semester }} |
+| **Difficulty** | {{ difficulty }} |
+| **Content Length** | {{ content_length }} characters |
+| **Questions Generated** | {{ questions|length }} |
+| **Learning Objectives** | {{ objectives|length }} |
 
 ---
 
 ## 🎯 Learning Objectives
 
-"""
-    
-    # Add learning objectives
-    if objectives:
-        for i, objective in enumerate(objectives, 1):
-            md_content += f"{i}. **{objective.title()}** - Master the concepts related to {topic.lower()}\n"
-    else:
-        md_content += "*No specific learning objectives provided*\n"
-    
-    md_content += "\n---\n\n## 📖 Lesson Content\n\n"
-    
-    # Add lesson content
-    if content:
-        # Format content with proper paragraphs
-        paragraphs = content.split('\n\n')
-        for paragraph in paragraphs:
-            if paragraph.strip():
-                md_content += f"{paragraph.strip()}\n\n"
-    else:
-        md_content += "*No lesson content provided*\n\n"
-    
-    md_content += "---\n\n## ❓ Assessment Questions\n\n"
-    
-    # Add questions
-    if questions:
-        for i, question in enumerate(questions, 1):
-            q_text = question.get('text', 'No question text')
-            q_category = question.get('category', 'Unknown')
-            q_subcategory = question.get('subcategory', 'Unknown')
-            q_difficulty = question.get('difficulty', 'Unknown')
-            q_options = question.get('options', [])
-            q_correct = question.get('correct_answer', 'Unknown')
-            q_explanation = question.get('explanation', 'No explanation provided')
-            
-            md_content += f"""### Question {i}
-
-**Academic Context:** {q_category} > {q_subcategory}  
-**Difficulty:** {q_difficulty}
-
-**Question:** {q_text}
+{% for objective in objectives %}
+{{ loop.index }}. **{{ objective }}** - Master the concepts related to {{ topic_lower }}
+{% else %}
+*No specific learning objectives provided*
+{% endfor %}
+
+---
+
+## 📖 Lesson Content
+
+{% for paragraph in paragraphs %}
+{{ paragraph }}
+
+{% else %}
+*No lesson content provided*
+
+{% endfor %}
+---
+
+## ❓ Assessment Questions
+
+{% for question in questions %}
+### Question {{ loop.index }}
+
+**Academic Context:** {{ question.category }} > {{ question.subcategory }}  
+**Difficulty:** {{ question.difficulty }}
+
+**Question:** {{ question.text }}
 
 **Options:**
-"""
-            
-            # Add options
-            for option in q_options:
-                option_id = option.get('id', '?')
-                option_text = option.get('text', 'No text')
-                # Mark correct answer
-                marker = " ✅" if option_id == q_correct else ""
-                md_content += f"- **{option_id.upper()})** {option_text}{marker}\n"
-            
-            md_content += f"""
-**Correct Answer:** {q_correct.upper()}
-
-**Explanation:** {q_explanation}
+{% for option in question.options %}
+- **{{ option.label }})** {{ option.text }}{{ " ✅" if option.correct }}
+{% endfor %}
+
+**Correct Answer:** {{ question.correct_answer }}
+
+**Explanation:** {{ question.explanation }}
 
 ---
 
-"""
-    else:
-        md_content += "*No assessment questions generated*\n\n"
-    
-    # Add exercise information if available
-    if exercise:
-        exercise_id = exercise.get('exercise_id', 'Unknown')
-        target_concepts = exercise.get('target_concepts', [])
-        
-        md_content += f"""## 🎯 Exercise Information
+{% else %}
+*No assessment questions generated*
+
+{% endfor %}
+{% if exercise %}
+## 🎯 Exercise Information
 
 | Field | Value |
 |-------|-------|
-| **Exercise ID** | `{exercise_id}` |
-| **Target Concepts** | {', '.join(target_concepts) if target_concepts else 'None specified'} |
-| **Question Count** | {len(exercise.get('question_ids', []))} |
+| **Exercise ID** | `{{ exercise.exercise_id }}` |
+| **Target Concepts** | {{ exercise.target_concepts }} |
+| **Question Count** | {{ exercise.question_count }} |
 
 ---
 
-"""
-    
-    # Add metadata
-    md_content += f"""## 📊 Generation Metadata
+{% endif %}
+## 📊 Generation Metadata
 
 - **Generated by:** Weaviate RAG Pipeline with Mistral API
 - **Academic Program:** French Medical Education Curriculum
-- **Timestamp:** {created_at}
-- **Source File:** `{source_file}`
+- **Timestamp:** {{ created_at }}
+- **Source File:** `{{ source_file }}`
 
 ---
 
 *This lesson was automatically generated using the academic program-aligned lesson generation system.*
 """
-    
-    return md_content
-
-def convert_json_to_markdown(json_file: str, output_dir: str = "tests/markdown_outputs") -> str:
-    """Convert a single JSON file to markdown"""
-    
-    print(f"📄 Converting: {json_file}")
-    
-    # Load JSON data
-    data = load_json_file(json_file)
-    if not data:
-        return None
-    
-    # Create output directory
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Generate markdown content
-    md_content = format_lesson_to_markdown(data, os.path.basename(json_file))
-    
-    # Create output filename
-    json_filename = Path(json_file).stem
-    md_filename = f"{json_filename}.md"
-    md_filepath = os.path.join(output_dir, md_filename)
-    
-    # Write markdown file
-    try:
-        with open(md_filepath, 'w', encoding='utf-8') as f:
-            f.write(md_content)
-        print(f"✅ Created: {md_filepath}")
-        return md_filepath
-    except Exception as e:
-        print(f"❌ Error writing {md_filepath}: {e}")
-        return None
 
-def generate_index_file(markdown_files: list, output_dir: str = "tests/markdown_outputs"):
-    """Generate an index markdown file listing all converted lessons"""
-    
-    index_content = f"""# 📚 Generated Lessons Index
+INDEX_TEMPLATE = """\
+# 📚 Generated Lessons Index
 
-> **Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  
-> **Total Lessons:** {len(markdown_files)}
+> **Generated:** {{ generated_at }}  
+> **Total Lessons:** {{ entries|length }}
 
 This directory contains markdown versions of all lesson generation test outputs from the academic program-aligned lesson generation system.
 
@@ -207,34 +133,10 @@ This directory contains markdown versions of all lesson generation test outputs
 
 | # | Lesson File | Topic | Generated |
 |---|-------------|-------|-----------|
-"""
-    
-    # Process each markdown file to extract info
-    for i, md_file in enumerate(sorted(markdown_files), 1):
-        filename = os.path.basename(md_file)
-        
-        # Try to extract topic from filename or content
-        try:
-            # Read first few lines to get topic
-            with open(md_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                topic = "Unknown"
-                generated = "Unknown"
-                
-                for line in lines[:10]:
-                    if line.startswith("# 📚 Generated Lesson:"):
-                        topic = line.replace("# 📚 Generated Lesson:", "").strip()
-                    elif "**Generated:**" in line:
-                        generated = line.split("**Generated:**")[1].split("|")[0].strip()
-                        break
-                        
-        except Exception:
-            topic = filename.replace('.md', '').replace('_', ' ').title()
-            generated = "Unknown"
-        
-        index_content += f"| {i} | [{filename}](./{filename}) | {topic} | {generated} |\n"
-    
-    index_content += f"""
+{% for entry in entries %}
+| {{ loop.index }} | [{{ entry.filename }}](./{{ entry.filename }}) | {{ entry.topic }} | {{ entry.generated }} |
+{% endfor %}
+
 ---
 
 ## 🎯 Academic Program Coverage
@@ -257,62 +159,244 @@ The lessons above cover topics from the following academic categories:
 
 *Generated by the academic program-aligned lesson generation system*
 """
-    
-    # Write index file
+
+# A template change invalidates every previous export
+TEMPLATE_VERSION = hashlib.sha256(LESSON_TEMPLATE.encode("utf-8")).hexdigest()[:16]
+
+
+@lru_cache(maxsize=None)
+def get_template(source: str):
+    """Compiled template, built once per process"""
+    environment = Environment(trim_blocks=True, lstrip_blocks=False, keep_trailing_newline=True, autoescape=False)
+    return environment.from_string(source)
+
+
+def load_json_file(file_path: str) -> dict:
+    """Load JSON data from file"""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"❌ Error loading {file_path}: {e}")
+        return None
+
+
+def file_sha256(file_path: str) -> str:
+    """Content hash of an input file"""
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def lesson_context(data: dict, source_file: str) -> Dict:
+    """Template variables for one lesson"""
+    lesson = data.get('lesson', {})
+    exercise = data.get('exercise', {})
+    topic = lesson.get('topic', 'Unknown Topic')
+    content = lesson.get('lesson_content', '')
+
+    questions = []
+    for question in data.get('questions', []):
+        correct = question.get('correct_answer', 'Unknown')
+        questions.append({
+            "text": question.get('text', 'No question text'),
+            "category": question.get('category', 'Unknown'),
+            "subcategory": question.get('subcategory', 'Unknown'),
+            "difficulty": question.get('difficulty', 'Unknown'),
+            "correct_answer": correct.upper(),
+            "explanation": question.get('explanation', 'No explanation provided'),
+            "options": [
+                {
+                    "label": option.get('id', '?').upper(),
+                    "text": option.get('text', 'No text'),
+                    "correct": option.get('id', '?') == correct
+                }
+                for option in question.get('options', [])
+            ]
+        })
+
+    context = {
+        "topic": topic,
+        "topic_lower": topic.lower(),
+        "category": lesson.get('category', 'Unknown Category'),
+        "subcategory": lesson.get('subcategory', 'Unknown Subcategory'),
+        "semester": lesson.get('semester', 'Unknown'),
+        "difficulty": lesson.get('difficulty_level', 'Unknown'),
+        "lesson_id": lesson.get('lesson_id', 'Unknown'),
+        "created_at": lesson.get('created_at', 'Unknown'),
+        "source_file": source_file,
+        "content_length": len(content),
+        "objectives": [objective.title() for objective in lesson.get('learning_objectives', [])],
+        "paragraphs": [paragraph.strip() for paragraph in content.split('\n\n') if paragraph.strip()],
+        "questions": questions,
+        "exercise": None
+    }
+    if exercise:
+        target_concepts = exercise.get('target_concepts', [])
+        context["exercise"] = {
+            "exercise_id": exercise.get('exercise_id', 'Unknown'),
+            "target_concepts": ', '.join(target_concepts) if target_concepts else 'None specified',
+            "question_count": len(exercise.get('question_ids', []))
+        }
+    return context
+
+
+def render_lesson(data: dict, source_file: str) -> Iterator[str]:
+    """Markdown of a lesson, produced chunk by chunk"""
+    return get_template(LESSON_TEMPLATE).generate(**lesson_context(data, source_file))
+
+
+def format_lesson_to_markdown(data: dict, source_file: str) -> str:
+    """Convert lesson data to markdown format"""
+    return "".join(render_lesson(data, source_file))
+
+
+def write_streaming(path: str, chunks: Iterator[str]):
+    """Write chunks to a temporary file and move it into place"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.writelines(chunks)
+    os.replace(tmp_path, path)
+
+
+def convert_json_to_markdown(json_file: str, output_dir: str = "tests/markdown_outputs") -> Optional[Dict]:
+    """Convert a single JSON file to markdown; returns the index metadata of the output"""
+
+    data = load_json_file(json_file)
+    if not data:
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    md_filepath = os.path.join(output_dir, f"{Path(json_file).stem}.md")
+
+    try:
+        write_streaming(md_filepath, render_lesson(data, os.path.basename(json_file)))
+    except Exception as e:
+        print(f"❌ Error writing {md_filepath}: {e}")
+        return None
+
+    lesson = data.get('lesson', {})
+    return {
+        "output": md_filepath,
+        "topic": lesson.get('topic', 'Unknown Topic'),
+        "generated": lesson.get('created_at', 'Unknown')
+    }
+
+
+def load_manifest(output_dir: str) -> Dict[str, Dict]:
+    """Hash and index metadata of every previously exported input"""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(manifest: Dict[str, Dict], output_dir: str):
+    """Persist the export manifest"""
+    os.makedirs(output_dir, exist_ok=True)
+    write_streaming(
+        os.path.join(output_dir, MANIFEST_FILE),
+        iter([json.dumps(manifest, indent=2, ensure_ascii=False, sort_keys=True)])
+    )
+
+
+def generate_index_file(entries: List[Dict], output_dir: str = "tests/markdown_outputs"):
+    """Generate an index markdown file listing all converted lessons from their manifest metadata"""
+
+    rows = [
+        {"filename": os.path.basename(entry["output"]), "topic": entry["topic"], "generated": entry["generated"]}
+        for entry in sorted(entries, key=lambda entry: entry["output"])
+    ]
     index_path = os.path.join(output_dir, "README.md")
     try:
-        with open(index_path, 'w', encoding='utf-8') as f:
-            f.write(index_content)
+        write_streaming(index_path, get_template(INDEX_TEMPLATE).generate(
+            generated_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'), entries=rows
+        ))
         print(f"📋 Created index: {index_path}")
         return index_path
     except Exception as e:
         print(f"❌ Error creating index: {e}")
         return None
 
-def main():
+
+def export(json_files: List[str], output_dir: str, workers: Optional[int] = None, force: bool = False) -> Dict[str, int]:
+    """Convert the changed inputs in parallel and rebuild the index; returns counts"""
+
+    manifest = load_manifest(output_dir)
+    hashes = {json_file: file_sha256(json_file) for json_file in json_files}
+
+    pending = []
+    for json_file in json_files:
+        cached = manifest.get(json_file)
+        if force or cached is None or cached.get("sha256") != hashes[json_file] \
+                or cached.get("template") != TEMPLATE_VERSION or not os.path.exists(cached.get("output", "")):
+            pending.append(json_file)
+        else:
+            print(f"⏭️  Unchanged: {json_file}")
+
+    workers = workers or min(len(pending), os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(convert_json_to_markdown, pending, [output_dir] * len(pending)))
+    else:
+        results = [convert_json_to_markdown(json_file, output_dir) for json_file in pending]
+
+    failed = 0
+    for json_file, result in zip(pending, results):
+        if result is None:
+            failed += 1
+            manifest.pop(json_file, None)
+            continue
+        print(f"✅ Created: {result['output']}")
+        manifest[json_file] = {**result, "sha256": hashes[json_file], "template": TEMPLATE_VERSION}
+
+    # Inputs that disappeared are dropped from the manifest and the index
+    manifest = {json_file: entry for json_file, entry in manifest.items() if json_file in hashes}
+    save_manifest(manifest, output_dir)
+    if manifest:
+        print(f"\n📋 Generating index file...")
+        generate_index_file(list(manifest.values()), output_dir)
+
+    return {"total": len(manifest), "converted": len(pending) - failed, "skipped": len(json_files) - len(pending),
+            "failed": failed}
+
+
+def main(argv: Optional[List[str]] = None):
     """Main conversion function"""
-    
+
+    parser = argparse.ArgumentParser(description="Convert lesson JSON outputs to Markdown")
+    parser.add_argument("--pattern", default="tests/*.json", help="Glob of the JSON files to convert")
+    parser.add_argument("--output-dir", default="tests/markdown_outputs")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="Re-render unchanged inputs")
+    args = parser.parse_args(argv)
+
     print("🔄 Converting JSON Test Outputs to Markdown")
     print("=" * 50)
-    
-    # Find all JSON output files in tests directory
-    json_pattern = "tests/*.json"
-    json_files = glob.glob(json_pattern)
-    
+
+    json_files = sorted(glob.glob(args.pattern))
+
     if not json_files:
         print("⚠️ No JSON output files found!")
-        print(f"   Looking for pattern: {json_pattern}")
+        print(f"   Looking for pattern: {args.pattern}")
         print("   Run the lesson generation tests first to create output files.")
         return
-    
+
     print(f"📁 Found {len(json_files)} JSON files to convert:")
     for file in json_files:
         print(f"   - {file}")
-    
+
     print("\n🔄 Converting files...")
-    
-    # Convert each file
-    markdown_files = []
-    output_dir = "tests/markdown_outputs"
-    
-    for json_file in json_files:
-        md_file = convert_json_to_markdown(json_file, output_dir)
-        if md_file:
-            markdown_files.append(md_file)
-    
-    # Generate index file
-    if markdown_files:
-        print(f"\n📋 Generating index file...")
-        generate_index_file(markdown_files, output_dir)
-    
+    counts = export(json_files, args.output_dir, args.workers, args.force)
+
     print(f"\n✅ Conversion complete!")
-    print(f"📁 Output directory: {output_dir}")
-    print(f"📄 Converted {len(markdown_files)} files")
-    
-    if markdown_files:
+    print(f"📁 Output directory: {args.output_dir}")
+    print(f"📄 Converted {counts['converted']} files, {counts['skipped']} unchanged, {counts['failed']} failed")
+
+    if counts["total"]:
         print(f"\n📖 View results:")
-        print(f"   - Index: {output_dir}/README.md")
-        print(f"   - Lessons: {output_dir}/*.md")
+        print(f"   - Index: {args.output_dir}/README.md")
+        print(f"   - Lessons: {args.output_dir}/*.md")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main(sys.argv[1:])
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for chat stream backpressure
+A slow client must stall the provider instead of buffering the whole reply, and a stalled or gone client must release it
+"""
+
+import sys
+import os
+# Add parent directory to path so we can import api module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+import pytest
+
+import api.utils.chat_engine as chat_engine
+from api.utils.chat_engine import ChatEngine, ChatProvider
+from api.utils.tool_runtime import ToolRuntime
+
+TOKENS = 200
+BUFFERED_FRAMES = 4
+
+
+class CountingProvider(ChatProvider):
+    """Streams TOKENS text events and records how far the engine has pulled"""
+
+    def __init__(self):
+        self.pulled = 0
+        self.closed = asyncio.Event()
+
+    async def stream(self, messages, tools=None):
+        try:
+            for position in range(TOKENS):
+                self.pulled += 1
+                yield {"type": "text", "text": f" t{position}"}
+            yield {"type": "finish", "reason": "stop"}
+            yield {"type": "usage", "prompt_tokens": 3, "completion_tokens": TOKENS}
+        finally:
+            self.closed.set()
+
+
+@pytest.fixture(autouse=True)
+def recorded_usage(monkeypatch):
+    calls = []
+    monkeypatch.setattr(chat_engine.usage_tracker, "record", lambda *args, **kwargs: calls.append((args, kwargs)))
+    return calls
+
+
+def make_engine(provider: ChatProvider, send_timeout: float = 5.0) -> ChatEngine:
+    return ChatEngine(provider, ToolRuntime([]), max_buffered_frames=BUFFERED_FRAMES, send_timeout=send_timeout)
+
+
+def test_slow_consumer_stalls_the_producer(recorded_usage):
+    """While the client reads nothing, the provider is pulled no further than the buffer allows"""
+    async def scenario():
+        provider = CountingProvider()
+        replies = []
+        frames = make_engine(provider).stream([{"role": "user", "content": "hi"}], on_complete=replies.append)
+
+        first = await frames.__anext__()
+        await asyncio.sleep(0.1)
+        stalled_at = provider.pulled
+        assert stalled_at <= BUFFERED_FRAMES + 2
+        await asyncio.sleep(0.1)
+        assert provider.pulled == stalled_at
+
+        rest = [frame async for frame in frames]
+        return provider, [first, *rest], replies
+
+    provider, frames, replies = asyncio.run(scenario())
+    assert provider.pulled == TOKENS and provider.closed.is_set()
+    assert sum(frame.startswith("0:") for frame in frames) == TOKENS
+    assert frames[-1].startswith('e:{"finishReason":"stop"')
+    assert replies[0]["text"].split() == [f"t{position}" for position in range(TOKENS)]
+    assert len(recorded_usage) == 1
+
+
+def test_stalled_consumer_is_dropped(recorded_usage):
+    """A client that stops reading past send_timeout loses the stream and the provider is closed"""
+    async def scenario():
+        provider = CountingProvider()
+        replies = []
+        frames = make_engine(provider, send_timeout=0.05).stream([{"role": "user", "content": "hi"}],
+                                                                  on_complete=replies.append)
+        await frames.__anext__()
+        await asyncio.wait_for(provider.closed.wait(), 1)
+        rest = [frame async for frame in frames]
+        return provider, rest, replies
+
+    provider, rest, replies = asyncio.run(scenario())
+    assert provider.pulled < TOKENS
+    assert rest == [] and replies == []
+    assert recorded_usage == []
+
+
+def test_disconnected_consumer_cancels_the_producer():
+    """Closing the frame iterator (client gone) stops reading upstream right away"""
+    async def scenario():
+        provider = CountingProvider()
+        engine = make_engine(provider)
+        frames = engine.stream([{"role": "user", "content": "hi"}])
+        await frames.__anext__()
+        await frames.aclose()
+        await asyncio.wait_for(provider.closed.wait(), 1)
+        return provider, engine
+
+    provider, engine = asyncio.run(scenario())
+    assert provider.pulled < TOKENS
+    assert engine.active_streams == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for server-held chat sessions
+A follow-up turn sends only the new message and reuses the turns already converted on the server
+"""
+
+import sys
+import os
+# Add parent directory to path so we can import api module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.index as index
+import api.utils.chat_engine as chat_engine
+import api.utils.chat_sessions as chat_sessions
+from api.utils.chat_engine import ChatEngine, FakeChatProvider
+from api.utils.chat_sessions import InMemorySessionStore
+
+SESSION_ID = "session0001"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """App on the fake provider and a fresh session store, counting message conversions"""
+    conversions = []
+    convert_message = chat_sessions.convert_message
+
+    def counting_convert(message):
+        conversions.append(message.content)
+        return convert_message(message)
+
+    monkeypatch.setattr(chat_sessions, "convert_message", counting_convert)
+    monkeypatch.setattr(chat_engine.usage_tracker, "record", lambda *args, **kwargs: None)
+    monkeypatch.setattr(index, "_chat_engine", ChatEngine(FakeChatProvider(), index.tool_runtime))
+    monkeypatch.setattr(index, "_history_compactor", None)
+    monkeypatch.setattr(index, "_chat_session_store", InMemorySessionStore())
+    monkeypatch.setenv("CHAT_HISTORY_TOKEN_BUDGET", "100000")
+    return TestClient(index.app), conversions
+
+
+def test_follow_up_delta_reuses_cached_turns(client):
+    """Only the new message (and the reply) is converted on a delta turn"""
+    http, conversions = client
+    first = http.post("/api/chat", json={"session_id": SESSION_ID,
+                                         "messages": [{"role": "user", "content": "hello there"}]})
+    assert first.status_code == 200 and first.headers["x-session-id"] == SESSION_ID
+    assert conversions == ["hello there", "You said: hello there"]
+
+    conversions.clear()
+    follow_up = http.post("/api/chat", json={"session_id": SESSION_ID,
+                                             "message": {"role": "user", "content": "and again"}})
+    assert follow_up.status_code == 200
+    assert '0:" again"' in follow_up.text
+    assert conversions == ["and again", "You said: and again"]
+
+    session = index.get_chat_session_store().get(SESSION_ID)
+    assert [turn["client"]["content"] for turn in session.turns] == [
+        "hello there", "You said: hello there", "and again", "You said: and again"
+    ]
+
+
+def test_full_history_resync_converts_only_changed_turns(client):
+    """A resent history keeps its unchanged prefix and replaces an edited last message"""
+    http, conversions = client
+    history = [{"role": "user", "content": "hello there"}]
+    http.post("/api/chat", json={"session_id": SESSION_ID, "messages": history})
+
+    conversions.clear()
+    history += [{"role": "assistant", "content": "You said: hello there"}, {"role": "user", "content": "edited"}]
+    assert http.post("/api/chat", json={"session_id": SESSION_ID, "messages": history}).status_code == 200
+    assert conversions == ["edited", "You said: edited"]
+
+
+def test_expired_session_asks_for_the_full_history(client):
+    """A delta for an unknown session is a 404 the client answers with the full messages"""
+    http, _ = client
+    response = http.post("/api/chat", json={"session_id": "unknown0001",
+                                            "message": {"role": "user", "content": "hi"}})
+    assert response.status_code == 404
+    assert "resend the full messages" in response.json()["detail"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for the lesson cache
+One generation per key across requests and workers, even when the generating request or worker goes away
+"""
+
+import sys
+import os
+# Add parent directory to path so we can import api module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import asyncio
+
+import pytest
+
+from api.utils.lesson_cache import LessonCache, SharedDiskCache
+
+
+def counting_factory(delay: float = 0.05):
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return {"lesson": len(calls)}
+
+    return factory, calls
+
+
+def test_lru_eviction_and_ttl():
+    cache = LessonCache(max_entries=2, ttl_seconds=0.05)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}
+    cache.set("c", {"v": 3})
+    assert cache.get("b") is None and cache.contains("a") and cache.contains("c")
+
+    value = cache.get("a")
+    value["v"] = 99
+    assert cache.get("a") == {"v": 1}
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+
+def test_follower_takes_over_from_cancelled_leader():
+    """Followers of a cancelled leader retry, one of them generating, instead of failing"""
+    async def scenario():
+        cache = LessonCache()
+        factory, calls = counting_factory()
+        leader = asyncio.create_task(cache.get_or_create("atom", factory))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(cache.get_or_create("atom", factory)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        results = await asyncio.gather(*followers)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return cache, calls, results
+
+    cache, calls, results = asyncio.run(scenario())
+    assert len(calls) == 2
+    assert results == [{"lesson": 2}] * 3
+    assert cache.get("atom") == {"lesson": 2} and not cache.is_in_flight("atom")
+
+
+def test_lease_expiry(tmp_path):
+    """Only one owner holds a live lease; it lapses after its TTL and only the owner releases it"""
+    shared = SharedDiskCache(str(tmp_path / "cache.db"))
+    assert shared.acquire_lease("atom", "worker-a", 0.05)
+    assert shared.acquire_lease("atom", "worker-a", 0.05)  # renewal
+    assert not shared.acquire_lease("atom", "worker-b", 0.05)
+
+    shared.release_lease("atom", "worker-b")
+    assert not shared.acquire_lease("atom", "worker-b", 0.05)
+    time.sleep(0.06)
+    assert shared.acquire_lease("atom", "worker-b", 0.05)
+    assert not shared.acquire_lease("atom", "worker-a", 0.05)
+
+    shared.release_lease("atom", "worker-b")
+    assert shared.acquire_lease("atom", "worker-a", 0.05)
+
+
+def test_workers_share_one_generation(tmp_path):
+    """A second worker waits on the lease holder and reads its result from disk"""
+    db_path = str(tmp_path / "cache.db")
+
+    async def scenario():
+        first = LessonCache(shared=SharedDiskCache(db_path), poll_interval=0.01)
+        second = LessonCache(shared=SharedDiskCache(db_path), poll_interval=0.01)
+        factory, calls = counting_factory(delay=0.1)
+        leader = asyncio.create_task(first.get_or_create("atom", factory))
+        await asyncio.sleep(0.02)
+        follower = await second.get_or_create("atom", factory)
+        return await leader, follower, calls, second
+
+    leader, follower, calls, second = asyncio.run(scenario())
+    assert leader == follower == {"lesson": 1}
+    assert len(calls) == 1 and second.shared_hits == 1
+
+
+def test_lapsed_lease_of_a_dead_worker_is_taken_over(tmp_path):
+    """A lease left behind by a worker that died stops blocking once it lapses"""
+    db_path = str(tmp_path / "cache.db")
+    shared = SharedDiskCache(db_path)
+    assert shared.acquire_lease(shared.encode_key("atom"), "dead-worker", 0.1)
+
+    async def scenario():
+        cache = LessonCache(shared=SharedDiskCache(db_path), lease_seconds=5, poll_interval=0.02)
+        factory, calls = counting_factory(delay=0)
+        started = time.monotonic()
+        value = await cache.get_or_create("atom", factory)
+        return value, calls, time.monotonic() - started
+
+    value, calls, waited = asyncio.run(scenario())
+    assert value == {"lesson": 1} and len(calls) == 1
+    assert 0.08 <= waited < 2
+    assert shared.get(shared.encode_key("atom")) == {"lesson": 1}
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
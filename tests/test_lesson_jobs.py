@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tests for the lesson job queue
+Jobs are deduplicated while live, claimed under a lease, and survive the worker that claimed them
+"""
+
+import sys
+import os
+# Add parent directory to path so we can import api module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import asyncio
+
+import pytest
+
+from api.models.lesson_models import LessonJobStatus, LessonRequest, UserContext
+from api.utils.lesson_jobs import InMemoryJobStore, LessonJobQueue, SQLiteJobStore
+
+
+def lesson_request(topic: str) -> LessonRequest:
+    return LessonRequest(topic=topic, user_context=UserContext(user_id="student", current_level="beginner"))
+
+
+async def wait_until_done(queue: LessonJobQueue, job_id: str, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while queue.get(job_id).status in (LessonJobStatus.QUEUED, LessonJobStatus.RUNNING):
+        assert time.monotonic() < deadline, "job did not finish"
+        await queue.wait_for_change(job_id, 0.05)
+    return queue.get(job_id)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    return InMemoryJobStore() if request.param == "memory" else SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+
+def test_job_lifecycle(store):
+    """Queued, deduplicated while live, then succeeded or failed with the runner's outcome"""
+    async def runner(lesson_request):
+        await asyncio.sleep(0.02)
+        if lesson_request.topic == "Broken":
+            raise RuntimeError("generation failed")
+        return {"topic": lesson_request.topic}
+
+    async def scenario():
+        queue = LessonJobQueue(store, runner, workers=2, poll_interval=0.05)
+        job, deduplicated = await queue.submit(lesson_request("The Atom"))
+        assert not deduplicated and job.status == LessonJobStatus.QUEUED
+        same, deduplicated = await queue.submit(lesson_request("The Atom"))
+        assert deduplicated and same.job_id == job.job_id
+        broken, _ = await queue.submit(lesson_request("Broken"))
+
+        done = await wait_until_done(queue, job.job_id)
+        assert done.status == LessonJobStatus.SUCCEEDED
+        assert done.result == {"topic": "The Atom"} and done.attempts == 1
+        failed = await wait_until_done(queue, broken.job_id)
+        assert failed.status == LessonJobStatus.FAILED and failed.error == "generation failed"
+
+        # A finished success is reused, a failure is not
+        assert (await queue.submit(lesson_request("The Atom")))[1] is True
+        assert (await queue.submit(lesson_request("Broken")))[1] is False
+        metrics = queue.metrics()
+        assert metrics["submitted"] == 3 and metrics["succeeded"] >= 1 and metrics["failed"] >= 1
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_lapsed_lease_is_reclaimed_then_abandoned(tmp_path):
+    """Only the owner renews; a lapsed lease goes to the next claimer until max_attempts"""
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+    async def submit():
+        queue = LessonJobQueue(store, runner=None, workers=0)
+        return (await queue.submit(lesson_request("Chemical Bonds")))[0]
+
+    job = asyncio.run(submit())
+    claimed = store.claim("worker-a", lease_seconds=0.05, max_attempts=2)
+    assert claimed.job_id == job.job_id and claimed.attempts == 1
+    assert store.claim("worker-b", 0.05, 2) is None
+    assert store.renew(job.job_id, "worker-a", 0.05)
+    assert not store.renew(job.job_id, "worker-b", 0.05)
+
+    time.sleep(0.1)
+    assert store.find_reusable(job.dedup_key) is None
+    reclaimed = store.claim("worker-b", 0.05, 2)
+    assert reclaimed.job_id == job.job_id and reclaimed.attempts == 2
+    assert not store.renew(job.job_id, "worker-a", 0.05)
+
+    time.sleep(0.1)
+    assert store.claim("worker-c", 0.05, 2) is None
+    abandoned = store.get(job.job_id)
+    assert abandoned.status == LessonJobStatus.FAILED and "Abandoned after 2 attempts" in abandoned.error
+
+
+def test_stopped_worker_hands_its_job_to_another_queue(tmp_path):
+    """Stopping a queue releases its running job, and a queue on the same store finishes it"""
+    db_path = str(tmp_path / "jobs.db")
+
+    async def scenario():
+        running = asyncio.Event()
+
+        async def stuck(lesson_request):
+            running.set()
+            await asyncio.sleep(60)
+
+        async def quick(lesson_request):
+            return {"topic": lesson_request.topic}
+
+        first = LessonJobQueue(SQLiteJobStore(db_path), stuck, workers=1, poll_interval=0.05)
+        job, _ = await first.submit(lesson_request("The Atom"))
+        await asyncio.wait_for(running.wait(), 1)
+        await first.stop()
+        assert first.get(job.job_id).status == LessonJobStatus.QUEUED
+
+        second = LessonJobQueue(SQLiteJobStore(db_path), quick, workers=1, poll_interval=0.05)
+        second.start()
+        done = await wait_until_done(second, job.job_id)
+        assert done.status == LessonJobStatus.SUCCEEDED and done.attempts == 2
+        await second.stop()
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
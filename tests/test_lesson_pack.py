@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests for the lesson pack
+Appends supersede older versions of a topic, compaction drops them, and readers never see a half-swapped pack
+"""
+
+import sys
+import os
+# Add parent directory to path so we can import api module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.index as index
+import api.utils.lesson_pack as lesson_pack
+from api.utils.lesson_pack import LessonPack
+
+
+def stored_lesson(lesson_id: str, topic: str, content: str) -> dict:
+    return {
+        "generation_metadata": {"topic": topic, "generated_at": "2026-10-01T08:00:00"},
+        "lesson": {"lesson_id": lesson_id, "topic": topic, "lesson_content": content},
+        "exercise": {"target_concepts": [topic]},
+        "questions": []
+    }
+
+
+@pytest.fixture
+def pack(tmp_path, monkeypatch):
+    monkeypatch.delenv("LESSON_PACK_CODEC", raising=False)
+    pack = LessonPack(str(tmp_path / "lessons.pack"))
+    yield pack
+    pack.close()
+
+
+def test_append_supersede_and_compact(pack):
+    atom = stored_lesson("lesson_atom_v1", "The Atom", "Protons, neutrons and electrons. " * 20)
+    bonds = stored_lesson("lesson_bonds_v1", "Chemical Bonds", "Covalent and ionic bonds. " * 20)
+    assert len(pack.append([atom, bonds])) == 2
+    assert pack.append([atom]) == []  # unchanged records are skipped
+
+    atom_v2 = stored_lesson("lesson_atom_v2", "the  atom", "Orbitals and electron shells. " * 20)
+    pack.append([atom_v2])
+    assert pack.get(topic="The Atom") == atom_v2
+    assert pack.get(lesson_id="lesson_atom_v1") == atom  # superseded, still readable until compaction
+    assert len(pack) == 2 and pack.stats()["superseded_records"] == 1
+
+    result = pack.compact()
+    assert result["before"]["records"] == 3 and result["after"]["records"] == 2
+    assert result["after"]["pack_bytes"] < result["before"]["pack_bytes"]
+    assert pack.get(lesson_id="lesson_atom_v1") is None
+    assert pack.get(topic="The Atom") == atom_v2 and pack.get(lesson_id="lesson_bonds_v1") == bonds
+
+    reopened = LessonPack(pack.path)
+    assert sorted(lesson["lesson"]["lesson_id"] for lesson in reopened.iter_lessons()) == \
+        ["lesson_atom_v2", "lesson_bonds_v1"]
+    reopened.close()
+
+
+def test_reader_keeps_its_mapping_during_compaction(pack, monkeypatch):
+    """Between the pack and index swaps a reader serves the old pack, then switches to the new one"""
+    atom = stored_lesson("lesson_atom_v1", "The Atom", "Protons, neutrons and electrons. " * 20)
+    atom_v2 = stored_lesson("lesson_atom_v2", "The Atom", "Orbitals and electron shells. " * 20)
+    pack.append([atom, atom_v2])
+    reader = LessonPack(pack.path)
+    entry, payload, codec = reader.record(lesson_id="lesson_atom_v1")
+
+    deferred = []
+    replace = os.replace
+
+    def replace_pack_only(source, target):
+        if target == pack.index_path:
+            deferred.append((source, target))
+        else:
+            replace(source, target)
+
+    monkeypatch.setattr(lesson_pack.os, "replace", replace_pack_only)
+    writer = LessonPack(pack.path)
+    writer.compact()
+    monkeypatch.setattr(lesson_pack.os, "replace", replace)
+
+    # New pack in place, old index still there: the reader keeps its open mapping
+    assert reader.get(lesson_id="lesson_atom_v1") == atom
+    assert codec.decompress(payload, entry.size) == reader.get_bytes(lesson_id="lesson_atom_v1")
+
+    replace(*deferred[0])
+    assert reader.get(lesson_id="lesson_atom_v1") is None
+    assert reader.get(topic="The Atom") == atom_v2
+    reader.close()
+    writer.close()
+
+
+def test_stored_lesson_negotiates_deflate(pack, monkeypatch):
+    """deflate only when accepted with q > 0, under an ETag of its own"""
+    atom = stored_lesson("lesson_atom_v1", "The Atom", "Protons, neutrons and electrons. " * 20)
+    pack.append([atom])
+    monkeypatch.setattr(lesson_pack, "_lesson_pack", pack)
+    client = TestClient(index.app)
+    url = "/api/lessons/stored/lesson_atom_v1"
+
+    encoded = client.get(url, headers={"Accept-Encoding": "gzip, deflate"})
+    assert encoded.headers["content-encoding"] == "deflate"
+    assert encoded.json() == atom  # the stored zlib stream is valid HTTP deflate
+    assert encoded.headers["etag"].endswith('-deflate"')
+
+    for refused in ("deflate;q=0", "gzip", "identity", "*;q=0", "deflate; q=0.0, gzip"):
+        plain = client.get(url, headers={"Accept-Encoding": refused})
+        assert "content-encoding" not in plain.headers, refused
+        assert plain.json() == atom
+        assert plain.headers["etag"] != encoded.headers["etag"]
+    assert client.get(url, headers={"Accept-Encoding": "*"}).headers["content-encoding"] == "deflate"
+
+    plain_etag = plain.headers["etag"]
+    assert client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": plain_etag}).status_code == 304
+    assert client.get(url, headers={"Accept-Encoding": "deflate", "If-None-Match": plain_etag}).status_code == 200
+    assert client.get(url, headers={"Accept-Encoding": "gzip",
+                                    "If-None-Match": f'"other", W/{plain_etag}'}).status_code == 304
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
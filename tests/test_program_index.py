@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for program index hot reload
+A broken or partially written program.json must never replace the live index
+"""
+
+import sys
+import os
+# Add parent directory to path so we can import api module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+
+from api.utils.program_index import ProgramIndexRegistry
+
+PROGRAM = [{
+    "semester": 1,
+    "category": "UE 1 - Biochemistry",
+    "subcategories": [{"name": "General Chemistry", "topics": ["The Atom", "Chemical Bonds"]}]
+}]
+
+
+def write_program(path: str, content: str, mtime: float):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.utime(path, (mtime, mtime))
+
+
+def test_broken_save_keeps_current_index(tmp_path, monkeypatch):
+    """A truncated save, then a missing file, keep the index; a valid save replaces it"""
+    monkeypatch.setenv("PROGRAM_INDEX_DIR", str(tmp_path / "snapshots"))
+    program_file = str(tmp_path / "program.json")
+    write_program(program_file, json.dumps(PROGRAM), 1000)
+
+    registry = ProgramIndexRegistry(watch_interval=0)
+    index = registry.get(program_file)
+    assert len(index) == 2
+
+    write_program(program_file, json.dumps(PROGRAM)[:40], 1001)
+    assert registry.refresh(program_file) is False
+    assert registry.get(program_file) is index
+
+    os.remove(program_file)
+    assert registry.refresh(program_file) is False
+    assert registry.get(program_file) is index
+
+    updated = [{**PROGRAM[0], "subcategories": [{"name": "General Chemistry", "topics": ["The Atom"]}]}]
+    write_program(program_file, json.dumps(updated), 1002)
+    assert registry.refresh(program_file) is True
+    assert len(registry.get(program_file)) == 1
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
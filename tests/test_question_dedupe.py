@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for near-duplicate question detection
+Negated stems and questions with another correct answer must keep their own canonical ID
+"""
+
+import sys
+import os
+# Add parent directory to path so we can import api module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlite3
+
+import pytest
+
+from api.models.lesson_models import Question
+from api.utils.knowledge_tracing import KnowledgeTracingService
+from api.utils.question_dedupe import MinHasher, QuestionDeduplicator, question_shingles
+
+OPTIONS = [
+    "Sodium-potassium pump",
+    "Simple diffusion through the lipid bilayer",
+    "Facilitated diffusion through channel proteins",
+    "Osmosis through aquaporins"
+]
+STEM = "Which of the following is an active transport mechanism across the plasma membrane?"
+NEGATED_STEM = "Which of the following is NOT an active transport mechanism across the plasma membrane?"
+
+
+def test_negated_variant_is_not_merged():
+    """The pair looks ~0.9 similar to MinHash, but the correct answers are opposite"""
+    hasher = MinHasher()
+    similarity = hasher.similarity(hasher.signature(question_shingles(STEM, OPTIONS)),
+                                   hasher.signature(question_shingles(NEGATED_STEM, OPTIONS)))
+    assert similarity >= 0.8
+
+    deduplicator = QuestionDeduplicator(sqlite3.connect(":memory:"))
+    assert deduplicator.canonicalize("q_a", STEM, OPTIONS, answer=OPTIONS[0]) == "q_a"
+    assert deduplicator.canonicalize("q_b", NEGATED_STEM, OPTIONS, answer=OPTIONS[1]) == "q_b"
+    # Same negation, different correct option
+    assert deduplicator.canonicalize("q_c", NEGATED_STEM, OPTIONS, answer=OPTIONS[2]) == "q_c"
+
+
+def test_reworded_duplicate_is_merged():
+    """Case, spacing and option order changes with the same answer still map to the canonical question"""
+    deduplicator = QuestionDeduplicator(sqlite3.connect(":memory:"))
+    assert deduplicator.canonicalize("q_a", STEM, OPTIONS, answer=OPTIONS[0]) == "q_a"
+    assert deduplicator.canonicalize(
+        "q_d", "  which of the following is an ACTIVE transport mechanism across the plasma membrane ?",
+        list(reversed(OPTIONS)), answer=OPTIONS[0].upper()
+    ) == "q_a"
+
+
+def test_first_registration_after_restart_is_atomic(tmp_path, monkeypatch):
+    """A batch that fails half-way leaves no question behind, also on a fresh service"""
+    db_path = str(tmp_path / "knowledge.db")
+    KnowledgeTracingService(db_path).close()
+    service = KnowledgeTracingService(db_path)
+    questions = [
+        Question(question_id=f"q_{position}", text=stem, category="UE 2", subcategory="Cell Biology",
+                 topic="Membrane Transport", difficulty="medium",
+                 options=[{"id": chr(97 + i), "text": option} for i, option in enumerate(OPTIONS)],
+                 correct_answer="a", explanation="")
+        for position, stem in enumerate((STEM, NEGATED_STEM))
+    ]
+    canonicalize = service.deduplicator.canonicalize
+
+    def fail_on_second(question_id, *args, **kwargs):
+        if question_id == "q_1":
+            raise RuntimeError("index unavailable")
+        return canonicalize(question_id, *args, **kwargs)
+
+    monkeypatch.setattr(service.deduplicator, "canonicalize", fail_on_second)
+    with pytest.raises(RuntimeError):
+        service.register_questions(questions, ["active transport"])
+    assert service._conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0] == 0
+    assert service._conn.execute("SELECT COUNT(*) FROM question_aliases").fetchone()[0] == 0
+    service.close()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))